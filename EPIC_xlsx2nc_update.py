@@ -106,7 +106,6 @@ df = EcoFOCI_netCDF(args.NCDataPath)
 nchandle = df._getnchandle_()
 global_atts = df.get_global_atts()
 vars_dic = df.get_vars()
-data = df.ncreadfile_dic()
 
 ###replace chosen variables
 if args.EPIC_KEY:
@@ -11,8 +11,12 @@ USAGE:
 >>> import geomag
 >>> geomag.declination(80,0)
 -6.1335150785195536
+>>> geomag.mag_heading_array([0.0, 90.0, 359.0], 80, 0)
+array([...])
 """
 
+import numpy as np
+
 from . import geomag
 
 __singleton__ = geomag.GeoMag()
@@ -34,3 +38,21 @@ def mag_heading(hdg, *args, **kargs):
     """
     dec = declination(*args, **kargs)
     return (hdg - dec + 360.0) % 360
+
+def declination_array(*args, **kargs):
+    """Calculate magnetic declination in degrees for arrays of positions/dates
+    dlat = latitude in degrees, scalar or array
+    dlon = longitude in degrees, scalar or array
+    h = altitude in feet, scalar or array, default=0
+    time = date, datetime or datetime64 (scalar or per-sample array), default=today
+    The model is only evaluated once per unique (position, date).
+    """
+    return __singleton__.GeoMagArray(*args, **kargs)
+
+def mag_heading_array(hdg, *args, **kargs):
+    """Calculates magnetic headings from an array of true headings.
+    hdg = true heading in degrees, scalar or array
+    All other parameters are the same as declination_array.
+    """
+    dec = declination_array(*args, **kargs)
+    return (np.asarray(hdg, dtype=float) - dec + 360.0) % 360
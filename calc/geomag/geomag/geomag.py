@@ -13,11 +13,15 @@
 # >>> mag = gm.GeoMag(80,0)
 # >>> mag.dec
 # -6.1335150785195536
+# >>> gm.GeoMagArray([80,80],[0,0],time=[date(2016,1,1),date(2017,1,1)])
+# array([...])
 # >>>
 
-import math, os, unittest
+import hashlib, math, os, unittest
 from datetime import date
 
+import numpy as np
+
 class GeoMag:
 
     def GeoMag(self, dlat, dlon, h=0, time=date.today()): # latitude (decimal degrees), longitude (decimal degrees), altitude (feet), date
@@ -27,6 +31,9 @@ class GeoMag:
 
         otime = oalt = olat = olon = -1000.0
 
+        # per-call scratch tables, the model coefficients on self are read only
+        p, dp, tc, sp, cp, pp = self._scratch()
+
         dt = time - self.epoch
         glat = dlat
         glon = dlon
@@ -38,8 +45,8 @@ class GeoMag:
         crlat = math.cos(rlat)
         srlat2 = srlat*srlat
         crlat2 = crlat*crlat
-        self.sp[1] = srlon
-        self.cp[1] = crlon
+        sp[1] = srlon
+        cp[1] = crlon
 
         #/* CONVERT FROM GEODETIC COORDS. TO SPHERICAL COORDS. */
         if (alt != oalt or glat != olat):
@@ -56,8 +63,8 @@ class GeoMag:
 
         if (glon != olon):
             for m in range(2,self.maxord+1):
-                self.sp[m] = self.sp[1]*self.cp[m-1]+self.cp[1]*self.sp[m-1]
-                self.cp[m] = self.cp[1]*self.cp[m-1]-self.sp[1]*self.sp[m-1]
+                sp[m] = sp[1]*cp[m-1]+cp[1]*sp[m-1]
+                cp[m] = cp[1]*cp[m-1]-sp[1]*sp[m-1]
 
         aor = self.re/r
         ar = aor*aor
@@ -78,42 +85,42 @@ class GeoMag:
         # */
                 if (alt != oalt or glat != olat):
                     if (n == m):
-                        self.p[m][n] = st * self.p[m-1][n-1]
-                        self.dp[m][n] = st*self.dp[m-1][n-1]+ct*self.p[m-1][n-1]
+                        p[m][n] = st * p[m-1][n-1]
+                        dp[m][n] = st*dp[m-1][n-1]+ct*p[m-1][n-1]
 
                     elif (n == 1 and m == 0):
-                        self.p[m][n] = ct*self.p[m][n-1]
-                        self.dp[m][n] = ct*self.dp[m][n-1]-st*self.p[m][n-1]
+                        p[m][n] = ct*p[m][n-1]
+                        dp[m][n] = ct*dp[m][n-1]-st*p[m][n-1]
 
                     elif (n > 1 and n != m):
                         if (m > n-2):
-                            self.p[m][n-2] = 0
+                            p[m][n-2] = 0
                         if (m > n-2):
-                            self.dp[m][n-2] = 0.0
-                        self.p[m][n] = ct*self.p[m][n-1]-self.k[m][n]*self.p[m][n-2]
-                        self.dp[m][n] = ct*self.dp[m][n-1] - st*self.p[m][n-1]-self.k[m][n]*self.dp[m][n-2]
+                            dp[m][n-2] = 0.0
+                        p[m][n] = ct*p[m][n-1]-self.k[m][n]*p[m][n-2]
+                        dp[m][n] = ct*dp[m][n-1] - st*p[m][n-1]-self.k[m][n]*dp[m][n-2]
 
         # /*
                 # TIME ADJUST THE GAUSS COEFFICIENTS
         # */
                 if (time != otime):
-                    self.tc[m][n] = self.c[m][n]+dt*self.cd[m][n]
+                    tc[m][n] = self.c[m][n]+dt*self.cd[m][n]
                     if (m != 0):
-                        self.tc[n][m-1] = self.c[n][m-1]+dt*self.cd[n][m-1]
+                        tc[n][m-1] = self.c[n][m-1]+dt*self.cd[n][m-1]
 
         # /*
                 # ACCUMULATE TERMS OF THE SPHERICAL HARMONIC EXPANSIONS
         # */
-                par = ar*self.p[m][n]
+                par = ar*p[m][n]
                 
                 if (m == 0):
-                    temp1 = self.tc[m][n]*self.cp[m]
-                    temp2 = self.tc[m][n]*self.sp[m]
+                    temp1 = tc[m][n]*cp[m]
+                    temp2 = tc[m][n]*sp[m]
                 else:
-                    temp1 = self.tc[m][n]*self.cp[m]+self.tc[n][m-1]*self.sp[m]
-                    temp2 = self.tc[m][n]*self.sp[m]-self.tc[n][m-1]*self.cp[m]
+                    temp1 = tc[m][n]*cp[m]+tc[n][m-1]*sp[m]
+                    temp2 = tc[m][n]*sp[m]-tc[n][m-1]*cp[m]
 
-                bt = bt-ar*temp1*self.dp[m][n]
+                bt = bt-ar*temp1*dp[m][n]
                 bp = bp + (self.fm[m] * temp2 * par)
                 br = br + (self.fn[n] * temp1 * par)
         # /*
@@ -121,10 +128,10 @@ class GeoMag:
         # */
                 if (st == 0.0 and m == 1):
                     if (n == 1):
-                        self.pp[n] = self.pp[n-1]
+                        pp[n] = pp[n-1]
                     else:
-                        self.pp[n] = ct*self.pp[n-1]-self.k[m][n]*self.pp[n-2]
-                    parp = ar*self.pp[n]
+                        pp[n] = ct*pp[n-1]-self.k[m][n]*pp[n-2]
+                    parp = ar*pp[n]
                     bpp = bpp + (self.fm[m]*temp2*parp)
                     
                 D4=D4-1
@@ -193,37 +200,49 @@ class GeoMag:
 
         return retobj
 
-    def __init__(self, wmm_filename=None):
-        if not wmm_filename:
-            wmm_filename = os.path.join(os.path.dirname(__file__), 'WMM.COF')
-        wmm=[]
-        with open(wmm_filename) as wmm_file:
-            for line in wmm_file:
-                linevals = line.strip().split()
-                if len(linevals) == 3:
-                    self.epoch = float(linevals[0])
-                    self.model = linevals[1]
-                    self.modeldate = linevals[2]
-                elif len(linevals) == 6:
-                    linedict = {'n': int(float(linevals[0])),
-                    'm': int(float(linevals[1])),
-                    'gnm': float(linevals[2]),
-                    'hnm': float(linevals[3]),
-                    'dgnm': float(linevals[4]),
-                    'dhnm': float(linevals[5])}
-                    wmm.append(linedict)
+    def GeoMagArray(self, dlat, dlon, h=0, time=None):
+        # latitude, longitude, altitude (feet) and date may each be scalars or
+        # arrays that broadcast together; dates may be date, datetime or
+        # numpy datetime64 values.  The model is evaluated once per unique
+        # (lat, lon, alt, day) and the declination is mapped back onto the
+        # broadcast shape.
+        if time is None:
+            time = date.today()
+        days = np.asarray(time, dtype='datetime64[D]')
+        dlat, dlon, h, days = np.broadcast_arrays(np.asarray(dlat, dtype=float),
+                                                  np.asarray(dlon, dtype=float),
+                                                  np.asarray(h, dtype=float),
+                                                  days)
+        points = np.column_stack((dlat.ravel(), dlon.ravel(), h.ravel(),
+                                  days.ravel().astype('int64').astype(float)))
+        upoints, inverse = np.unique(points, axis=0, return_inverse=True)
+
+        udec = np.empty(len(upoints))
+        for i, (ulat, ulon, ualt, uday) in enumerate(upoints):
+            udate = np.datetime64(int(uday), 'D').astype(date)
+            udec[i] = self.GeoMag(ulat, ulon, ualt, udate).dec
+
+        return udec[inverse.reshape(-1)].reshape(dlat.shape)
 
+    def _scratch(self):
+        # Legendre polynomials, time adjusted coefficients and longitude terms
+        # are rebuilt on every call so one model can be shared between threads
         z = [0.0,0.0,0.0,0.0,0.0,0.0,0.0,0.0,0.0,0.0,0.0,0.0,0.0,0.0,0.0]
+        tc = [z[0:13] for i in range(14)]
+        sp = z[0:14]
+        cp = z[0:14]
+        cp[0] = 1.0
+        pp = z[0:13]
+        pp[0] = 1.0
+        p = [z[0:14] for i in range(14)]
+        p[0][0] = 1.0
+        dp = [z[0:13] for i in range(14)]
+        return (p, dp, tc, sp, cp, pp)
+
+    def __init__(self, wmm_filename=None, cache=True, cache_dir=None):
+        if not wmm_filename:
+            wmm_filename = os.path.join(os.path.dirname(__file__), 'WMM.COF')
         self.maxord = self.maxdeg = 12
-        self.tc = [z[0:13],z[0:13],z[0:13],z[0:13],z[0:13],z[0:13],z[0:13],z[0:13],z[0:13],z[0:13],z[0:13],z[0:13],z[0:13],z[0:13]]
-        self.sp = z[0:14]
-        self.cp = z[0:14]
-        self.cp[0] = 1.0
-        self.pp = z[0:13]
-        self.pp[0] = 1.0
-        self.p = [z[0:14],z[0:14],z[0:14],z[0:14],z[0:14],z[0:14],z[0:14],z[0:14],z[0:14],z[0:14],z[0:14],z[0:14],z[0:14],z[0:14]]
-        self.p[0][0] = 1.0
-        self.dp = [z[0:13],z[0:13],z[0:13],z[0:13],z[0:13],z[0:13],z[0:13],z[0:13],z[0:13],z[0:13],z[0:13],z[0:13],z[0:13],z[0:13]]
         self.a = 6378.137
         self.b = 6356.7523142
         self.re = 6371.2
@@ -233,7 +252,43 @@ class GeoMag:
         self.a4 = self.a2*self.a2
         self.b4 = self.b2*self.b2
         self.c4 = self.a4 - self.b4
+        self.fn = [0.0,2.0,3.0,4.0,5.0,6.0,7.0,8.0,9.0,10.0,11.0,12.0,13.0]
+        self.fm = [0.0,1.0,2.0,3.0,4.0,5.0,6.0,7.0,8.0,9.0,10.0,11.0,12.0]
+
+        with open(wmm_filename, 'rb') as wmm_file:
+            wmm_bytes = wmm_file.read()
+
+        # the normalized tables are cached in the user cache directory (not next to
+        # the bundled .COF file), keyed by the .COF hash
+        if not cache_dir:
+            cache_dir = self.cache_dir()
+        cache_file = os.path.join(cache_dir, '{0}.{1}.npy'.format(
+            os.path.basename(wmm_filename), hashlib.sha1(wmm_bytes).hexdigest()[:16]))
+        if cache and self._load_cache(cache_file, wmm_bytes):
+            return
 
+        self._read_cof(wmm_bytes.decode().splitlines())
+        if cache:
+            self._save_cache(cache_file)
+
+    def _read_cof(self, wmm_lines):
+        wmm=[]
+        for line in wmm_lines:
+            linevals = line.strip().split()
+            if len(linevals) == 3:
+                self.epoch = float(linevals[0])
+                self.model = linevals[1]
+                self.modeldate = linevals[2]
+            elif len(linevals) == 6:
+                linedict = {'n': int(float(linevals[0])),
+                'm': int(float(linevals[1])),
+                'gnm': float(linevals[2]),
+                'hnm': float(linevals[3]),
+                'dgnm': float(linevals[4]),
+                'dhnm': float(linevals[5])}
+                wmm.append(linedict)
+
+        z = [0.0,0.0,0.0,0.0,0.0,0.0,0.0,0.0,0.0,0.0,0.0,0.0,0.0,0.0,0.0]
         self.c = [z[0:14],z[0:14],z[0:14],z[0:14],z[0:14],z[0:14],z[0:14],z[0:14],z[0:14],z[0:14],z[0:14],z[0:14],z[0:14],z[0:14]]
         self.cd = [z[0:14],z[0:14],z[0:14],z[0:14],z[0:14],z[0:14],z[0:14],z[0:14],z[0:14],z[0:14],z[0:14],z[0:14],z[0:14],z[0:14]]
         
@@ -256,8 +311,6 @@ class GeoMag:
         self.snorm[0][0] = 1.0
         self.k = [z[0:13],z[0:13],z[0:13],z[0:13],z[0:13],z[0:13],z[0:13],z[0:13],z[0:13],z[0:13],z[0:13],z[0:13],z[0:13]]
         self.k[1][1] = 0.0
-        self.fn = [0.0,2.0,3.0,4.0,5.0,6.0,7.0,8.0,9.0,10.0,11.0,12.0,13.0]
-        self.fm = [0.0,1.0,2.0,3.0,4.0,5.0,6.0,7.0,8.0,9.0,10.0,11.0,12.0]
         for n in range(1,self.maxord+1):
             self.snorm[0][n] = self.snorm[0][n-1]*(2.0*n-1)/n
             j=2.0
@@ -278,6 +331,48 @@ class GeoMag:
                 D2=D2-1
                 m=m+D1
 
+    @staticmethod
+    def cache_dir():
+        """$GEOMAG_CACHE_DIR, else $XDG_CACHE_HOME/geomag (default ~/.cache/geomag)"""
+        if os.environ.get('GEOMAG_CACHE_DIR'):
+            return os.environ['GEOMAG_CACHE_DIR']
+        return os.path.join(os.environ.get('XDG_CACHE_HOME') or
+                            os.path.join(os.path.expanduser('~'), '.cache'), 'geomag')
+
+    def _load_cache(self, cache_file, wmm_bytes):
+        try:
+            tables = np.load(cache_file)
+        except (IOError, OSError, ValueError):
+            return False
+        # only the header line is parsed, c/cd/snorm/k come from the cache
+        linevals = wmm_bytes.decode().strip().split('\n', 1)[0].split()
+        self.epoch = float(linevals[0])
+        self.model = linevals[1]
+        self.modeldate = linevals[2]
+        self.c = tables[0].tolist()
+        self.cd = tables[1].tolist()
+        self.snorm = tables[2, 0:13, 0:13].tolist()
+        self.k = tables[3, 0:13, 0:13].tolist()
+        return True
+
+    def _save_cache(self, cache_file):
+        tables = np.zeros((4, 14, 14))
+        tables[0] = self.c
+        tables[1] = self.cd
+        tables[2, 0:13, 0:13] = self.snorm
+        tables[3, 0:13, 0:13] = self.k
+        # write then rename so concurrent workers never see a partial cache
+        tmp_file = '{0}.{1}.tmp'.format(cache_file, os.getpid())
+        try:
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+            with open(tmp_file, 'wb') as cached:
+                np.save(cached, tables)
+            os.replace(tmp_file, cache_file)
+        except (IOError, OSError):
+            # unwritable cache dirs just rebuild the tables each time
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+
 class GeoMagTest(unittest.TestCase):
 
     d1=date(2010,1,1)
@@ -305,5 +400,48 @@ class GeoMagTest(unittest.TestCase):
             calcval=gm.GeoMag(values[2], values[3], values[1], values[0])
             self.assertAlmostEqual(values[4], calcval.dec, 2, 'Expected %s, result %s' % (values[4], calcval.dec))
 
+    def test_coefficient_cache(self):
+        import tempfile, shutil
+        tmpdir = tempfile.mkdtemp()
+        cache_dir = os.path.join(tmpdir, 'cache')
+        try:
+            cof = os.path.join(tmpdir, 'WMM.COF')
+            shutil.copyfile(os.path.join(os.path.dirname(__file__), 'WMM.COF'), cof)
+            parsed = GeoMag(cof, cache_dir=cache_dir)
+            cached = GeoMag(cof, cache_dir=cache_dir)
+            uncached = GeoMag(cof, cache=False)
+            for gm in (cached, uncached):
+                self.assertEqual((parsed.c, parsed.cd, parsed.snorm, parsed.k, parsed.epoch),
+                                 (gm.c, gm.cd, gm.snorm, gm.k, gm.epoch))
+            with open(cof, 'a') as wmm_file:
+                wmm_file.write('\n')
+            GeoMag(cof, cache_dir=cache_dir)
+            self.assertEqual(len([f for f in os.listdir(cache_dir) if f.endswith('.npy')]), 2)
+            # nothing is written next to the .COF file
+            self.assertEqual(sorted(os.listdir(tmpdir)), ['WMM.COF', 'cache'])
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_threaded_declination(self):
+        from concurrent.futures import ThreadPoolExecutor
+        gm = GeoMag()
+        points = [(lat, lon, values[1], values[0]) for values in self.test_values
+                  for lat in range(-80, 81, 20) for lon in range(0, 360, 45)]
+        serial = [gm.GeoMag(*point).dec for point in points]
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            threaded = list(pool.map(lambda point: gm.GeoMag(*point).dec, points))
+        self.assertEqual(serial, threaded)
+
+    def test_declination_array(self):
+        gm = GeoMag()
+        lat = [values[2] for values in self.test_values]
+        lon = [values[3] for values in self.test_values]
+        alt = [values[1] for values in self.test_values]
+        days = [values[0] for values in self.test_values]
+        decs = gm.GeoMagArray(lat, lon, alt, days)
+        for i, values in enumerate(self.test_values):
+            self.assertEqual(gm.GeoMag(values[2], values[3], values[1], values[0]).dec, decs[i])
+        self.assertEqual(gm.GeoMagArray(80, 0, time=self.d1).shape, ())
+
 if __name__ == '__main__':
     unittest.main()
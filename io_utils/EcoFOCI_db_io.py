@@ -117,6 +117,50 @@ class EcoFOCI_db_Moorings(object):
 		except:
 		    print("Error: unable to fetch data")
 
+	def read_mooring_summaries(self, table=None, year=None, prefix=None, verbose=False):
+		"""Fetch every mooring (or a subset) in a single query
+
+		Parameters
+		----------
+		table : str
+		    deployment table name
+		year : int
+		    only moorings deployed in this year
+		prefix : str
+		    only MooringIDs starting with this string eg 13BS
+
+		Returns a dictionary of MooringID -> row (empty if the query fails)
+		"""
+		conditions = []
+		params = []
+		if year:
+		    conditions.append("YEAR(`DeploymentDateTimeGMT`) = %s")
+		    params.append(int(year))
+		if prefix:
+		    # the prefix is matched literally, escape the LIKE wildcards
+		    conditions.append("`MooringID` LIKE %s")
+		    params.append(prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%')
+
+		sql = "SELECT * from `{0}`".format(table)
+		if conditions:
+		    sql = sql + " WHERE " + " AND ".join(conditions)
+
+		if verbose:
+		    print(sql, params)
+
+		result_dic = {}
+		try:
+		    # Execute the SQL command
+		    self.cursor.execute(sql, params)
+		    # Fetch all the rows in a list of lists.
+		    results = self.cursor.fetchall()
+		    for row in results:
+		        result_dic[row['MooringID']] ={keys: row[keys] for val, keys in enumerate(row.keys())} 
+		except mysql.connector.Error as err:
+		    print("Error: unable to fetch data ({0})".format(err))
+
+		return (result_dic)
+
 
 	def close(self):
 		"""close database"""
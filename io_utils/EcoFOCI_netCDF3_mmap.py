@@ -0,0 +1,530 @@
+#!/usr/bin/env python
+
+"""
+ EcoFOCI_netCDF3_mmap.py
+
+ Read-only backend for netcdf3 files (classic, 64-bit offset and CDF5 as made
+ by EcoFOCI_netCDF_write) that parses the header in python and serves variables
+ as numpy views of the memory-mapped file at their offsets - opening is a single
+ header parse and reads are zero-copy (record variables are strided views).
+
+ EcoFOCI_netCDF3_mmap subclasses EcoFOCI_netCDF so all of its read methods
+ (ncreadfile_dic, get_squeezed, get_time_slice, iter_chunks ...) work unchanged.
+
+ Returned arrays are views of the (big-endian) file, use .astype() for a native
+ copy where a library insists on native byte order.
+
+ History:
+ --------
+ 2026-10-19: fix streaming numrecs of CDF5 files
+ 2026-10-19: unpack scale_factor/add_offset variables
+ 2026-10-19: CDF5 (NETCDF3_64BIT_DATA) files
+ 2026-10-19: initial version
+
+ Format reference:
+ =================
+ https://docs.unidata.ucar.edu/netcdf-c/current/file_format_specifications.html
+"""
+
+# System Stack
+import mmap
+import os
+import struct
+import unittest
+from collections import OrderedDict
+
+# Science Stack
+import numpy as np
+
+# User Stack
+from io_utils.EcoFOCI_netCDF_read import EcoFOCI_netCDF
+
+NC_DIMENSION = 10
+NC_VARIABLE = 11
+NC_ATTRIBUTE = 12
+STREAMING = [0xFFFFFFFF, 0xFFFFFFFFFFFFFFFF]
+
+# header version byte -> data model
+nc_versions = {1: 'NETCDF3_CLASSIC', 2: 'NETCDF3_64BIT_OFFSET', 5: 'NETCDF3_64BIT_DATA'}
+
+# nc_type -> big-endian numpy dtype (7-11 are CDF5 only)
+nc_types = {1: np.dtype('>i1'), 2: np.dtype('S1'), 3: np.dtype('>i2'),
+            4: np.dtype('>i4'), 5: np.dtype('>f4'), 6: np.dtype('>f8'),
+            7: np.dtype('>u1'), 8: np.dtype('>u2'), 9: np.dtype('>u4'),
+            10: np.dtype('>i8'), 11: np.dtype('>u8')}
+
+# netcdf default fill values (masked when no _FillValue is given, not for byte)
+nc_fill = {3: -32767, 4: -2147483647, 5: 9.9692099683868690e+36,
+           6: 9.9692099683868690e+36, 7: 255, 8: 65535, 9: 4294967295,
+           10: -9223372036854775806, 11: 18446744073709551614}
+
+
+def attribute_size(name, value, data_model='NETCDF3_CLASSIC'):
+    """bytes the attribute name=value takes in a netcdf3 header"""
+    nchars = len(name.encode('utf-8'))
+    if isinstance(value, str):
+        nbytes = len(value.encode('utf-8'))
+    else:
+        value = np.atleast_1d(value)
+        itemsize = value.dtype.itemsize
+        if value.dtype.kind in 'iub' and data_model != 'NETCDF3_64BIT_DATA':
+            # no 64-bit integers before CDF5, stored as int
+            itemsize = min(itemsize, 4)
+        nbytes = value.size * itemsize
+    # name and value counts are 64-bit in CDF5
+    counts = 16 if data_model == 'NETCDF3_64BIT_DATA' else 8
+    return 4 + counts + nchars + (-nchars % 4) + nbytes + (-nbytes % 4)
+
+
+class EcoFOCI_netCDF3_mmap(EcoFOCI_netCDF):
+
+    def __init__(self, file_name=None, mode='r', pool=None):
+        """Open a netcdf3 file read-only.
+
+        Parameters
+        ----------
+        file_name : str
+            full path to file on disk
+        mode : str
+            only 'r' is supported
+        pool : None
+            accepted for compatibility with EcoFOCI_netCDF, opens are cheap
+            enough that handles are not pooled
+
+        """
+        if mode != 'r':
+            raise RuntimeError("EcoFOCI_netCDF3_mmap is read only (mode='r')")
+
+        self.nchandle = NetCDF3_Header(file_name)
+        self.file_name = file_name
+        self.mode = mode
+        self.pool = None
+
+    def close(self):
+        # views handed out keep the map alive, so only drop our reference
+        self.nchandle.close()
+
+
+class _Attributes(object):
+    """netCDF4-like attribute access: ncattrs(), getncattr() and __dict__"""
+
+    __slots__ = ('__dict__',)
+
+    def ncattrs(self):
+        return list(self.__dict__.keys())
+
+    def getncattr(self, name):
+        return self.__dict__[name]
+
+    def setncattr(self, name, value):
+        raise RuntimeError("EcoFOCI_netCDF3_mmap is read only")
+
+
+class NetCDF3_Dimension(object):
+
+    def __init__(self, name, size, unlimited=False):
+        self.name = name
+        self.size = size
+        self.unlimited = unlimited
+
+    def __len__(self):
+        return self.size
+
+    def isunlimited(self):
+        return self.unlimited
+
+
+class NetCDF3_Variable(_Attributes):
+    """memory-mapped variable, indexing returns views of the file"""
+
+    __slots__ = ('name', 'dimensions', 'shape', 'dtype', 'nc_type', 'begin',
+                 'recsize', 'mask', 'scale', '_header')
+
+    def __init__(self, header, name, dimensions, shape, nc_type, begin, attributes):
+        self._header = header
+        self.name = name
+        self.dimensions = dimensions
+        self.shape = shape
+        self.nc_type = nc_type
+        self.dtype = nc_types[nc_type]
+        self.begin = begin
+        self.recsize = None
+        self.mask = True
+        self.scale = True
+        self.__dict__.update(attributes)
+
+    def set_auto_mask(self, mask):
+        self.mask = bool(mask)
+
+    def set_auto_scale(self, scale):
+        self.scale = bool(scale)
+
+    def set_auto_maskandscale(self, maskandscale):
+        self.mask = self.scale = bool(maskandscale)
+
+    def isrecord(self):
+        return self.recsize is not None
+
+    def _view(self):
+        shape = self.shape
+        if self.isrecord():
+            shape = (self._header.numrecs,) + shape[1:]
+        strides = []
+        stride = self.dtype.itemsize
+        for size in shape[::-1]:
+            strides.insert(0, stride)
+            stride *= size
+        if self.isrecord():
+            strides[0] = self.recsize
+        if self.dtype.itemsize * int(np.prod(shape)) == 0:
+            return np.zeros(shape, dtype=self.dtype)
+        return np.ndarray(shape, dtype=self.dtype, buffer=self._header.mm,
+                          offset=self.begin, strides=tuple(strides))
+
+    def __getitem__(self, index):
+        data = self._view()
+        # scalar variables accept [:] like netCDF4
+        data = data[index] if data.ndim else data[...]
+        if self.nc_type == 2:
+            return data
+        mask = self._missing(data) if self.mask else None
+        if self.scale:
+            data = self._unpack(data)
+        if mask is None:
+            return data
+        return np.ma.masked_array(data, mask=mask, copy=False)
+
+    def __len__(self):
+        return self._view().shape[0]
+
+    def _unpack(self, data):
+        """packed integers: data * scale_factor + add_offset (netCDF4 auto scale)"""
+        attrs = self.__dict__
+        if 'scale_factor' in attrs:
+            data = data * attrs['scale_factor']
+        if 'add_offset' in attrs:
+            data = data + attrs['add_offset']
+        return data
+
+    def _missing(self, data):
+        """netCDF4 style mask: _FillValue/missing_value and valid range"""
+        attrs = self.__dict__
+        fill = attrs.get('_FillValue', nc_fill.get(self.nc_type))
+
+        missing = np.zeros(data.shape, dtype=bool)
+        if fill is not None:
+            missing |= (data == fill)
+        if 'missing_value' in attrs:
+            for value in np.atleast_1d(attrs['missing_value']):
+                missing |= (data == value)
+
+        valid_min = valid_max = None
+        if 'valid_range' in attrs:
+            (valid_min, valid_max) = attrs['valid_range'][:2]
+        valid_min = attrs.get('valid_min', valid_min)
+        valid_max = attrs.get('valid_max', valid_max)
+        if (valid_min is None and valid_max is None and fill is not None
+                and (self.nc_type != 1 or '_FillValue' in attrs)):
+            # the valid range excludes the fill value
+            if fill > 0:
+                missing |= (data > fill)
+            else:
+                missing |= (data < fill)
+        if valid_min is not None:
+            missing |= (data < valid_min)
+        if valid_max is not None:
+            missing |= (data > valid_max)
+        return missing
+
+
+class NetCDF3_Header(_Attributes):
+    """netCDF4.Dataset-like view of a netcdf3 format header"""
+
+    __slots__ = ('file_name', 'mm', 'version', 'data_model', 'numrecs',
+                 'dimensions', 'variables', 'header_size', '_pos')
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        with open(file_name, 'rb') as fobj:
+            self.mm = mmap.mmap(fobj.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic = self.mm[:4]
+        if magic[:3] != b'CDF' or magic[3] not in nc_versions:
+            raise RuntimeError("{0} is not a netcdf3 (classic, 64-bit offset or CDF5) file".format(file_name))
+        self.version = magic[3]
+        self.data_model = nc_versions[self.version]
+        self._pos = 4
+
+        self.numrecs = self._count()
+        self.dimensions = OrderedDict()
+        self.variables = OrderedDict()
+        self._read_dimensions()
+        self.__dict__.update(self._read_attributes())
+        self._read_variables()
+        self.header_size = self._pos
+        self._layout_records()
+
+    def close(self):
+        # arrays handed out still reference the map, it is unmapped once they are gone
+        self.mm = None
+
+    def sync(self):
+        pass
+
+    def filepath(self):
+        return self.file_name
+
+    def free_header_space(self):
+        """bytes between the end of the header and the first variables data
+
+        Attributes can grow by this much before the library has to move all of
+        the data to make room (None if there are no variables).
+        """
+        if not self.variables:
+            return None
+        return min([v.begin for v in self.variables.values()]) - self.header_size
+
+    # -- header primitives (all big-endian, padded to 4 bytes) --
+    def _unpack(self, fmt, size):
+        value = struct.unpack_from(fmt, self.mm, self._pos)
+        self._pos += size
+        return value
+
+    def _int(self):
+        return self._unpack('>I', 4)[0]
+
+    def _count(self):
+        # sizes, counts and ids are 64-bit in CDF5
+        if self.version == 5:
+            return self._unpack('>Q', 8)[0]
+        return self._int()
+
+    def _offset(self):
+        if self.version == 1:
+            return self._int()
+        return self._unpack('>Q', 8)[0]
+
+    def _name(self):
+        nchars = self._count()
+        name = self.mm[self._pos:self._pos + nchars].decode('utf-8')
+        self._pos += nchars + (-nchars % 4)
+        return name
+
+    def _list(self, tag):
+        list_tag = self._int()
+        if list_tag not in (0, tag):
+            raise RuntimeError("malformed netcdf header at byte {0}".format(self._pos - 4))
+        return self._count()
+
+    def _read_dimensions(self):
+        for i in range(self._list(NC_DIMENSION)):
+            name = self._name()
+            size = self._count()
+            if size == 0:
+                # a streaming numrecs is sized by _layout_records
+                size = 0 if self.numrecs in STREAMING else self.numrecs
+                dim = NetCDF3_Dimension(name, size, True)
+            else:
+                dim = NetCDF3_Dimension(name, size, False)
+            self.dimensions[name] = dim
+
+    def _read_attributes(self):
+        attributes = OrderedDict()
+        for i in range(self._list(NC_ATTRIBUTE)):
+            name = self._name()
+            nc_type = self._int()
+            nelems = self._count()
+            dtype = nc_types[nc_type]
+            nbytes = nelems * dtype.itemsize
+            if nc_type == 2:
+                raw = self.mm[self._pos:self._pos + nbytes]
+                attributes[name] = raw.decode('utf-8', 'replace').rstrip('\x00')
+            else:
+                raw = np.frombuffer(self.mm, dtype=dtype, count=nelems, offset=self._pos)
+                values = np.array(raw, dtype=dtype.newbyteorder('='))
+                attributes[name] = values[0] if nelems == 1 else values
+            self._pos += nbytes + (-nbytes % 4)
+        return attributes
+
+    def _read_variables(self):
+        dim_names = list(self.dimensions.keys())
+        for i in range(self._list(NC_VARIABLE)):
+            name = self._name()
+            dimids = [self._count() for j in range(self._count())]
+            attributes = self._read_attributes()
+            nc_type = self._int()
+            self._count()  # vsize, recomputed below as it overflows for large variables
+            begin = self._offset()
+
+            dimensions = tuple([dim_names[d] for d in dimids])
+            shape = tuple([len(self.dimensions[d]) for d in dimensions])
+            self.variables[name] = NetCDF3_Variable(self, name, dimensions, shape,
+                                                    nc_type, begin, attributes)
+
+    def _layout_records(self):
+        """record variables are interleaved record by record"""
+        record = [v for v in self.variables.values()
+                  if v.dimensions and self.dimensions[v.dimensions[0]].isunlimited()]
+        if not record:
+            return
+
+        sizes = [v.dtype.itemsize * int(np.prod(v.shape[1:])) for v in record]
+        if len(record) == 1:
+            recsize = sizes[0]
+        else:
+            recsize = sum([size + (-size % 4) for size in sizes])
+
+        if self.numrecs in STREAMING:
+            # numrecs not yet written (streaming), take it from the file size
+            begin = min([v.begin for v in record])
+            self.numrecs = (len(self.mm) - begin) // recsize if recsize else 0
+            for dim in self.dimensions.values():
+                if dim.isunlimited():
+                    dim.size = self.numrecs
+
+        for v in record:
+            v.recsize = recsize
+            v.shape = (self.numrecs,) + v.shape[1:]
+
+
+class EcoFOCI_netCDF3_mmapTest(unittest.TestCase):
+
+    formats = ['NETCDF3_CLASSIC', 'NETCDF3_64BIT_OFFSET', 'NETCDF3_64BIT_DATA']
+
+    def setUp(self):
+        import tempfile
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.tmpdir)
+
+    def make_file(self, nc_format):
+        from netCDF4 import Dataset
+        file_name = os.path.join(self.tmpdir, nc_format + '.nc')
+        rootgrp = Dataset(file_name, 'w', format=nc_format)
+        rootgrp.CREATION_DATE = '2016-12-02'
+        rootgrp.WATER_DEPTH = np.float32(71.)
+        rootgrp.CAST = np.int32(7)
+        rootgrp.BOUNDS = np.array([56.0, -164.0])
+        rootgrp.createDimension('time', None)
+        rootgrp.createDimension('depth', 5)
+        rootgrp.createDimension('strlen', 6)
+
+        nctime = rootgrp.createVariable('time', 'f8', ('time',))
+        nctime.units = 'hours since 2016-01-01 00:00:00'
+        nctime[:] = np.arange(12)
+        depth = rootgrp.createVariable('depth', 'f4', ('depth',))
+        depth.units = 'm'
+        depth[:] = np.arange(5) * 10.
+
+        # record variables: fill value, packed integers, valid range, byte,
+        # default fill (records left unwritten)
+        T_20 = rootgrp.createVariable('T_20', 'f4', ('time', 'depth'), fill_value=1e35)
+        T_20.epic_code = np.int32(20)
+        T_20[:] = np.ma.masked_greater(np.arange(60.).reshape(12, 5), 50.)
+        P_1 = rootgrp.createVariable('P_1', 'i2', ('time', 'depth'), fill_value=np.int16(-32768))
+        P_1.scale_factor = np.float32(0.01)
+        P_1.add_offset = np.float32(100.)
+        P_1.set_auto_maskandscale(False)
+        raw = np.arange(60, dtype='i2').reshape(12, 5) * 100
+        raw[1, 0] = -32768
+        P_1[:] = raw
+        S_41 = rootgrp.createVariable('S_41', 'f8', ('time',))
+        S_41.valid_min = 30.
+        S_41[:] = np.arange(12) + 25.
+        flag = rootgrp.createVariable('flag', 'i1', ('time',))
+        flag[:] = np.arange(12) - 6
+        count = rootgrp.createVariable('count', 'i4', ('time',))
+        count[0:6] = np.arange(6)
+
+        # fixed variables
+        station = rootgrp.createVariable('station', 'S1', ('strlen',))
+        station[:] = np.array(list('M2    '), dtype='S1')
+        rootgrp.createVariable('lat', 'f4', ())[:] = 56.87
+        if nc_format == 'NETCDF3_64BIT_DATA':
+            rootgrp.createVariable('qc', 'u1', ('depth',))[:] = np.arange(5) * 60
+            rootgrp.createVariable('ticks', 'i8', ('depth',))[:] = np.arange(5) * 2 ** 40
+        rootgrp.close()
+        return file_name
+
+    def streaming_copy(self, file_name):
+        """copy of file_name with numrecs not written (as while streaming)"""
+        import shutil
+        stream_name = file_name.replace('.nc', '_streaming.nc')
+        shutil.copyfile(file_name, stream_name)
+        with open(stream_name, 'r+b') as fobj:
+            version = fobj.read(4)[3]
+            fobj.write(b'\xff' * (8 if version == 5 else 4))
+        return stream_name
+
+    def assertSameValue(self, expected, value, msg):
+        if isinstance(expected, str):
+            self.assertEqual(expected, value, msg)
+        else:
+            self.assertTrue(np.array_equal(np.asarray(expected), np.asarray(value)), msg)
+
+    def assertSameFile(self, file_name, mmap_name):
+        from netCDF4 import Dataset
+        rootgrp = Dataset(file_name)
+        df = EcoFOCI_netCDF3_mmap(mmap_name)
+        header = df.nchandle
+        try:
+            self.assertEqual(header.data_model, rootgrp.data_model)
+            self.assertEqual(header.ncattrs(), rootgrp.ncattrs())
+            for att in rootgrp.ncattrs():
+                self.assertSameValue(rootgrp.getncattr(att), header.getncattr(att), att)
+            self.assertEqual([(d.name, len(d), d.isunlimited()) for d in header.dimensions.values()],
+                             [(d.name, len(d), d.isunlimited()) for d in rootgrp.dimensions.values()])
+            self.assertEqual(list(header.variables.keys()), list(rootgrp.variables.keys()))
+
+            for name, ncvar in rootgrp.variables.items():
+                var = header.variables[name]
+                self.assertEqual((var.dimensions, var.shape), (ncvar.dimensions, ncvar.shape), name)
+                self.assertEqual(var.ncattrs(), ncvar.ncattrs(), name)
+                for att in ncvar.ncattrs():
+                    self.assertSameValue(ncvar.getncattr(att), var.getncattr(att), name + ':' + att)
+
+                for maskandscale in [True, False]:
+                    ncvar.set_auto_maskandscale(maskandscale)
+                    var.set_auto_maskandscale(maskandscale)
+                    expected = ncvar[:]
+                    data = var[:]
+                    mask = np.ma.getmaskarray(expected)
+                    self.assertTrue(np.array_equal(mask, np.ma.getmaskarray(data)), name)
+                    (expected, data) = (np.ma.getdata(expected)[~mask], np.ma.getdata(data)[~mask])
+                    if expected.dtype.kind == 'S':
+                        self.assertTrue(np.array_equal(expected, data), name)
+                    else:
+                        self.assertTrue(np.allclose(expected, data, rtol=1e-6), name)
+                    if len(var.shape):
+                        self.assertTrue(np.array_equal(np.ma.getmaskarray(ncvar[2:5]),
+                                                       np.ma.getmaskarray(var[2:5])), name)
+        finally:
+            df.close()
+            rootgrp.close()
+
+    def test_formats(self):
+        for nc_format in self.formats:
+            file_name = self.make_file(nc_format)
+            self.assertSameFile(file_name, file_name)
+
+    def test_streaming_numrecs(self):
+        for nc_format in self.formats:
+            file_name = self.make_file(nc_format)
+            self.assertSameFile(file_name, self.streaming_copy(file_name))
+
+    def test_epic_reads(self):
+        file_name = self.make_file('NETCDF3_CLASSIC')
+        df = EcoFOCI_netCDF3_mmap(file_name)
+        try:
+            self.assertTrue(np.array_equal(df.get_datetime64(),
+                                           np.datetime64('2016-01-01', 'ms')
+                                           + np.arange(12).astype('timedelta64[h]')))
+            self.assertEqual(sorted(df.ncreadfile_dic().keys()), sorted(df.get_vars().keys()))
+        finally:
+            df.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,263 @@
+#!/usr/bin/env python
+
+"""
+ EcoFOCI_netCDF_parallel.py
+
+ Read many netcdf files (eg a sites deployment history or a cruises ctd casts)
+ across a pool of worker processes.
+
+ Each worker decodes its file into multiprocessing.shared_memory blocks and only
+ returns (name, shape, dtype) descriptors, so the arrays are never pickled back
+ to the parent.  The parent maps the blocks and hands out arrays that are views
+ of them (no copy), owned by an EcoFOCI_shared_arrays per file.
+
+ History:
+ --------
+ 2026-10-19: unpack and nan fill floating point variables, add unittests
+ 2026-10-19: return views of the shared memory blocks instead of copies
+ 2026-10-19: initial version
+
+ Compatibility:
+ ==============
+ python >=3.8 (multiprocessing.shared_memory)
+"""
+
+# System Stack
+import os
+import unittest
+import weakref
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+
+# Science Stack
+import numpy as np
+
+# User Stack
+from netCDF4 import Dataset
+
+from io_utils.EcoFOCI_netCDF_read import EcoFOCI_netCDF
+
+
+def _read_to_shared_memory(file_name, variables=None):
+    """worker: read variables of file_name into shared memory blocks
+
+    Returns a dictionary of variable name -> (block name, shape, dtype str).
+    Values are unpacked, masked values are nan in floating point blocks (the
+    mask itself can not be shared) and left as stored in integer/char blocks.
+    """
+    df = EcoFOCI_netCDF(file_name, mode='r')
+    descriptors = {}
+    try:
+        if variables is None:
+            variables = list(df.nchandle.variables.keys())
+
+        for v in variables:
+            if v not in df.nchandle.variables.keys():
+                continue
+            ncvar = df.nchandle.variables[v]
+            ncvar.set_auto_maskandscale(True)
+            data = ncvar[:]
+            if data.dtype.kind == 'f':
+                data = np.ma.filled(data, np.nan)
+            else:
+                # only unpacked variables are not floating point, so the data
+                # under the mask is the raw file value
+                data = np.ma.getdata(data)
+
+            shm = shared_memory.SharedMemory(create=True, size=max(data.nbytes, 1))
+            np.ndarray(data.shape, dtype=data.dtype, buffer=shm.buf)[...] = data
+            descriptors[v] = (shm.name, data.shape, data.dtype.str)
+            shm.close()
+            # the parent attaches, copies and unlinks the block, so it owns
+            # the tracker registration from here on
+            resource_tracker.unregister(shm._name, 'shared_memory')
+    except Exception:
+        _unlink(descriptors)
+        raise
+    finally:
+        df.close()
+
+    return descriptors
+
+
+def _unlink(descriptors, missing_ok=False):
+    for (name, shape, dtype) in descriptors.values():
+        try:
+            shm = shared_memory.SharedMemory(name=name)
+        except FileNotFoundError:
+            if missing_ok:
+                continue
+            raise
+        shm.close()
+        shm.unlink()
+
+
+# blocks whose arrays outlived their EcoFOCI_shared_arrays, retried on the next release
+_orphaned_blocks = []
+
+
+def _close_blocks(arrays, blocks):
+    arrays.clear()
+    pending = blocks + _orphaned_blocks
+    del blocks[:], _orphaned_blocks[:]
+    for shm in pending:
+        try:
+            shm.close()
+        except BufferError:
+            # an array is still referenced elsewhere, its export keeps the
+            # block mapped until that array is gone
+            _orphaned_blocks.append(shm)
+
+
+class EcoFOCI_shared_arrays(Mapping):
+    """{variable: ndarray} for one file, the arrays are views of the shared
+    memory blocks the worker filled.
+
+    This object owns the blocks: they are unmapped once it is garbage
+    collected or release() is called, except for blocks whose arrays (or views
+    of them) are still referenced, which stay mapped until a later release
+    after those arrays are gone.  The block names are unlinked on attach, so
+    nothing is left behind in shared memory if the parent dies.
+    """
+
+    def __init__(self, descriptors):
+        self._arrays = {}
+        self._blocks = []
+        self._finalizer = weakref.finalize(self, _close_blocks, self._arrays, self._blocks)
+        try:
+            for v, (name, shape, dtype) in descriptors.items():
+                shm = shared_memory.SharedMemory(name=name)
+                self._blocks.append(shm)
+                shm.unlink()
+                # frombuffer holds a buffer export, so the block can not be
+                # unmapped under an array (or a view of it) that is still alive
+                count = int(np.prod(shape, dtype=np.int64))
+                self._arrays[v] = np.frombuffer(shm.buf, dtype=dtype, count=count).reshape(shape)
+        except Exception:
+            _unlink(dict([(v, d) for (v, d) in descriptors.items() if v not in self._arrays]),
+                    missing_ok=True)
+            self.release()
+            raise
+
+    def __getitem__(self, var_name):
+        return self._arrays[var_name]
+
+    def __iter__(self):
+        return iter(self._arrays)
+
+    def __len__(self):
+        return len(self._arrays)
+
+    def release(self):
+        """drop the arrays and unmap their blocks"""
+        self._finalizer()
+
+
+def ncreadfiles_parallel(file_names, variables=None, workers=None):
+    """read variables from each file in file_names using a process pool
+
+    Parameters
+    ----------
+    file_names : list
+        netcdf files to read
+    variables : list
+        variables to read from every file (default: all, missing ones are skipped)
+    workers : int
+        number of worker processes (default: number of cpus)
+
+    Returns
+    -------
+    list of EcoFOCI_shared_arrays ({variable: ndarray} mappings) in the same
+    order as file_names.  scale_factor/add_offset are applied and masked values
+    (_FillValue, missing_value, valid range) are nan in floating point arrays,
+    integer and char arrays hold the stored values.  Arrays are views of shared
+    memory owned by their mapping, keep the mapping alive while the arrays are
+    used.
+    """
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_read_to_shared_memory, file_name, variables)
+                   for file_name in file_names]
+        try:
+            for future in futures:
+                results.append(EcoFOCI_shared_arrays(future.result()))
+        except Exception:
+            # free the blocks of files that were read but not collected
+            for future in futures[len(results) + 1:]:
+                if future.exception() is None:
+                    _unlink(future.result())
+            raise
+
+    return results
+
+
+"""------------------------------------- Tests -------------------------------------------"""
+
+
+class EcoFOCI_netCDF_parallelTest(unittest.TestCase):
+
+    def setUp(self):
+        import tempfile
+        self.tmpdir = tempfile.mkdtemp()
+        self.file_names = []
+        for n in range(4):
+            file_name = os.path.join(self.tmpdir, 'f{0}.nc'.format(n))
+            with Dataset(file_name, 'w', format='NETCDF3_CLASSIC') as rootgrp:
+                rootgrp.createDimension('time', 3)
+                rootgrp.createVariable('time', 'i4', ('time',))[:] = [n, n + 1, n + 2]
+                rootgrp.createVariable('T_20', 'f4', ('time',), fill_value=1e35)[:] = \
+                    np.ma.array([n, 1e35, n], mask=[0, 1, 0])
+                u = rootgrp.createVariable('U_320', 'i2', ('time',), fill_value=-32767)
+                u.scale_factor = 0.01
+                u.set_auto_scale(False)
+                u[:] = [100 * n, -32767, 5]
+            self.file_names.append(file_name)
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.tmpdir)
+
+    def shm_blocks(self):
+        return set(os.listdir('/dev/shm')) if os.path.isdir('/dev/shm') else set()
+
+    def test_order_and_values(self):
+        results = ncreadfiles_parallel(self.file_names, workers=2)
+        self.assertEqual(len(results), len(self.file_names))
+        for n, arrays in enumerate(results):
+            np.testing.assert_array_equal(arrays['time'], [n, n + 1, n + 2])
+            np.testing.assert_array_equal(arrays['T_20'], [n, np.nan, n])
+            np.testing.assert_allclose(arrays['U_320'], [n, np.nan, 0.05])
+            arrays.release()
+
+    def test_variables(self):
+        results = ncreadfiles_parallel(self.file_names[:1], variables=['T_20', 'missing'])
+        self.assertEqual(list(results[0].keys()), ['T_20'])
+        results[0].release()
+
+    def test_release_with_live_views(self):
+        before = self.shm_blocks()
+        (arrays, other) = ncreadfiles_parallel(self.file_names[:2], workers=2)
+        view = arrays['time'][1:]
+        arrays.release()
+        self.assertEqual(len(arrays), 0)
+        # the block stays mapped under the view
+        np.testing.assert_array_equal(view, [1, 2])
+        del view
+        other.release()
+        self.assertEqual(_orphaned_blocks, [])
+        self.assertEqual(self.shm_blocks(), before)
+
+    def test_failed_file(self):
+        before = self.shm_blocks()
+        bad_file = os.path.join(self.tmpdir, 'bad.nc')
+        with open(bad_file, 'w') as fobj:
+            fobj.write('not a netcdf file')
+        with self.assertRaises(Exception):
+            ncreadfiles_parallel(self.file_names[:2] + [bad_file] + self.file_names[2:],
+                                 workers=2)
+        self.assertEqual(self.shm_blocks(), before)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,25 +7,51 @@ class definitions for netcdf4 wrappers
 """
 
 import datetime
+import os
+import threading
+import unittest
+import warnings
+from collections import OrderedDict
+from collections.abc import Mapping
+from contextlib import contextmanager
 
 # science stack
-from netCDF4 import Dataset
+import numpy as np
+from netCDF4 import Dataset, date2num, num2date
+
+# user stack
+from calc.EPIC2Datetime import Datetime2EPIC
+
+# dimension names used for the depth/lat/lon axes of EPIC and CF files
+depth_dims = ['depth', 'dep', 'pressure']
+lat_dims = ['lat', 'latitude']
+lon_dims = ['lon', 'longitude']
 
 
 class EcoFOCI_netCDF(object):
 
-    def __init__(self, file_name=None):
+    def __init__(self, file_name=None, mode='a', pool=None):
         """Initialize opening of netcdf file.
 
         Parameters
         ----------
         file_name : str
             full path to file on disk
+        mode : str
+            'a' to allow edits (default), 'r' opens read-only so files on
+            read-only mounts can be opened by several processes at once
+        pool : EcoFOCI_netCDF_pool
+            reuse an already open handle from this pool (close releases it)
 
         """
 
-        self.nchandle = Dataset(file_name,'a')
+        if pool is None:
+            self.nchandle = Dataset(file_name, mode)
+        else:
+            self.nchandle = pool.acquire(file_name, mode)
         self.file_name = file_name
+        self.mode = mode
+        self.pool = pool
 
 
     def _getnchandle_(self):
@@ -43,8 +69,56 @@ class EcoFOCI_netCDF(object):
 
     def set_global_atts(self, name=None, attribute=None):
         """set global attribute for specified name"""
+        self.check_header_space(name, attribute)
         self.nchandle.setncattr(name,attribute)
 
+    def check_header_space(self, name, attribute):
+        """free header bytes left after setting global attribute name (classic files)
+
+        netcdf3 keeps the data right after the header, an attribute that outgrows
+        the free space makes the library move every data byte - warn when that
+        is about to happen.  Returns None for netcdf4 files.
+        """
+        if not self.nchandle.data_model.startswith('NETCDF3'):
+            return None
+
+        # header is parsed in python, avoid importing at module level (circular)
+        from io_utils.EcoFOCI_netCDF3_mmap import NetCDF3_Header, attribute_size
+
+        self.nchandle.sync()
+        header = NetCDF3_Header(self.nchandle.filepath())
+        free = header.free_header_space()
+        header.close()
+        if free is None:
+            return None
+
+        data_model = self.nchandle.data_model
+        free -= attribute_size(name, attribute, data_model)
+        if name in self.nchandle.ncattrs():
+            free += attribute_size(name, self.nchandle.getncattr(name), data_model)
+        if free < 0:
+            warnings.warn("{0}: setting {1} outgrows the header by {2} bytes, "
+                          "the whole file will be rewritten".format(
+                              self.nchandle.filepath(), name, -free))
+        return free
+
+    def get_header(self):
+        """dimensions, variable shapes/dtypes/attributes and global attributes
+
+        Only header information is touched, no data arrays are read.
+        """
+        header = {'dimensions': {}, 'variables': {}, 'global_attributes': self.nchandle.__dict__}
+
+        for name, dim in self.nchandle.dimensions.items():
+            header['dimensions'][name] = {'size': len(dim), 'unlimited': dim.isunlimited()}
+
+        for name, ncvar in self.nchandle.variables.items():
+            header['variables'][name] = {'dimensions': ncvar.dimensions,
+                                         'shape': ncvar.shape,
+                                         'dtype': str(ncvar.dtype),
+                                         'attributes': ncvar.__dict__}
+        return header
+
     def get_vars(self):
         self.variables = self.nchandle.variables
         return self.variables
@@ -69,11 +143,767 @@ class EcoFOCI_netCDF(object):
                 data[v] = None
         return (data)
 
+    def ncreadfile_lazy(self, variables=None, max_bytes=None):
+        """dict-like alternative to ncreadfile_dic that reads on first access
+
+        Parameters
+        ----------
+        variables : list
+            only expose these variables (default: all variables in file)
+        max_bytes : int
+            evict least recently used arrays once the cache exceeds this size
+
+        """
+        return EcoFOCI_netCDF_lazy(self.nchandle, variables=variables, max_bytes=max_bytes)
+
+    def get_datetime64(self, index=slice(None)):
+        """record times as datetime64[ms] for EPIC (time/time2) or CF time"""
+        nctime = self.nchandle.variables['time']
+
+        if 'time2' in self.nchandle.variables.keys():
+            # true julian day 2440000 is 1968-05-23
+            jday = np.asarray(nctime[index], dtype='int64')
+            msec = np.asarray(self.nchandle.variables['time2'][index], dtype='int64')
+            return (np.datetime64('1968-05-23', 'ms')
+                    + (jday - 2440000).astype('timedelta64[D]')
+                    + msec.astype('timedelta64[ms]'))
+        else:
+            dt = num2date(nctime[index], nctime.units, getattr(nctime, 'calendar', 'standard'),
+                          only_use_cftime_datetimes=False, only_use_python_datetimes=True)
+            return np.asarray(dt, dtype='datetime64[ms]')
+
+    def get_time_slice(self, start=None, end=None):
+        """record slice covering start <= time <= end (datetimes, None is open ended)
+
+        Only the time coordinate is read.  EPIC (time/time2) and CF (units since)
+        time are supported, time is assumed to increase monotonically.
+        """
+        nctime = self.nchandle.variables['time']
+
+        if 'time2' in self.nchandle.variables.keys():
+            # compare as msec since the epic reference (true julian day 0)
+            times = (np.asarray(nctime[:], dtype='int64') * 86400000
+                     + np.asarray(self.nchandle.variables['time2'][:], dtype='int64'))
+
+            def to_ncnum(dt):
+                (jday, msec) = Datetime2EPIC(dt)
+                return jday * 86400000 + msec
+        else:
+            times = np.asarray(nctime[:])
+
+            def to_ncnum(dt):
+                return date2num(dt, nctime.units, getattr(nctime, 'calendar', 'standard'))
+
+        start_ind = 0 if start is None else np.searchsorted(times, to_ncnum(start), side='left')
+        end_ind = len(times) if end is None else np.searchsorted(times, to_ncnum(end), side='right')
+
+        return slice(int(start_ind), int(end_ind))
+
+    def ncreadfile_subset(self, variables=None, time_window=None, depth_index=None,
+                          lat_index=None, lon_index=None):
+        """read only the requested hyperslab of each variable
+
+        Parameters
+        ----------
+        variables : list
+            variables to read (default: all)
+        time_window : tuple
+            (start, end) datetimes, either may be None
+        depth_index, lat_index, lon_index : int or slice
+            index along the depth/lat/lon dimension (default: all)
+
+        Integer indices drop that dimension from the returned arrays (as
+        netCDF4 indexing does).
+        """
+        if variables is None:
+            variables = list(self.nchandle.variables.keys())
+
+        dim_index = {}
+        if time_window is not None:
+            dim_index['time'] = self.get_time_slice(*time_window)
+        for dims, index in [(depth_dims, depth_index), (lat_dims, lat_index),
+                            (lon_dims, lon_index)]:
+            if index is not None:
+                dim_index.update({dim: index for dim in dims})
+
+        data = {}
+        for v in variables:
+            ncvar = self.nchandle.variables[v]
+            hyperslab = tuple([dim_index.get(dim, slice(None)) for dim in ncvar.dimensions])
+            data[v] = ncvar[hyperslab]
+        return (data)
+
+    def iter_chunks(self, variables=None, chunk_len=100000):
+        """iterate over the file in blocks of chunk_len records
+
+        Parameters
+        ----------
+        variables : list
+            variables to read (default: all)
+        chunk_len : int
+            number of time records per block
+
+        Yields
+        ------
+        (offset, time, data) with offset the first record of the block, time
+        the block's datetime64[ms] times (see get_datetime64) and data a
+        dictionary of the block of each variable.  Variables without a time
+        dimension (depth, lat, lon) are read once and passed with every block.
+        """
+        if variables is None:
+            variables = list(self.nchandle.variables.keys())
+
+        time_dim = self.nchandle.variables['time'].dimensions[0]
+        nrec = len(self.nchandle.dimensions[time_dim])
+
+        static = {}
+        for v in variables:
+            if time_dim not in self.nchandle.variables[v].dimensions:
+                static[v] = self.nchandle.variables[v][:]
+
+        for offset in range(0, nrec, chunk_len):
+            chunk = slice(offset, min(offset + chunk_len, nrec))
+            data = {}
+            for v in variables:
+                if v in static:
+                    data[v] = static[v]
+                    continue
+                ncvar = self.nchandle.variables[v]
+                hyperslab = tuple([chunk if dim == time_dim else slice(None)
+                                   for dim in ncvar.dimensions])
+                data[v] = ncvar[hyperslab]
+            yield (offset, self.get_datetime64(chunk), data)
+
+    def get_squeezed(self, var_name, index=None, float32=False, missing_values=1e35):
+        """contiguous float array of a variable with singleton dimensions removed
+
+        Parameters
+        ----------
+        var_name : str
+            variable to read
+        index : tuple
+            hyperslab to read (default: all of every non-singleton dimension)
+        float32 : bool
+            keep float32 variables as float32 instead of upcasting to float64
+            (and unpack packed variables to float32)
+        missing_values : float
+            values >= 0.1 * missing_values (and _FillValue) are returned as nan
+
+        The array is read straight from the file without masking, so float
+        variables come back as views of the read buffer rather than copies.
+        Packed integer variables (scale_factor/add_offset) are unpacked.
+        """
+        ncvar = self.nchandle.variables[var_name]
+        if index is None:
+            index = tuple([slice(None) if size > 1 else 0 for size in ncvar.shape])
+
+        (auto_mask, auto_scale) = (ncvar.mask, ncvar.scale)
+        ncvar.set_auto_maskandscale(False)
+        try:
+            data = ncvar[index]
+        finally:
+            ncvar.set_auto_mask(auto_mask)
+            ncvar.set_auto_scale(auto_scale)
+
+        atts = ncvar.ncattrs()
+        fill = np.zeros(np.shape(data), dtype=bool)
+        if '_FillValue' in atts:
+            fill = (data == ncvar.getncattr('_FillValue'))
+
+        if 'scale_factor' in atts or 'add_offset' in atts:
+            dtype = np.float32 if float32 else np.float64
+            data = np.array(data, dtype=dtype)
+            if 'scale_factor' in atts:
+                data *= dtype(ncvar.getncattr('scale_factor'))
+            if 'add_offset' in atts:
+                data += dtype(ncvar.getncattr('add_offset'))
+        elif float32 and data.dtype == np.float32:
+            data = np.ascontiguousarray(data)
+        else:
+            data = np.ascontiguousarray(data, dtype=np.float64)
+
+        missing = fill | (data >= 0.1 * missing_values)
+        np.putmask(data, missing, np.nan)
+        return data
+
+    def get_timeseries(self, var_name, depth_index=0, float32=False):
+        """1-D time series of an EPIC (time, depth, lat, lon) variable, see get_squeezed"""
+        return self.get_squeezed(var_name, (slice(None), depth_index, 0, 0), float32=float32)
+
+    def get_profile(self, var_name, time_index=0, float32=False):
+        """1-D profile of an EPIC (time, depth, lat, lon) variable, see get_squeezed"""
+        return self.get_squeezed(var_name, (time_index, slice(None), 0, 0), float32=float32)
+
     def add_history(self, prev_history, new_history):
         """Adds timestamp (UTC time) and history to existing information"""
-        self.nchandle.setncattr('History', prev_history + '\n' 
-                + datetime.datetime.utcnow().strftime("%B %d, %Y %H:%M UTC")\
-                + ' ' + new_history)
+        history = (prev_history + '\n'
+                   + datetime.datetime.utcnow().strftime("%B %d, %Y %H:%M UTC")
+                   + ' ' + new_history)
+        self.set_global_atts('History', history)
 
     def close(self):
-        self.nchandle.close()
+        if self.pool is None:
+            self.nchandle.close()
+        else:
+            self.pool.release(self.nchandle)
+
+
+class EcoFOCI_netCDF_lazy(Mapping):
+    """Read-on-demand mapping of variable name to data array.
+
+    Each variable is read from the open netcdf handle the first time it is
+    accessed and cached; with max_bytes set the least recently used arrays are
+    dropped (and re-read if needed again) to stay within the budget.
+    """
+
+    def __init__(self, nchandle, variables=None, max_bytes=None):
+        self.nchandle = nchandle
+        if variables is None:
+            self.var_names = list(nchandle.variables.keys())
+        else:
+            self.var_names = [v for v in variables if v in nchandle.variables.keys()]
+        self.max_bytes = max_bytes
+        self.cached_bytes = 0
+        self._cache = OrderedDict()
+
+    def __getitem__(self, var_name):
+        if var_name not in self.var_names:
+            raise KeyError(var_name)
+
+        if var_name in self._cache:
+            self._cache.move_to_end(var_name)
+            return self._cache[var_name]
+
+        data = self.nchandle.variables[var_name][:]
+        self._cache[var_name] = data
+        self.cached_bytes += data.nbytes
+        self._evict()
+        return data
+
+    def __contains__(self, var_name):
+        return var_name in self.var_names
+
+    def __iter__(self):
+        return iter(self.var_names)
+
+    def __len__(self):
+        return len(self.var_names)
+
+    def _evict(self):
+        # always keep the most recent array even if it alone exceeds the budget
+        if self.max_bytes is None:
+            return
+        while self.cached_bytes > self.max_bytes and len(self._cache) > 1:
+            (var_name, data) = self._cache.popitem(last=False)
+            self.cached_bytes -= data.nbytes
+
+
+class EcoFOCI_netCDF_aggregate(object):
+    """A list of EPIC/CF files (eg the mooring_files of a pointer file) read as
+    one virtual time series.
+
+    Files are ordered by their first time, overlapping records are taken from
+    the earlier file (overlap='first') or the later file (overlap='last').  A
+    file may supply several segments, eg the records before and after a
+    shorter file nested inside it with overlap='last'.
+    Only the time coordinates are read to build the index; variable reads
+    only touch the files (and records) that the requested range spans.  Pass
+    an EcoFOCI_netCDF_pool to keep the files open between reads.
+    """
+
+    def __init__(self, file_names, overlap='first', pool=None):
+        if overlap not in ['first', 'last']:
+            raise RuntimeError('overlap must be first or last, not {0}'.format(overlap))
+        self.file_names = list(file_names)
+        self.overlap = overlap
+        self.pool = pool
+        self._segments = None
+
+    def _build_index(self):
+        times = []
+        for file_name in self.file_names:
+            df = EcoFOCI_netCDF(file_name, mode='r', pool=self.pool)
+            times.append(df.get_datetime64())
+            df.close()
+
+        # files claim the time ranges not yet covered in priority order (earliest
+        # start first for overlap='first', latest start first for 'last'), so a
+        # file with a shorter one nested inside it supplies the pieces on either side
+        order = sorted([i for i in range(len(times)) if len(times[i])],
+                       key=lambda i: times[i][0], reverse=(self.overlap == 'last'))
+
+        # each segment is (file_name, first record, last record + 1, times)
+        segments = []
+        for i in order:
+            keep = np.ones(len(times[i]), dtype=bool)
+            for seg in segments:
+                keep &= (times[i] < seg[3][0]) | (times[i] > seg[3][-1])
+            edges = np.flatnonzero(np.diff(np.concatenate(([0], keep.astype('int8'), [0]))))
+            for start, stop in zip(edges[0::2], edges[1::2]):
+                segments.append((self.file_names[i], int(start), int(stop), times[i][start:stop]))
+
+        segments.sort(key=lambda seg: seg[3][0])
+        self._segments = segments
+        self._offsets = np.cumsum([0] + [seg[2] - seg[1] for seg in segments])
+
+    @property
+    def segments(self):
+        """(file_name, first record, last record + 1) of each piece in time order"""
+        if self._segments is None:
+            self._build_index()
+        return [seg[0:3] for seg in self._segments]
+
+    def __len__(self):
+        if self._segments is None:
+            self._build_index()
+        return int(self._offsets[-1])
+
+    def get_datetime64(self):
+        """times of the virtual record as datetime64[ms]"""
+        if self._segments is None:
+            self._build_index()
+        return np.concatenate([seg[3] for seg in self._segments])
+
+    def read(self, var_name, start=None, stop=None, index=()):
+        """records start:stop of var_name across file boundaries
+
+        index is applied to the remaining dimensions eg (0, 0, 0) for an EPIC
+        timeseries variable.
+        """
+        if self._segments is None:
+            self._build_index()
+        (start, stop, step) = slice(start, stop).indices(len(self))
+
+        data = []
+        for seg, offset in zip(self._segments, self._offsets):
+            seg_start = max(start - offset, 0) + seg[1]
+            seg_stop = min(stop - offset, seg[2] - seg[1]) + seg[1]
+            if seg_stop <= seg_start:
+                continue
+            df = EcoFOCI_netCDF(seg[0], mode='r', pool=self.pool)
+            data.append(df.nchandle.variables[var_name][(slice(seg_start, seg_stop),) + tuple(index)])
+            df.close()
+
+        if not data:
+            return np.ma.array([])
+        return np.ma.concatenate(data)
+
+
+class EcoFOCI_netCDF_ragged(EcoFOCI_netCDF):
+    """Profile by profile access to the ragged files of EcoFOCI_netCDF_write.
+
+    contiguous : NetCDF_Create_Profile_RaggedContiguous (CF row_size), the
+        cumulative row_size offsets are computed once, any profile or range of
+        profiles is then a single contiguous read
+    2D : NetCDF_Create_Profile_Ragged2D (profile_number, obs_num), a profile is a
+        row of the file without the observations that are missing in every
+        variable, the same observations are kept for all variables so they
+        stay aligned (a variable missing where another is valid is masked).
+        Finding those (valid) reads every observation variable of the file
+        once, chunk_len profiles at a time, on the first row_sizes/read/
+        iter_profiles call
+    1D : NetCDF_Create_Profile_Ragged1D (record_number), profiles are the runs of
+        equal profile_var values (without profile_var the file is one profile)
+    """
+
+    def __init__(self, file_name=None, mode='r', pool=None, profile_var=None,
+                 missing_values=99999, chunk_len=1000):
+        EcoFOCI_netCDF.__init__(self, file_name, mode, pool)
+        self.profile_var = profile_var
+        self.chunk_len = chunk_len
+        self.missing_values = missing_values
+        self._offsets = None
+        self._valid = None
+
+        dims = self.nchandle.dimensions.keys()
+        sample = [v for v in self.nchandle.variables.values()
+                  if 'sample_dimension' in v.ncattrs()]
+        if sample:
+            self.layout = 'contiguous'
+            self.row_size_var = sample[0].name
+            self.obs_dims = (sample[0].getncattr('sample_dimension'),)
+        elif 'profile_number' in dims and 'obs_num' in dims:
+            self.layout = '2D'
+            self.obs_dims = ('profile_number', 'obs_num')
+        elif 'record_number' in dims:
+            self.layout = '1D'
+            self.obs_dims = ('record_number',)
+        else:
+            raise RuntimeError('{0} is not a ragged profile file.'.format(file_name))
+
+    @property
+    def offsets(self):
+        """index of the first observation of each profile (and one past the last)"""
+        if self._offsets is None and self.layout == 'contiguous':
+            row_size = self.nchandle.variables[self.row_size_var][:]
+            self._offsets = np.concatenate(([0], np.cumsum(row_size, dtype=np.int64)))
+        elif self._offsets is None and self.layout == '1D':
+            nobs = len(self.nchandle.dimensions[self.obs_dims[0]])
+            if self.profile_var is None:
+                self._offsets = np.array([0, nobs])
+            else:
+                ids = self.nchandle.variables[self.profile_var][:]
+                breaks = np.flatnonzero(ids[1:] != ids[:-1]) + 1
+                self._offsets = np.concatenate(([0], breaks, [nobs]))
+        return self._offsets
+
+    @property
+    def valid(self):
+        """2D files: (profile, obs) mask of the observations that are kept,
+        those valid in any observation variable (read chunk_len profiles at a time)"""
+        if self._valid is None and self.layout == '2D':
+            shape = tuple([len(self.nchandle.dimensions[d]) for d in self.obs_dims])
+            valid = np.zeros(shape, dtype=bool)
+            for v in self.get_vars():
+                ncvar = self.nchandle.variables[v]
+                for block in range(0, shape[0], self.chunk_len):
+                    block_stop = min(block + self.chunk_len, shape[0])
+                    valid[block:block_stop] |= ~np.ma.getmaskarray(self._masked(ncvar[block:block_stop]))
+            self._valid = valid
+        return self._valid
+
+    def __len__(self):
+        if self.layout == '2D':
+            return len(self.nchandle.dimensions[self.obs_dims[0]])
+        return len(self.offsets) - 1
+
+    def get_vars(self):
+        """variables holding observations (not the per profile or coordinate ones)"""
+        return [name for name, ncvar in self.nchandle.variables.items()
+                if ncvar.dimensions == self.obs_dims and name not in self.nchandle.dimensions]
+
+    def _masked(self, data):
+        return np.ma.masked_equal(data, self.missing_values)
+
+    def row_sizes(self, start=None, stop=None):
+        """number of observations of profiles start:stop"""
+        (start, stop, step) = slice(start, stop).indices(len(self))
+        if self.layout == '2D':
+            return self.valid[start:stop].sum(axis=1)
+        return np.diff(self.offsets[start:stop + 1])
+
+    def read(self, var_name, start=None, stop=None):
+        """observations of profiles start:stop, concatenated in file order"""
+        (start, stop, step) = slice(start, stop).indices(len(self))
+        ncvar = self.nchandle.variables[var_name]
+        if self.layout == '2D':
+            return self._masked(ncvar[start:stop])[self.valid[start:stop]]
+        return self._masked(ncvar[self.offsets[start]:self.offsets[stop]])
+
+    def read_profile(self, var_name, profile):
+        """observations of a single profile"""
+        if profile < 0:
+            profile += len(self)
+        return self.read(var_name, profile, profile + 1)
+
+    def iter_profiles(self, variables=None, chunk_len=100):
+        """yield (profile, {variable: observations}) for every profile
+
+        chunk_len profiles are read per variable at a time, so the whole
+        collection is never held in memory.
+        """
+        if variables is None:
+            variables = self.get_vars()
+
+        for block in range(0, len(self), chunk_len):
+            block_stop = min(block + chunk_len, len(self))
+            if self.layout == '2D':
+                rows = dict([(v, self._masked(self.nchandle.variables[v][block:block_stop]))
+                             for v in variables])
+                valid = self.valid[block:block_stop]
+                for i in range(block_stop - block):
+                    yield (block + i, dict([(v, rows[v][i][valid[i]]) for v in variables]))
+            else:
+                offsets = self.offsets[block:block_stop + 1] - self.offsets[block]
+                data = dict([(v, self.read(v, block, block_stop)) for v in variables])
+                for i in range(block_stop - block):
+                    yield (block + i, dict([(v, data[v][offsets[i]:offsets[i + 1]])
+                                            for v in variables]))
+
+
+class EcoFOCI_netCDF_pool(object):
+    """LRU pool of open netCDF4.Dataset handles shared between readers.
+
+    Handles are reference counted: acquire/release (or the handle context
+    manager, or EcoFOCI_netCDF(..., pool=pool)) and only idle handles are
+    closed when more than max_open files are open.  An idle handle whose file
+    mtime has changed since it was opened is reopened on the next acquire;
+    handles still in use are shared as is, and writable handles are synced
+    and take the new mtime on release so their own edits do not retire them.
+    """
+
+    def __init__(self, max_open=32):
+        self.max_open = max_open
+        self._handles = OrderedDict()  # (path, mode) -> entry, least recent first
+        self._entries = {}  # id(nchandle) -> entry, includes invalidated handles
+        self._lock = threading.RLock()
+
+    def acquire(self, file_name, mode='r'):
+        """open (or reuse) file_name and return the netCDF4.Dataset"""
+        key = (os.path.abspath(file_name), mode)
+        mtime = os.stat(file_name).st_mtime
+
+        with self._lock:
+            entry = self._handles.get(key)
+            if entry is not None and entry['refs'] == 0 and entry['mtime'] != mtime:
+                self._retire(key)
+                entry = None
+
+            if entry is None:
+                entry = {'nchandle': Dataset(file_name, mode), 'refs': 0, 'mtime': mtime, 'key': key}
+                self._handles[key] = entry
+                self._entries[id(entry['nchandle'])] = entry
+
+            entry['refs'] += 1
+            self._handles.move_to_end(key)
+            self._evict()
+            return entry['nchandle']
+
+    def release(self, nchandle):
+        """hand back a Dataset returned by acquire"""
+        with self._lock:
+            entry = self._entries[id(nchandle)]
+            entry['refs'] -= 1
+            if entry['key'][1] != 'r' and nchandle.isopen():
+                nchandle.sync()
+                entry['mtime'] = os.stat(entry['key'][0]).st_mtime
+            if entry['refs'] == 0 and self._handles.get(entry['key']) is not entry:
+                self._close(entry)
+            self._evict()
+
+    @contextmanager
+    def handle(self, file_name, mode='r'):
+        nchandle = self.acquire(file_name, mode)
+        try:
+            yield nchandle
+        finally:
+            self.release(nchandle)
+
+    def invalidate(self, file_name=None):
+        """drop the pooled handles of file_name (default: every file)"""
+        with self._lock:
+            for key in list(self._handles.keys()):
+                if file_name is None or key[0] == os.path.abspath(file_name):
+                    self._retire(key)
+
+    def close_all(self):
+        """close every handle, in use or not"""
+        with self._lock:
+            for entry in list(self._entries.values()):
+                self._close(entry)
+            self._handles.clear()
+
+    def _retire(self, key):
+        entry = self._handles.pop(key)
+        if entry['refs'] == 0:
+            self._close(entry)
+
+    def _close(self, entry):
+        self._entries.pop(id(entry['nchandle']), None)
+        entry['nchandle'].close()
+
+    def _evict(self):
+        for key in list(self._handles.keys()):
+            if len(self._handles) <= self.max_open:
+                break
+            if self._handles[key]['refs'] == 0:
+                self._retire(key)
+
+
+class EcoFOCI_netCDF_aggregateTest(unittest.TestCase):
+
+    def setUp(self):
+        import tempfile
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.tmpdir)
+
+    def make_file(self, name, first_hour, nhours, value):
+        """hourly CF timeseries file with T_20 == value"""
+        file_name = os.path.join(self.tmpdir, name)
+        with Dataset(file_name, 'w', format='NETCDF3_CLASSIC') as rootgrp:
+            rootgrp.createDimension('time', None)
+            nctime = rootgrp.createVariable('time', 'f8', ('time',))
+            nctime.units = 'hours since 2016-01-01 00:00:00'
+            nctime[:] = np.arange(first_hour, first_hour + nhours)
+            rootgrp.createVariable('T_20', 'f4', ('time',))[:] = value
+        return file_name
+
+    def test_nested_file(self):
+        # A covers a year, B ten days inside A, C starts after A
+        file_a = self.make_file('a.nc', 0, 365 * 24, 1)
+        file_b = self.make_file('b.nc', 30 * 24, 10 * 24, 2)
+        file_c = self.make_file('c.nc', 365 * 24, 10 * 24, 3)
+        hours = np.arange(375 * 24)
+        expected_times = np.datetime64('2016-01-01', 'ms') + hours.astype('timedelta64[h]')
+
+        for overlap in ['first', 'last']:
+            agg = EcoFOCI_netCDF_aggregate([file_c, file_b, file_a], overlap=overlap)
+            self.assertEqual(len(agg), 375 * 24)
+            self.assertTrue(np.array_equal(agg.get_datetime64(), expected_times))
+
+            expected = np.where(hours < 365 * 24, 1, 3)
+            if overlap == 'first':
+                self.assertEqual(agg.segments, [(file_a, 0, 8760), (file_c, 0, 240)])
+            else:
+                expected[30 * 24:40 * 24] = 2
+                self.assertEqual(agg.segments, [(file_a, 0, 720), (file_b, 0, 240),
+                                                 (file_a, 960, 8760), (file_c, 0, 240)])
+            self.assertTrue(np.array_equal(agg.read('T_20'), expected))
+            # a read spanning the pieces of A and B
+            self.assertTrue(np.array_equal(agg.read('T_20', 700, 1000), expected[700:1000]))
+
+
+class EcoFOCI_netCDF_raggedTest(unittest.TestCase):
+
+    def setUp(self):
+        import tempfile
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.tmpdir)
+
+    def test_2D_alignment(self):
+        file_name = os.path.join(self.tmpdir, 'ragged2d.nc')
+        with Dataset(file_name, 'w', format='NETCDF3_CLASSIC') as rootgrp:
+            rootgrp.createDimension('profile_number', 2)
+            rootgrp.createDimension('obs_num', 4)
+            # the last observation of profile 0 and the last two of profile 1
+            # are unused, T_20 is missing where P_1 is valid
+            rootgrp.createVariable('T_20', 'f4', ('profile_number', 'obs_num'))[:] = \
+                [[1, 99999, 3, 99999], [4, 99999, 99999, 99999]]
+            rootgrp.createVariable('P_1', 'f4', ('profile_number', 'obs_num'))[:] = \
+                [[10, 20, 30, 99999], [40, 50, 99999, 99999]]
+
+        # valid is built one profile at a time
+        df = EcoFOCI_netCDF_ragged(file_name, chunk_len=1)
+        try:
+            self.assertEqual(df.row_sizes().tolist(), [3, 2])
+            self.assertEqual(df.read_profile('T_20', 0).tolist(), [1, None, 3])
+            self.assertEqual(df.read_profile('P_1', 0).tolist(), [10, 20, 30])
+            self.assertEqual(df.read('T_20').tolist(), [1, None, 3, 4, None])
+            profiles = list(df.iter_profiles(chunk_len=1))
+            self.assertEqual([p for (p, data) in profiles], [0, 1])
+            self.assertEqual(profiles[1][1]['T_20'].tolist(), [4, None])
+            self.assertEqual(profiles[1][1]['P_1'].tolist(), [40, 50])
+        finally:
+            df.close()
+
+    def test_1D_vars(self):
+        file_name = os.path.join(self.tmpdir, 'ragged1d.nc')
+        with Dataset(file_name, 'w', format='NETCDF3_CLASSIC') as rootgrp:
+            rootgrp.createDimension('record_number', 5)
+            rootgrp.createVariable('record_number', 'f4', ('record_number',))[:] = range(5)
+            rootgrp.createVariable('profile', 'f4', ('record_number',))[:] = [1, 1, 2, 2, 2]
+            rootgrp.createVariable('T_20', 'f4', ('record_number',))[:] = [1, 2, 3, 99999, 5]
+
+        df = EcoFOCI_netCDF_ragged(file_name, profile_var='profile')
+        try:
+            # the record_number coordinate is not an observation variable
+            self.assertEqual(df.get_vars(), ['profile', 'T_20'])
+            self.assertEqual(df.row_sizes().tolist(), [2, 3])
+            self.assertEqual(df.read_profile('T_20', 1).tolist(), [3, None, 5])
+            self.assertEqual(sorted(dict(df.iter_profiles())[0].keys()), ['T_20', 'profile'])
+        finally:
+            df.close()
+
+
+class EcoFOCI_netCDF_poolTest(unittest.TestCase):
+
+    def setUp(self):
+        import tempfile
+        self.tmpdir = tempfile.mkdtemp()
+        self.file_names = []
+        for n in range(3):
+            file_name = os.path.join(self.tmpdir, 'f{0}.nc'.format(n))
+            with Dataset(file_name, 'w', format='NETCDF3_CLASSIC') as rootgrp:
+                rootgrp.createDimension('time', 4)
+                rootgrp.createVariable('T_20', 'f4', ('time',))[:] = n
+            self.file_names.append(file_name)
+        self.pool = EcoFOCI_netCDF_pool(max_open=2)
+
+    def tearDown(self):
+        import shutil
+        self.pool.close_all()
+        shutil.rmtree(self.tmpdir)
+
+    def touch(self, file_name):
+        st = os.stat(file_name)
+        os.utime(file_name, (st.st_atime, st.st_mtime + 10))
+
+    def test_refcount(self):
+        h1 = self.pool.acquire(self.file_names[0])
+        h2 = self.pool.acquire(self.file_names[0])
+        self.assertIs(h1, h2)
+        self.pool.release(h1)
+        self.assertTrue(h2.isopen())
+        self.pool.release(h2)
+        # idle handles stay open for reuse
+        self.assertTrue(h1.isopen())
+        with self.pool.handle(self.file_names[0]) as h3:
+            self.assertIs(h1, h3)
+        df = EcoFOCI_netCDF(self.file_names[0], mode='r', pool=self.pool)
+        self.assertIs(df.nchandle, h1)
+        df.close()
+        self.assertTrue(h1.isopen())
+
+    def test_eviction(self):
+        busy = self.pool.acquire(self.file_names[0])
+        idle = self.pool.acquire(self.file_names[1])
+        self.pool.release(idle)
+        last = self.pool.acquire(self.file_names[2])
+        # the least recently used idle handle goes, the one in use stays
+        self.assertFalse(idle.isopen())
+        self.assertTrue(busy.isopen())
+        self.assertTrue(last.isopen())
+        # nothing is idle, so max_open is exceeded until a release
+        again = self.pool.acquire(self.file_names[1])
+        self.assertTrue(busy.isopen() and last.isopen() and again.isopen())
+        self.pool.release(busy)
+        self.assertFalse(busy.isopen())
+        self.pool.release(last)
+        self.pool.release(again)
+
+    def test_invalidation(self):
+        h1 = self.pool.acquire(self.file_names[0])
+        self.pool.release(h1)
+        self.touch(self.file_names[0])
+        h2 = self.pool.acquire(self.file_names[0])
+        self.assertIsNot(h1, h2)
+        self.assertFalse(h1.isopen())
+
+        # a handle in use is shared even though the file changed
+        self.touch(self.file_names[0])
+        h3 = self.pool.acquire(self.file_names[0])
+        self.assertIs(h2, h3)
+        self.pool.release(h3)
+
+        # explicit invalidation closes h2 once it is released
+        self.pool.invalidate(self.file_names[0])
+        self.assertTrue(h2.isopen())
+        self.pool.release(h2)
+        self.assertFalse(h2.isopen())
+
+    def test_writer_is_not_retired(self):
+        h1 = self.pool.acquire(self.file_names[0], 'a')
+        h1.variables['T_20'][:] = 5
+        h1.sync()
+        h2 = self.pool.acquire(self.file_names[0], 'a')
+        self.assertIs(h1, h2)
+        self.pool.release(h2)
+        h1.variables['T_20'][0] = 6
+        self.pool.release(h1)
+        # the handle's own writes do not retire it
+        h3 = self.pool.acquire(self.file_names[0], 'a')
+        self.assertIs(h1, h3)
+        self.pool.release(h3)
+        self.pool.close_all()
+        with Dataset(self.file_names[0]) as rootgrp:
+            self.assertEqual(rootgrp.variables['T_20'][:].tolist(), [6, 5, 5, 5])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,6 +8,26 @@
  
   History:
  --------
+ 2026-10-19: unittests for template clones and diskless files
+ 2026-10-19: global attributes set after variable_init are written to the file, adding
+    dimensions or variables after it raises (both used to be dropped silently)
+ 2026-10-19: pack_data only treats values >= 0.1 * missing_values as missing for the 1e35
+    convention (99999 is matched exactly), add unittests
+ 2026-10-19: NetCDF_Create base class holds file_create/add_data/add_history/close of the
+    writer classes.  file_create() now returns the NetCDF_Writer and rootgrpID is None
+    until variable_init (the Dataset used to be returned and opened by file_create)
+ 2026-10-19: diskless=True builds files in memory, flushed to a temporary file and renamed on close
+ 2026-10-19: Optional integer packing (scale_factor/add_offset) from the EPIC key 'pack' spec
+ 2026-10-19: Add a class for CF contiguous ragged profiles (row_size, no padding)
+ 2026-10-19: template=True clones same-layout files from a defined template
+ 2026-10-19: NetCDF_Writer - the classes collect a schema (globals, dimensions, variable
+    table) and write the file in one define pass from variable_init
+ 2026-10-19: Streaming NetCDF_Create_Timeseries (unlimited time, append blocks of records)
+ 2026-10-19: Promote netcdf3 output to NETCDF3_64BIT_OFFSET/NETCDF3_64BIT_DATA when the
+    projected size exceeds the format limits
+ 2026-10-19: Add NETCDF4/NETCDF4_CLASSIC output with zlib compression and chunking
+ 2026-10-19: Reserve free header space (header_pad) so later attribute edits (History)
+    don't force netcdf3 to rewrite the whole file. Python 3 syntax.
  2016-12-19: Add a class for ragged arrays (1D and 2D) - 1D is continuous file
  2016-12-16: Add a class for CF time conventions (1D and 2D) TODO: merge into other classes
  2016-09-16: Add a class for copying the existing structure of a file 
@@ -20,24 +40,522 @@
 """
 
 # Standard library.
-import datetime, os
+import atexit, datetime, os, shutil, tempfile, unittest
+from collections import OrderedDict
 
 # Scientific stack.
 import numpy as np
-from netCDF4 import Dataset
+from netCDF4 import Dataset, default_fillvals
+
+# User stack.
+from io_utils.EcoFOCI_netCDF3_mmap import attribute_size
 
 __author__   = 'Shaun Bell'
 __email__    = 'shaun.bell@noaa.gov'
-__created__  = datetime.datetime(2014, 01, 13)
-__modified__ = datetime.datetime(2014, 12, 02)
+__created__  = datetime.datetime(2014, 1, 13)
+__modified__ = datetime.datetime(2014, 12, 2)
 __version__  = "0.4.0"
 __status__   = "Development"
 
 
+"""-------------------------------Header Space-----------------------------------------"""
+
+HEADER_PAD_ATT = 'HEADER_PAD'
+
+def reserve_header(rootgrpID, header_pad):
+    """Hold header_pad bytes of the classic format header with a placeholder attribute
+
+    netcdf3 places the data right after the header, so a header that later outgrows
+    its allocation (eg add_history) forces every data byte to be moved.  Once the
+    placeholder has been laid out it is removed by release_header, the data offsets
+    stay where they are and the freed bytes take later header growth.
+    """
+    if header_pad and rootgrpID.data_model.startswith('NETCDF3'):
+        rootgrpID.setncattr(HEADER_PAD_ATT, ' ' * header_pad)
+
+def release_header(rootgrpID):
+    """Drop the placeholder of reserve_header"""
+    if HEADER_PAD_ATT in rootgrpID.ncattrs():
+        rootgrpID.delncattr(HEADER_PAD_ATT)
+
+def header_size(global_atts, dimensions, var_table):
+    """Upper bound of the netcdf3 header size (bytes) for a schema (CDF5 field sizes)"""
+    def name_size(name):
+        nchars = len(name.encode('utf-8'))
+        return 8 + nchars + (-nchars % 4)
+
+    size = 4 + 8 + 3 * 12
+    size += sum([attribute_size(name, value, 'NETCDF3_64BIT_DATA')
+                 for name, value in global_atts.items()])
+    size += sum([name_size(name) + 8 for name in dimensions.keys()])
+    for (name, datatype, dims, attributes) in var_table:
+        ndims = 1 if isinstance(dims, str) else len(dims)
+        size += name_size(name) + 8 + 8 * ndims + 12 + 4 + 8 + 8
+        size += sum([attribute_size(att, value, 'NETCDF3_64BIT_DATA')
+                     for att, value in attributes.items()])
+    return size
+
+
+"""-------------------------------Large Files------------------------------------------"""
+
+# netcdf3 variants in order of capacity
+nc3_formats = ['NETCDF3_CLASSIC', 'NETCDF3_64BIT_OFFSET', 'NETCDF3_64BIT_DATA']
+# classic: 32-bit offsets (keep 1MiB for the header), 64-bit offset: 32-bit variable sizes
+CLASSIC_LIMIT = 2**31 - 2**20
+OFFSET64_VAR_LIMIT = 2**32 - 4
+
+def projected_format(nc_format, var_bytes):
+    """Smallest netcdf3 variant that holds variables of var_bytes bytes (never smaller
+    than nc_format, netcdf4 formats are returned unchanged)"""
+    if nc_format not in nc3_formats or not var_bytes:
+        return nc_format
+
+    if sum(var_bytes) < CLASSIC_LIMIT:
+        projected = 'NETCDF3_CLASSIC'
+    elif max(var_bytes) < OFFSET64_VAR_LIMIT:
+        projected = 'NETCDF3_64BIT_OFFSET'
+    else:
+        projected = 'NETCDF3_64BIT_DATA'
+    return nc3_formats[max(nc3_formats.index(projected), nc3_formats.index(nc_format))]
+
+
+"""-------------------------------Compression------------------------------------------"""
+
+# target bytes per chunk, chunks run along time so time-series reads touch few chunks
+CHUNK_BYTES = 1048576
+
+def compression_opts(zlib=False, complevel=4, shuffle=True, chunksizes=None):
+    """Compression settings used by create_variable (NETCDF4 formats only)
+
+    Parameters
+    ----------
+    zlib : bool
+        deflate the variables
+    complevel : int
+        zlib level 1-9
+    shuffle : bool
+        byte shuffle before deflating (helps slowly varying float series)
+    chunksizes : dict
+        {variable name: chunk shape}, variables not listed get auto_chunksizes
+
+    """
+    if not zlib and not chunksizes:
+        return None
+    return {'zlib': zlib, 'complevel': complevel, 'shuffle': shuffle,
+            'chunksizes': chunksizes or {}}
+
+def auto_chunksizes(rootgrpID, datatype, dimensions, chunk_bytes=CHUNK_BYTES):
+    """Chunk shape of about chunk_bytes holding a run of the first (time) dimension
+    with all of the remaining dimensions"""
+    if not dimensions:
+        return None
+    sizes = [max(len(rootgrpID.dimensions[dim]), 1) for dim in dimensions]
+    record_bytes = int(np.prod(sizes[1:])) * np.dtype(datatype).itemsize
+    nrec = max(chunk_bytes // record_bytes, 1)
+    if not rootgrpID.dimensions[dimensions[0]].isunlimited():
+        nrec = min(nrec, sizes[0])
+    return [nrec] + sizes[1:]
+
+def create_variable(rootgrpID, var_name, datatype, dimensions, compression=None, fill_value=None):
+    """createVariable with the compression options of file_create applied"""
+    if not compression or not rootgrpID.data_model.startswith('NETCDF4'):
+        return rootgrpID.createVariable(var_name, datatype, dimensions, fill_value=fill_value)
+
+    if isinstance(dimensions, str):
+        dimensions = (dimensions,)
+    chunksizes = compression['chunksizes'].get(var_name)
+    if chunksizes is None:
+        chunksizes = auto_chunksizes(rootgrpID, datatype, dimensions)
+
+    return rootgrpID.createVariable(var_name, datatype, dimensions,
+                                    zlib=compression['zlib'],
+                                    complevel=compression['complevel'],
+                                    shuffle=compression['shuffle'],
+                                    chunksizes=chunksizes,
+                                    fill_value=fill_value)
+
+
+"""-------------------------------Packing----------------------------------------------"""
+
+def epic_pack(epic_key, attributes):
+    """datatype of an EPIC key dictionary entry, f4 unless it has a packing spec
+
+    pack: {dtype: i2, scale_factor: 0.001, add_offset: 10.0}  (fill_value optional)
+    stores rint((value - add_offset) / scale_factor) in the integer dtype, the
+    scale_factor/add_offset/_FillValue attributes are added to attributes.
+    """
+    pack = epic_key.get('pack')
+    if not pack:
+        return 'f4'
+
+    dtype = np.dtype(pack['dtype'])
+    if dtype.kind not in 'iu':
+        raise RuntimeError('pack dtype must be an integer type, not {0}'.format(pack['dtype']))
+    attributes['scale_factor'] = np.float32(pack.get('scale_factor', 1.0))
+    attributes['add_offset'] = np.float32(pack.get('add_offset', 0.0))
+    attributes['_FillValue'] = dtype.type(pack.get('fill_value', default_fillvals[dtype.str[1:]]))
+    return dtype.str[1:]
+
+def pack_data(data, dtype, scale_factor=1.0, add_offset=0.0, fill_value=None, missing_values=1e35):
+    """data as rint((data - add_offset) / scale_factor) in integer dtype
+
+    nan, masked, missing and out of range values are stored as fill_value.
+    Missing is >= 0.1 * missing_values for the EPIC 1e35 convention (float32
+    round off), otherwise values equal to missing_values (eg 99999).
+    """
+    dtype = np.dtype(dtype)
+    if fill_value is None:
+        fill_value = default_fillvals[dtype.str[1:]]
+
+    data = np.ma.filled(np.ma.asarray(data, dtype=np.float64), np.nan)
+    packed = np.rint((data - add_offset) / scale_factor)
+    info = np.iinfo(dtype)
+    with np.errstate(invalid='ignore'):
+        if missing_values >= 1e34:
+            missing = np.abs(data) >= 0.1 * missing_values
+        else:
+            missing = data == missing_values
+        bad = ~((packed >= info.min) & (packed <= info.max)) | missing
+    packed[bad] = fill_value
+    return packed.astype(dtype)
+
+def put_data(ncvar, index, data, missing_values=1e35):
+    """ncvar[index] = data, packed (see pack_data) if ncvar has scale_factor/add_offset"""
+    atts = ncvar.ncattrs()
+    if 'scale_factor' not in atts and 'add_offset' not in atts:
+        ncvar[index] = data
+        return
+
+    packed = pack_data(data, ncvar.dtype,
+                       ncvar.getncattr('scale_factor') if 'scale_factor' in atts else 1.0,
+                       ncvar.getncattr('add_offset') if 'add_offset' in atts else 0.0,
+                       ncvar.getncattr('_FillValue') if '_FillValue' in atts else None,
+                       missing_values)
+    # the caller's handle keeps its auto scale setting
+    auto_scale = ncvar.scale
+    ncvar.set_auto_scale(False)
+    try:
+        ncvar[index] = packed
+    finally:
+        ncvar.set_auto_scale(auto_scale)
+
+
+"""-------------------------------Schema-----------------------------------------------"""
+
+# schema_key -> fully defined template file (see NetCDF_Writer.clone)
+_templates = {}
+
+def clear_templates():
+    """remove the template files made by NetCDF_Writer(template=True)"""
+    for template in _templates.values():
+        if os.path.exists(template):
+            os.remove(template)
+    _templates.clear()
+
+atexit.register(clear_templates)
+
+def var_attributes(name='', long_name='', generic_name='', units='', fortran=None,
+                   var_type=None, epic_code=None):
+    """EPIC variable attributes (in file order), None leaves an attribute out"""
+    atts = OrderedDict([('name', name), ('long_name', long_name), ('generic_name', generic_name)])
+    if fortran is not None:
+        atts['FORTRAN_format'] = fortran
+    atts['units'] = units
+    if var_type is not None:
+        atts['type'] = var_type
+    if epic_code is not None:
+        atts['epic_code'] = epic_code
+    return atts
+
+def epic_var_attributes(epic_key):
+    """attributes of an EPIC key dictionary entry (json/yaml config)"""
+    return var_attributes(epic_key['name'], epic_key['longname'], epic_key['generic_name'],
+                          epic_key['units'], epic_key['fortran'], '', epic_key['EPIC_KEY'])
+
+def ncvar_attributes(ncvar):
+    """attributes of an existing EPIC netcdf variable"""
+    return var_attributes(ncvar.name, ncvar.long_name, ncvar.generic_name, ncvar.units,
+                          ncvar.FORTRAN_format, '', ncvar.epic_code)
+
+def epic_coord_table(dim_vars):
+    """EPIC time/time2/depth/lat/lon rows of a variable table"""
+    return [('time', 'i4', dim_vars[0], var_attributes(units='True Julian Day', fortran='', var_type='EVEN', epic_code=624)),
+            ('time2', 'i4', dim_vars[0], var_attributes(units='msec since 0:00 GMT', fortran='', var_type='EVEN', epic_code=624)),
+            ('depth', 'f4', dim_vars[1], var_attributes(units='dbar', fortran='', var_type='EVEN', epic_code=1)),
+            ('lat', 'f4', dim_vars[2], var_attributes(units='degree_north', fortran='', var_type='EVEN', epic_code=500)),
+            ('lon', 'f4', dim_vars[3], var_attributes(units='degree_west', fortran='', var_type='EVEN', epic_code=501))]
+
+def cf_coord_table(dim_vars, udunits_time_str, depth_type='EVEN'):
+    """CF time (udunits)/depth/lat/lon rows of a variable table"""
+    return [('time', 'f8', dim_vars[0], var_attributes(units=udunits_time_str, fortran='', var_type='EVEN', epic_code=624)),
+            ('depth', 'f4', dim_vars[1], var_attributes(units='dbar', fortran='', var_type=depth_type, epic_code=1)),
+            ('lat', 'f4', dim_vars[2], var_attributes(units='degree_north', fortran='', var_type='EVEN', epic_code=500)),
+            ('lon', 'f4', dim_vars[3], var_attributes(units='degree_west', fortran='', var_type='EVEN', epic_code=501))]
+
+
+class GlobalAtts(OrderedDict):
+    """global attributes of a NetCDF_Writer, set on the file as well once it is defined"""
+
+    def __init__(self, writer):
+        OrderedDict.__init__(self)
+        self.writer = writer
+
+    def __setitem__(self, name, value):
+        OrderedDict.__setitem__(self, name, value)
+        if self.writer.rootgrpID is not None:
+            self.writer.rootgrpID.setncattr(name, value)
+
+    def __delitem__(self, name):
+        OrderedDict.__delitem__(self, name)
+        if self.writer.rootgrpID is not None:
+            self.writer.rootgrpID.delncattr(name)
+
+
+class NetCDF_Writer(object):
+    """ Schema driven netcdf writer behind all of the NCFile Creation classes.
+
+    Global attributes, dimensions and the variable table (name, datatype, dimensions,
+    attributes) are collected first, define() then creates the whole file in one pass
+    (bulk setncatts per variable) and returns the Dataset.  Data is written through
+    the name -> variable dictionary self.variables.
+
+    netCDF4 ends define mode after every call on netcdf3 files, each time moving all of
+    the data if the header outgrew its space.  define() holds header space for the
+    whole schema (plus header_pad for later edits) with the reserve_header placeholder
+    until the first variable is laid out, so the rest of the definitions only fill
+    the header in place.
+
+    Global attributes set after define() are written to the file (GlobalAtts),
+    dimensions and variables can only be added before it.
+
+    template=True is for bulk conversions (one file per cast/instrument): the first
+    file of a schema (dimension sizes included) is defined once into a template file,
+    every later one is a copy of it with the global attributes patched.
+
+    diskless=True builds a netcdf3 file in memory and writes it in one sequential pass
+    on close() to a hidden file next to savefile, which is then renamed onto savefile -
+    a partly written file never shows up under its final name (netcdf4 formats and
+    template clones are written to the hidden file directly, renamed the same way).
+
+    Usage
+    -----
+        writer = NetCDF_Writer(savefile)
+        writer.global_atts.update([('History', '')])
+        writer.add_dimension('time', 100)
+        writer.add_variable('T_20', 'f4', ('time',), var_attributes(...))
+        writer.define()
+        writer.variables['T_20'][:] = data
+        writer.close()
+    """
+
+    def __init__(self, savefile, nc_format='NETCDF3_CLASSIC', header_pad=8192, compression=None,
+                 template=False, diskless=False):
+        self.savefile = savefile
+        self.nc_format = nc_format
+        self.header_pad = header_pad
+        self.compression = compression
+        self.template = template
+        self.diskless = diskless
+        self.tmpfile = None
+        self.rootgrpID = None
+        self.global_atts = GlobalAtts(self)
+        self.dimensions = OrderedDict()
+        self.var_table = []
+        self.variables = {}
+
+    def check_undefined(self, what):
+        if self.rootgrpID is not None:
+            raise RuntimeError('{0} is already defined, {1} must be added before define() '
+                               '(dimension_init before variable_init).'.format(self.savefile, what))
+
+    def add_dimension(self, name, size):
+        """size None is an unlimited dimension"""
+        self.check_undefined('dimension ' + name)
+        self.dimensions[name] = size
+
+    def add_variable(self, name, datatype, dimensions, attributes=None):
+        self.check_undefined('variable ' + name)
+        self.var_table.append((name, datatype, dimensions, attributes or OrderedDict()))
+
+    def var_bytes(self):
+        """bytes of each variable in the table (unlimited dimensions count as empty)"""
+        var_bytes = []
+        for (name, datatype, dims, attributes) in self.var_table:
+            if isinstance(dims, str):
+                dims = (dims,)
+            var_bytes.append(int(np.prod([self.dimensions[dim] or 0 for dim in dims]))
+                             * np.dtype(datatype).itemsize)
+        return var_bytes
+
+    def schema_key(self):
+        """files with the same key have the same header apart from the global values"""
+        return repr((self.nc_format, self.header_pad, self.compression, list(self.global_atts.keys()),
+                     list(self.dimensions.items()), self.var_table))
+
+    def define(self):
+        """create the file with everything collected so far"""
+        nc_format = projected_format(self.nc_format, self.var_bytes())
+        if nc_format != self.nc_format:
+            print("Projected size of {0} is too large for {1}, writing {2}".format(
+                self.savefile, self.nc_format, nc_format))
+            self.nc_format = nc_format
+
+        if self.diskless:
+            self.tmpfile = os.path.join(os.path.dirname(self.savefile),
+                                        '.{0}.{1}.tmp'.format(os.path.basename(self.savefile), os.getpid()))
+        if self.template:
+            return self.clone()
+
+        # netcdf4 files made in memory lose the variable creation order, those are
+        # written to tmpfile on disk (still renamed into place on close)
+        self.rootgrpID = self.create(self.tmpfile or self.savefile,
+                                     self.diskless and self.nc_format in nc3_formats)
+        return self.rootgrpID
+
+    def create(self, file_name, diskless=False):
+        if diskless:
+            # in memory (netCDF4 memory=initial size, grown as needed), close returns the bytes
+            rootgrpID = Dataset(file_name, 'w', format=self.nc_format, memory=1)
+        else:
+            rootgrpID = Dataset(file_name, 'w', format=self.nc_format)
+        reserve_header(rootgrpID, header_size(self.global_atts, self.dimensions, self.var_table)
+                       + self.header_pad)
+
+        rootgrpID.setncatts(self.global_atts)
+        for name, size in self.dimensions.items():
+            rootgrpID.createDimension(name, size)
+        for (name, datatype, dims, attributes) in self.var_table:
+            print("Adding Variable {0}".format(name))
+            attributes = OrderedDict(attributes)
+            fill_value = attributes.pop('_FillValue', None)
+            ncvar = create_variable(rootgrpID, name, datatype, dims, self.compression, fill_value)
+            ncvar.setncatts(attributes)
+            self.variables[name] = ncvar
+            # the first variable fixes where the data starts (behind the placeholder),
+            # the freed placeholder bytes then take the rest of the header
+            release_header(rootgrpID)
+        release_header(rootgrpID)
+        return rootgrpID
+
+    def clone(self):
+        """copy the template file of this schema (made on first use) and patch the globals"""
+        key = self.schema_key()
+        if key not in _templates:
+            (fd, template) = tempfile.mkstemp(suffix='.nc', prefix='EcoFOCI_template_')
+            os.close(fd)
+            self.create(template).close()
+            _templates[key] = template
+
+        # in memory files can't be opened for edits, a diskless clone is written to
+        # tmpfile directly (still renamed into place on close)
+        file_name = self.tmpfile or self.savefile
+        shutil.copyfile(_templates[key], file_name)
+        rootgrpID = Dataset(file_name, 'a')
+        # same names in the same order, so the values are replaced in place
+        rootgrpID.setncatts(self.global_atts)
+        self.variables = dict(rootgrpID.variables)
+        self.rootgrpID = rootgrpID
+        return rootgrpID
+
+    def reopen(self):
+        """open the existing savefile to add to it"""
+        self.rootgrpID = Dataset(self.savefile, 'a')
+        self.variables = dict(self.rootgrpID.variables)
+        return self.rootgrpID
+
+    def close(self):
+        memory = self.rootgrpID.close()
+        if self.tmpfile is None:
+            return
+        if memory is not None:
+            with open(self.tmpfile, 'wb') as fobj:
+                fobj.write(memory)
+        os.replace(self.tmpfile, self.savefile)
+        self.tmpfile = None
+
+
 """-------------------------------NCFile Creation--------------------------------------"""
 
-        
-class NetCDF_Create_Timeseries(object):
+class NetCDF_Create(object):
+    """ Base of the NCFile Creation classes.
+
+    A class supplies its global attributes (sbeglobal_atts), dimensions
+    (dimension_init) and variable table (variable_init, ending with define()),
+    creating, filling and closing the file through NetCDF_Writer is shared.
+
+    file_create() returns the NetCDF_Writer (it used to return the open
+    Dataset).  The file is only created by variable_init, self.rootgrpID is
+    None until then.
+    """
+
+    savefile = 'data/test.nc'
+    nc_format = 'NETCDF3_CLASSIC'
+    nc_read   = 'w'
+    header_pad = 8192
+    missing_values = 1e35
+    history_fmt = '{history}\n{date} {new_history}'
+
+    def __init__(self, savefile=None):
+        """initialize output file path"""
+        if savefile is not None:
+            self.savefile = savefile
+
+    def file_create(self, nc_format=None, zlib=False, complevel=4, shuffle=True, chunksizes=None,
+                    template=False, diskless=False):
+        """nc_format is NETCDF3_CLASSIC (default), NETCDF4_CLASSIC or NETCDF4,
+        the compression options only apply to the NETCDF4 formats (see compression_opts).
+        The file is written in one pass by variable_init (see NetCDF_Writer), template=True
+        clones it from the first file of the same layout (bulk conversions) and diskless=True
+        builds it in memory, written out and renamed into place on close"""
+        if nc_format is not None:
+            self.nc_format = nc_format
+        self.compression = compression_opts(zlib, complevel, shuffle, chunksizes)
+        self.writer = NetCDF_Writer(self.savefile, self.nc_format, self.header_pad, self.compression,
+                                    template, diskless)
+        self.rootgrpID = None
+        return ( self.writer )
+
+    def define(self):
+        """create the file from the collected schema (end of variable_init)"""
+        self.rootgrpID = self.writer.define()
+        self.rec_vars = [v[0] for v in self.writer.var_table]
+        self.var_class = [self.writer.variables[v] for v in self.rec_vars]
+
+    def add_data(self, EPIC_VARS_dict, data_dic=None, missing_values=None):
+        """
+            using the same dictionary to define the variables, and a new dictionary
+                that associates each data array with an epic key, cycle through and populate
+                the desired variables.  If a variable is defined in the epic keys but not passed
+                to the add_data routine, it should be populated with missing data
+        """
+        #exit if the variable dictionary is not passed
+        if not bool(EPIC_VARS_dict):
+            raise RuntimeError('Empty EPIC Dictionary is passed to add_data.')
+        if missing_values is None:
+            missing_values = self.missing_values
+
+        #cycle through EPIC_Vars and populate with data - this is a comprehensive list of 
+        # all variables expected
+        # if no data is passed but an epic dictionary is, complete routine leaving variables
+        #  with missing data if not found
+
+        for EPICdic_key in EPIC_VARS_dict.keys():
+            ncvar = self.writer.variables[EPICdic_key]
+            try:
+                put_data(ncvar, slice(None), data_dic[EPICdic_key], missing_values)
+            except KeyError:
+                put_data(ncvar, slice(None), missing_values, missing_values)
+
+    def add_history(self, new_history):
+        """Adds timestamp (UTC time) and history to existing information"""
+        self.rootgrpID.History = self.history_fmt.format(
+            history=self.rootgrpID.History, new_history=new_history,
+            date=datetime.datetime.utcnow().strftime("%B %d, %Y %H:%M UTC"))
+
+    def close(self):
+        self.writer.close()
+
+class NetCDF_Create_Timeseries(NetCDF_Create):
     """ Class instance to generate a NetCDF file.  
 
     Standards
@@ -60,23 +578,19 @@ class NetCDF_Create_Timeseries(object):
         ncinstance.add_coord_data()
         ncinstance.add_data()
         ncinstance.close()
+
+    Streaming (unlimited time dimension, records written a block at a time)
+        ncinstance.dimension_init(time_len=None)
+        ncinstance.variable_init()
+        ncinstance.add_coord_data(depth, latitude, longitude)
+        ncinstance.append(time1, time2, data_dic)   #repeat per block
+        ncinstance.close()
+
+    Extend an existing streaming file
+        ncinstance.file_append()
+        ncinstance.append(time1, time2, data_dic)
     """ 
-    
-    
-    nc_format = 'NETCDF3_CLASSIC'
-    nc_read   = 'w'
 
-    def __init__(self, savefile='data/test.nc'):
-        """initialize output file path"""
-        
-        self.savefile = savefile
-    
-    def file_create(self):
-            rootgrpID = Dataset(self.savefile, NetCDF_Create_Timeseries.nc_read, 
-                                format=NetCDF_Create_Timeseries.nc_format)
-            self.rootgrpID = rootgrpID
-            return ( rootgrpID )
-        
     def sbeglobal_atts(self, raw_data_file='', Water_Mass='', Water_Depth=9999, 
                        Prog_Cmnt='', Experiment='', Edit_Cmnt='', Station_Name='', 
                        SerialNumber='',Instrument_Type='', History='', Project=''):
@@ -90,26 +604,27 @@ class NetCDF_Create_Timeseries(object):
         
         """
         
-        self.rootgrpID.CREATION_DATE = datetime.datetime.utcnow().strftime("%B %d, %Y %H:%M UTC")
-        self.rootgrpID.COMPOSITE = 1
-        self.rootgrpID.INST_TYPE = Instrument_Type
-        self.rootgrpID.DATA_CMNT = raw_data_file
-        self.rootgrpID.EPIC_FILE_GENERATOR = __file__.split('/')[-1] + ' ' + __version__ 
-        self.rootgrpID.PROG_CMNT01 = Prog_Cmnt
-        self.rootgrpID.EDIT_CMNT01 = Edit_Cmnt
-        self.rootgrpID.WATER_DEPTH = Water_Depth
-        self.rootgrpID.MOORING = Station_Name
-        self.rootgrpID.WATER_MASS = Water_Mass
-        self.rootgrpID.EXPERIMENT = Experiment
-        self.rootgrpID.PROJECT = Experiment
-        self.rootgrpID.SERIAL_NUMBER = SerialNumber
-        self.rootgrpID.History = History
+        self.writer.global_atts['CREATION_DATE'] = datetime.datetime.utcnow().strftime("%B %d, %Y %H:%M UTC")
+        self.writer.global_atts['COMPOSITE'] = 1
+        self.writer.global_atts['INST_TYPE'] = Instrument_Type
+        self.writer.global_atts['DATA_CMNT'] = raw_data_file
+        self.writer.global_atts['EPIC_FILE_GENERATOR'] = __file__.split('/')[-1] + ' ' + __version__ 
+        self.writer.global_atts['PROG_CMNT01'] = Prog_Cmnt
+        self.writer.global_atts['EDIT_CMNT01'] = Edit_Cmnt
+        self.writer.global_atts['WATER_DEPTH'] = Water_Depth
+        self.writer.global_atts['MOORING'] = Station_Name
+        self.writer.global_atts['WATER_MASS'] = Water_Mass
+        self.writer.global_atts['EXPERIMENT'] = Experiment
+        self.writer.global_atts['PROJECT'] = Experiment
+        self.writer.global_atts['SERIAL_NUMBER'] = SerialNumber
+        self.writer.global_atts['History'] = History
         
     def dimension_init(self, time_len=1):
         """
         Assumes
         -------
         Dimensions will be 'time', 'depth', 'lat', 'lon'
+        time_len=None makes time unlimited (see append)
         
         Todo
         ----
@@ -118,10 +633,10 @@ class NetCDF_Create_Timeseries(object):
 
         self.dim_vars = ['time', 'depth', 'lat', 'lon']
         
-        self.rootgrpID.createDimension( self.dim_vars[0], time_len ) #time
-        self.rootgrpID.createDimension( self.dim_vars[1], 1 ) #depth
-        self.rootgrpID.createDimension( self.dim_vars[2], 1 ) #lat
-        self.rootgrpID.createDimension( self.dim_vars[3], 1 ) #lon
+        self.writer.add_dimension( self.dim_vars[0], time_len ) #time
+        self.writer.add_dimension( self.dim_vars[1], 1 ) #depth
+        self.writer.add_dimension( self.dim_vars[2], 1 ) #lat
+        self.writer.add_dimension( self.dim_vars[3], 1 ) #lon
         
         
     def variable_init(self, EPIC_VARS_dict):
@@ -134,97 +649,62 @@ class NetCDF_Create_Timeseries(object):
         if not bool(EPIC_VARS_dict):
             raise RuntimeError('Empty EPIC Dictionary is passed to variable_init.')
 
-        #build record variable attributes
-        rec_vars, rec_var_name, rec_var_longname = [], [], []
-        rec_var_generic_name, rec_var_FORTRAN, rec_var_units, rec_var_epic = [], [], [], []
-
-        #cycle through epic dictionary and create nc parameters
+        #coordinate variables, then one variable over all dimensions per key
+        for coord in epic_coord_table(self.dim_vars):
+            self.writer.add_variable(*coord)
         for evar in EPIC_VARS_dict.keys():
-            rec_vars.append(evar)
-            rec_var_name.append( EPIC_VARS_dict[evar]['name'] )
-            rec_var_longname.append( EPIC_VARS_dict[evar]['longname'] )
-            rec_var_generic_name.append( EPIC_VARS_dict[evar]['generic_name'] )
-            rec_var_units.append( EPIC_VARS_dict[evar]['units'] )
-            rec_var_FORTRAN.append( EPIC_VARS_dict[evar]['fortran'] )
-            rec_var_epic.append( EPIC_VARS_dict[evar]['EPIC_KEY'] )
-        
-        rec_vars = ['time','time2','depth','lat','lon'] + rec_vars
-
-        rec_var_name = ['', '', '', '', ''] + rec_var_name
-        rec_var_longname = ['', '', '', '', ''] + rec_var_longname
-        rec_var_generic_name = ['', '', '', '', ''] + rec_var_generic_name
-        rec_var_FORTRAN = ['', '', '', '', ''] + rec_var_FORTRAN
-        rec_var_units = ['True Julian Day', 'msec since 0:00 GMT','dbar','degree_north','degree_west'] + rec_var_units
-        rec_var_type= ['i4', 'i4'] + ['f4' for spot in rec_vars[2:]]
-        rec_var_strtype= ['EVEN', 'EVEN', 'EVEN', 'EVEN', 'EVEN'] + ['' for spot in rec_vars[5:]]
-        rec_epic_code = [624, 624,1,500,501] + rec_var_epic
-        
-        var_class = []
-        var_class.append(self.rootgrpID.createVariable(rec_vars[0], rec_var_type[0], self.dim_vars[0]))#time1
-        var_class.append(self.rootgrpID.createVariable(rec_vars[1], rec_var_type[1], self.dim_vars[0]))#time2
-        var_class.append(self.rootgrpID.createVariable(rec_vars[2], rec_var_type[2], self.dim_vars[1]))#depth
-        var_class.append(self.rootgrpID.createVariable(rec_vars[3], rec_var_type[3], self.dim_vars[2]))#lat
-        var_class.append(self.rootgrpID.createVariable(rec_vars[4], rec_var_type[4], self.dim_vars[3]))#lon
-        
-        for i, v in enumerate(rec_vars[5:]):  #1D coordinate variables
-            var_class.append(self.rootgrpID.createVariable(rec_vars[i+5], rec_var_type[i+5], self.dim_vars))
-            
-        ### add variable attributes
-        for i, v in enumerate(var_class): #4dimensional for all vars
-            print ("Adding Variable {0}").format(v)#
-            v.setncattr('name',rec_var_name[i])
-            v.long_name = rec_var_longname[i]
-            v.generic_name = rec_var_generic_name[i]
-            v.FORTRAN_format = rec_var_FORTRAN[i]
-            v.units = rec_var_units[i]
-            v.type = rec_var_strtype[i]
-            v.epic_code = rec_epic_code[i]
-            
-        self.var_class = var_class
-        self.rec_vars = rec_vars
+            attributes = epic_var_attributes(EPIC_VARS_dict[evar])
+            self.writer.add_variable(evar, epic_pack(EPIC_VARS_dict[evar], attributes), self.dim_vars, attributes)
+
+        self.define()
 
         
     def add_coord_data(self, depth=None, latitude=None, longitude=None, time1=None, time2=None, CastLog=False):
-        """ """
-        self.var_class[0][:] = time1
-        self.var_class[1][:] = time2
+        """ time is left empty when not given (streaming files, see append) """
+        if time1 is not None:
+            self.var_class[0][:] = time1
+        if time2 is not None:
+            self.var_class[1][:] = time2
         self.var_class[2][:] = depth
         self.var_class[3][:] = latitude
         self.var_class[4][:] = longitude #PMEL standard direction
 
-    def add_data(self, EPIC_VARS_dict, data_dic=None, missing_values=1e35):
+
+    def file_append(self):
+        """Reopen an existing file (made with time_len=None) to append records to"""
+        self.writer = NetCDF_Writer(self.savefile)
+        self.rootgrpID = self.writer.reopen()
+        self.dim_vars = ['time', 'depth', 'lat', 'lon']
+        if not self.rootgrpID.dimensions[self.dim_vars[0]].isunlimited():
+            raise RuntimeError('{0} has a fixed time dimension and can not be appended to.'.format(self.savefile))
+
+        self.rec_vars = list(self.rootgrpID.variables.keys())
+        self.var_class = list(self.rootgrpID.variables.values())
+
+    def append(self, time1, time2, data_dic=None, missing_values=1e35):
         """
-            using the same dictionary to define the variables, and a new dictionary
-                that associates each data array with an epic key, cycle through and populate
-                the desired variables.  If a variable is defined in the epic keys but not passed
-                to the add_data routine, it should be populated with missing data
+            write the next block of records after the last one in the file and flush it
+                to disk, so only one block has to be held in memory.
+                data_dic associates an array of len(time1) with each epic key,
+                variables not in data_dic get missing data for the block
         """
-        #exit if the variable dictionary is not passed
-        if not bool(EPIC_VARS_dict):
-            raise RuntimeError('Empty EPIC Dictionary is passed to add_data.')
-        
-        #cycle through EPIC_Vars and populate with data - this is a comprehensive list of 
-        # all variables expected
-        # if no data is passed but an epic dictionary is, complete routine leaving variables
-        #  with missing data if not found
-
-        for EPICdic_key in EPIC_VARS_dict.keys():
-            di = self.rec_vars.index(EPICdic_key)
+        start = len(self.rootgrpID.dimensions[self.dim_vars[0]])
+        stop = start + len(time1)
+
+        self.var_class[0][start:stop] = time1
+        self.var_class[1][start:stop] = time2
+        for di in range(5, len(self.rec_vars)):
+            ncvar = self.var_class[di]
+            block_shape = (stop - start,) + ncvar.shape[1:]
             try:
-                self.var_class[di][:] = data_dic[EPICdic_key]
-            except KeyError:
-                self.var_class[di][:] = missing_values
-        
-        
-    def add_history(self, new_history):
-        """Adds timestamp (UTC time) and history to existing information"""
-        self.rootgrpID.History = self.rootgrpID.History + '\n' + datetime.datetime.utcnow().strftime("%B %d, %Y %H:%M UTC")\
-                    + ' ' + new_history
-                    
-    def close(self):
-        self.rootgrpID.close()
+                put_data(ncvar, slice(start, stop), np.reshape(data_dic[self.rec_vars[di]], block_shape),
+                         missing_values)
+            except (KeyError, TypeError):
+                put_data(ncvar, slice(start, stop), np.full(block_shape, missing_values), missing_values)
+
+        self.rootgrpID.sync()
 
-class NetCDF_Create_Profile(object):
+class NetCDF_Create_Profile(NetCDF_Create):
     """ Class instance to generate a NetCDF file.  
 
     Standards
@@ -248,22 +728,7 @@ class NetCDF_Create_Profile(object):
         ncinstance.add_data()
         ncinstance.close()
     """ 
-    
-    
-    nc_format = 'NETCDF3_CLASSIC'
-    nc_read   = 'w'
 
-    def __init__(self, savefile='data/test.nc'):
-        """initialize output file path"""
-        
-        self.savefile = savefile
-    
-    def file_create(self):
-            rootgrpID = Dataset(self.savefile, NetCDF_Create_Profile.nc_read, 
-                                format=NetCDF_Create_Profile.nc_format)
-            self.rootgrpID = rootgrpID
-            return ( rootgrpID )
-        
     def sbeglobal_atts(self, raw_data_file='', Water_Mass='', Water_Depth=9999, 
                        Prog_Cmnt='', Experiment='', Edit_Cmnt='', Station_Name='',CruiseID='', 
                        SerialNumber='',Instrument_Type='', History='', Project='',Cast=''):
@@ -277,22 +742,22 @@ class NetCDF_Create_Profile(object):
         
         """
         
-        self.rootgrpID.CREATION_DATE = datetime.datetime.utcnow().strftime("%B %d, %Y %H:%M UTC")
-        self.rootgrpID.COMPOSITE = 1
-        self.rootgrpID.INST_TYPE = Instrument_Type
-        self.rootgrpID.DATA_CMNT = raw_data_file
-        self.rootgrpID.EPIC_FILE_GENERATOR = __file__.split('/')[-1] + ' ' + __version__ 
-        self.rootgrpID.PROG_CMNT01 = Prog_Cmnt
-        self.rootgrpID.EDIT_CMNT01 = Edit_Cmnt
-        self.rootgrpID.WATER_DEPTH = Water_Depth
-        self.rootgrpID.STATION = Station_Name
-        self.rootgrpID.CRUISE = CruiseID
-        self.rootgrpID.CAST = Cast
-        self.rootgrpID.WATER_MASS = Water_Mass
-        self.rootgrpID.EXPERIMENT = Experiment
-        self.rootgrpID.PROJECT = Experiment
-        self.rootgrpID.SERIAL_NUMBER = SerialNumber
-        self.rootgrpID.History = History
+        self.writer.global_atts['CREATION_DATE'] = datetime.datetime.utcnow().strftime("%B %d, %Y %H:%M UTC")
+        self.writer.global_atts['COMPOSITE'] = 1
+        self.writer.global_atts['INST_TYPE'] = Instrument_Type
+        self.writer.global_atts['DATA_CMNT'] = raw_data_file
+        self.writer.global_atts['EPIC_FILE_GENERATOR'] = __file__.split('/')[-1] + ' ' + __version__ 
+        self.writer.global_atts['PROG_CMNT01'] = Prog_Cmnt
+        self.writer.global_atts['EDIT_CMNT01'] = Edit_Cmnt
+        self.writer.global_atts['WATER_DEPTH'] = Water_Depth
+        self.writer.global_atts['STATION'] = Station_Name
+        self.writer.global_atts['CRUISE'] = CruiseID
+        self.writer.global_atts['CAST'] = Cast
+        self.writer.global_atts['WATER_MASS'] = Water_Mass
+        self.writer.global_atts['EXPERIMENT'] = Experiment
+        self.writer.global_atts['PROJECT'] = Experiment
+        self.writer.global_atts['SERIAL_NUMBER'] = SerialNumber
+        self.writer.global_atts['History'] = History
         
     def dimension_init(self, time_len=1, depth_len=1):
         """
@@ -307,10 +772,10 @@ class NetCDF_Create_Profile(object):
 
         self.dim_vars = ['time', 'depth', 'lat', 'lon']
         
-        self.rootgrpID.createDimension( self.dim_vars[0], time_len ) #time
-        self.rootgrpID.createDimension( self.dim_vars[1], depth_len ) #depth
-        self.rootgrpID.createDimension( self.dim_vars[2], 1 ) #lat
-        self.rootgrpID.createDimension( self.dim_vars[3], 1 ) #lon
+        self.writer.add_dimension( self.dim_vars[0], time_len ) #time
+        self.writer.add_dimension( self.dim_vars[1], depth_len ) #depth
+        self.writer.add_dimension( self.dim_vars[2], 1 ) #lat
+        self.writer.add_dimension( self.dim_vars[3], 1 ) #lon
         
         
     def variable_init(self, EPIC_VARS_dict):
@@ -323,54 +788,14 @@ class NetCDF_Create_Profile(object):
         if not bool(EPIC_VARS_dict):
             raise RuntimeError('Empty EPIC Dictionary is passed to variable_init.')
 
-        #build record variable attributes
-        rec_vars, rec_var_name, rec_var_longname = [], [], []
-        rec_var_generic_name, rec_var_FORTRAN, rec_var_units, rec_var_epic = [], [], [], []
-
-        #cycle through epic dictionary and create nc parameters
+        #coordinate variables, then one variable over all dimensions per key
+        for coord in epic_coord_table(self.dim_vars):
+            self.writer.add_variable(*coord)
         for evar in EPIC_VARS_dict.keys():
-            rec_vars.append(evar)
-            rec_var_name.append( EPIC_VARS_dict[evar]['name'] )
-            rec_var_longname.append( EPIC_VARS_dict[evar]['longname'] )
-            rec_var_generic_name.append( EPIC_VARS_dict[evar]['generic_name'] )
-            rec_var_units.append( EPIC_VARS_dict[evar]['units'] )
-            rec_var_FORTRAN.append( EPIC_VARS_dict[evar]['fortran'] )
-            rec_var_epic.append( EPIC_VARS_dict[evar]['EPIC_KEY'] )
-        
-        rec_vars = ['time','time2','depth','lat','lon'] + rec_vars
-
-        rec_var_name = ['', '', '', '', ''] + rec_var_name
-        rec_var_longname = ['', '', '', '', ''] + rec_var_longname
-        rec_var_generic_name = ['', '', '', '', ''] + rec_var_generic_name
-        rec_var_FORTRAN = ['', '', '', '', ''] + rec_var_FORTRAN
-        rec_var_units = ['True Julian Day', 'msec since 0:00 GMT','dbar','degree_north','degree_west'] + rec_var_units
-        rec_var_type= ['i4', 'i4'] + ['f4' for spot in rec_vars[2:]]
-        rec_var_strtype= ['EVEN', 'EVEN', 'EVEN', 'EVEN', 'EVEN'] + ['' for spot in rec_vars[5:]]
-        rec_epic_code = [624, 624,1,500,501] + rec_var_epic
-        
-        var_class = []
-        var_class.append(self.rootgrpID.createVariable(rec_vars[0], rec_var_type[0], self.dim_vars[0]))#time1
-        var_class.append(self.rootgrpID.createVariable(rec_vars[1], rec_var_type[1], self.dim_vars[0]))#time2
-        var_class.append(self.rootgrpID.createVariable(rec_vars[2], rec_var_type[2], self.dim_vars[1]))#depth
-        var_class.append(self.rootgrpID.createVariable(rec_vars[3], rec_var_type[3], self.dim_vars[2]))#lat
-        var_class.append(self.rootgrpID.createVariable(rec_vars[4], rec_var_type[4], self.dim_vars[3]))#lon
-        
-        for i, v in enumerate(rec_vars[5:]):  #1D coordinate variables
-            var_class.append(self.rootgrpID.createVariable(rec_vars[i+5], rec_var_type[i+5], self.dim_vars))
-            
-        ### add variable attributes
-        for i, v in enumerate(var_class): #4dimensional for all vars
-            print ("Adding Variable {0}").format(v)#
-            v.setncattr('name',rec_var_name[i])
-            v.long_name = rec_var_longname[i]
-            v.generic_name = rec_var_generic_name[i]
-            v.FORTRAN_format = rec_var_FORTRAN[i]
-            v.units = rec_var_units[i]
-            v.type = rec_var_strtype[i]
-            v.epic_code = rec_epic_code[i]
-            
-        self.var_class = var_class
-        self.rec_vars = rec_vars
+            attributes = epic_var_attributes(EPIC_VARS_dict[evar])
+            self.writer.add_variable(evar, epic_pack(EPIC_VARS_dict[evar], attributes), self.dim_vars, attributes)
+
+        self.define()
 
         
     def add_coord_data(self, depth=None, latitude=None, longitude=None, time1=None, time2=None, CastLog=False):
@@ -381,39 +806,7 @@ class NetCDF_Create_Profile(object):
         self.var_class[3][:] = latitude
         self.var_class[4][:] = longitude #PMEL standard direction
 
-    def add_data(self, EPIC_VARS_dict, data_dic=None, missing_values=1e35):
-        """
-            using the same dictionary to define the variables, and a new dictionary
-                that associates each data array with an epic key, cycle through and populate
-                the desired variables.  If a variable is defined in the epic keys but not passed
-                to the add_data routine, it should be populated with missing data
-        """
-        #exit if the variable dictionary is not passed
-        if not bool(EPIC_VARS_dict):
-            raise RuntimeError('Empty EPIC Dictionary is passed to add_data.')
-        
-        #cycle through EPIC_Vars and populate with data - this is a comprehensive list of 
-        # all variables expected
-        # if no data is passed but an epic dictionary is, complete routine leaving variables
-        #  with missing data if not found
-
-        for EPICdic_key in EPIC_VARS_dict.keys():
-            di = self.rec_vars.index(EPICdic_key)
-            try:
-                self.var_class[di][:] = data_dic[EPICdic_key]
-            except KeyError:
-                self.var_class[di][:] = missing_values
-        
-        
-    def add_history(self, new_history):
-        """Adds timestamp (UTC time) and history to existing information"""
-        self.rootgrpID.History = self.rootgrpID.History + '\n' + datetime.datetime.utcnow().strftime("%B %d, %Y %H:%M UTC")\
-                    + ' ' + new_history
-                    
-    def close(self):
-        self.rootgrpID.close()
-
-class NetCDF_Trimmed(object):
+class NetCDF_Trimmed(NetCDF_Create):
     """ Class instance to generate a NetCDF file.  
     Takes variable information from preexisting netcdf file via nchandle pass in variable_init.
 
@@ -438,20 +831,10 @@ class NetCDF_Trimmed(object):
         ncinstance.add_data()
         ncinstance.close()
     """ 
-    
-    
-    nc_format = 'NETCDF3_CLASSIC'
-    nc_read   = 'w'
-    def __init__(self, savefile='ncfiles/test.nc'):
-        """data is a numpy array of temperature values"""
-        
-        self.savefile = savefile
-    
-    def file_create(self):
-            rootgrpID = Dataset(self.savefile, NetCDF_Trimmed.nc_read, format=NetCDF_Trimmed.nc_format)
-            self.rootgrpID = rootgrpID
-            return ( rootgrpID )
-        
+
+    savefile = 'ncfiles/test.nc'
+    history_fmt = '{history} {date} {new_history}\n'
+
     def sbeglobal_atts(self, raw_data_file='', Water_Mass='', Water_Depth=9999, 
                        Prog_Cmnt='', Experiment='', Edit_Cmnt='', Station_Name='', 
                        SerialNumber='',Inst_Type='', History='', Project=''):
@@ -465,19 +848,19 @@ class NetCDF_Trimmed(object):
         
         """
         
-        self.rootgrpID.CREATION_DATE = datetime.datetime.utcnow().strftime("%B %d, %Y %H:%M UTC")
-        self.rootgrpID.COMPOSITE = 1
-        self.rootgrpID.INST_TYPE = Inst_Type
-        self.rootgrpID.DATA_CMNT = raw_data_file
-        self.rootgrpID.EPIC_FILE_GENERATOR = 'trim_netcdf.py V' + __version__ 
-        self.rootgrpID.PROG_CMNT01 = Prog_Cmnt
-        self.rootgrpID.EDIT_CMNT01 = Edit_Cmnt
-        self.rootgrpID.WATER_DEPTH = Water_Depth
-        self.rootgrpID.MOORING = Station_Name
-        self.rootgrpID.WATER_MASS = Water_Mass
-        self.rootgrpID.EXPERIMENT = Experiment
-        self.rootgrpID.PROJECT = Experiment
-        self.rootgrpID.History = History
+        self.writer.global_atts['CREATION_DATE'] = datetime.datetime.utcnow().strftime("%B %d, %Y %H:%M UTC")
+        self.writer.global_atts['COMPOSITE'] = 1
+        self.writer.global_atts['INST_TYPE'] = Inst_Type
+        self.writer.global_atts['DATA_CMNT'] = raw_data_file
+        self.writer.global_atts['EPIC_FILE_GENERATOR'] = 'trim_netcdf.py V' + __version__ 
+        self.writer.global_atts['PROG_CMNT01'] = Prog_Cmnt
+        self.writer.global_atts['EDIT_CMNT01'] = Edit_Cmnt
+        self.writer.global_atts['WATER_DEPTH'] = Water_Depth
+        self.writer.global_atts['MOORING'] = Station_Name
+        self.writer.global_atts['WATER_MASS'] = Water_Mass
+        self.writer.global_atts['EXPERIMENT'] = Experiment
+        self.writer.global_atts['PROJECT'] = Experiment
+        self.writer.global_atts['History'] = History
      
     def dimension_init(self, time_len=1):
         """
@@ -492,10 +875,10 @@ class NetCDF_Trimmed(object):
 
         self.dim_vars = ['time', 'depth', 'lat', 'lon']
         
-        self.rootgrpID.createDimension( self.dim_vars[0], time_len ) #time
-        self.rootgrpID.createDimension( self.dim_vars[1], 1 ) #depth
-        self.rootgrpID.createDimension( self.dim_vars[2], 1 ) #lat
-        self.rootgrpID.createDimension( self.dim_vars[3], 1 ) #lon
+        self.writer.add_dimension( self.dim_vars[0], time_len ) #time
+        self.writer.add_dimension( self.dim_vars[1], 1 ) #depth
+        self.writer.add_dimension( self.dim_vars[2], 1 ) #lat
+        self.writer.add_dimension( self.dim_vars[3], 1 ) #lon
         
         
     def variable_init(self, nchandle):
@@ -503,57 +886,16 @@ class NetCDF_Trimmed(object):
         built from knowledge about previous file
         """
         
-        #build record variable attributes
-        rec_vars, rec_var_name, rec_var_longname = [], [], []
-        rec_var_generic_name, rec_var_FORTRAN, rec_var_units, rec_var_epic = [], [], [], []
-        
+        #coordinate variables, then one variable over all dimensions per key
+        for coord in epic_coord_table(self.dim_vars):
+            self.writer.add_variable(*coord)
         for v_name in nchandle.variables.keys():
-            print v_name
+            print(v_name)
             if not v_name in ['time','time2','depth','lat','lon','latitude','longitude']:
-                print "Copying attributes for {0}".format(v_name)
-                rec_vars.append( v_name )
-                rec_var_name.append( nchandle.variables[v_name].name )
-                rec_var_longname.append( nchandle.variables[v_name].long_name )
-                rec_var_generic_name.append( nchandle.variables[v_name].generic_name )
-                rec_var_units.append( nchandle.variables[v_name].units )
-                rec_var_FORTRAN.append( nchandle.variables[v_name].FORTRAN_format )
-                rec_var_epic.append( nchandle.variables[v_name].epic_code )
-
-        
-        rec_vars = ['time','time2','depth','lat','lon'] + rec_vars
-
-        rec_var_name = ['', '', '', '', ''] + rec_var_name
-        rec_var_longname = ['', '', '', '', ''] + rec_var_longname
-        rec_var_generic_name = ['', '', '', '', ''] + rec_var_generic_name
-        rec_var_FORTRAN = ['', '', '', '', ''] + rec_var_FORTRAN
-        rec_var_units = ['True Julian Day', 'msec since 0:00 GMT','dbar','degree_north','degree_west'] + rec_var_units
-        rec_var_type= ['i4', 'i4'] + ['f4' for spot in rec_vars[2:]]
-        rec_var_strtype= ['EVEN', 'EVEN', 'EVEN', 'EVEN', 'EVEN'] + ['' for spot in rec_vars[5:]]
-        rec_epic_code = [624, 624,1,500,501] + rec_var_epic
-        
-        var_class = []
-        var_class.append(self.rootgrpID.createVariable(rec_vars[0], rec_var_type[0], self.dim_vars[0]))#time1
-        var_class.append(self.rootgrpID.createVariable(rec_vars[1], rec_var_type[1], self.dim_vars[0]))#time2
-        var_class.append(self.rootgrpID.createVariable(rec_vars[2], rec_var_type[2], self.dim_vars[1]))#depth
-        var_class.append(self.rootgrpID.createVariable(rec_vars[3], rec_var_type[3], self.dim_vars[2]))#lat
-        var_class.append(self.rootgrpID.createVariable(rec_vars[4], rec_var_type[4], self.dim_vars[3]))#lon
-        
-        for i, v in enumerate(rec_vars[5:]):  #1D coordinate variables
-            var_class.append(self.rootgrpID.createVariable(rec_vars[i+5], rec_var_type[i+5], self.dim_vars))
-            
-        ### add variable attributes
-        for i, v in enumerate(var_class): #4dimensional for all vars
-            print ("Adding Variable {0}").format(v)#
-            v.setncattr('name',rec_var_name[i])
-            v.long_name = rec_var_longname[i]
-            v.generic_name = rec_var_generic_name[i]
-            v.FORTRAN_format = rec_var_FORTRAN[i]
-            v.units = rec_var_units[i]
-            v.type = rec_var_strtype[i]
-            v.epic_code = rec_epic_code[i]
-            
-        self.var_class = var_class
-        self.rec_vars = rec_vars
+                print("Copying attributes for {0}".format(v_name))
+                self.writer.add_variable(v_name, 'f4', self.dim_vars, ncvar_attributes(nchandle.variables[v_name]))
+
+        self.define()
 
         
     def add_coord_data(self, depth=None, latitude=None, longitude=None, time1=None, time2=None, CastLog=False):
@@ -569,20 +911,10 @@ class NetCDF_Trimmed(object):
         
         for ind, varname in enumerate(data.keys()):
             if not varname in ['time','time2','lat','lon','depth','latitude','longitude']:
-                di = self.rec_vars.index(varname)
-                self.var_class[di][:] = data[varname][trim_index,0,0,0]
-        
-
-        
-    def add_history(self, new_history):
-        """Adds timestamp (UTC time) and history to existing information"""
-        self.rootgrpID.History = self.rootgrpID.History + ' ' + datetime.datetime.utcnow().strftime("%B %d, %Y %H:%M UTC")\
-                    + ' ' + new_history + '\n'
-                    
-    def close(self):
-        self.rootgrpID.close()
+                ncvar = self.writer.variables[varname]
+                ncvar[:] = data[varname][trim_index,0,0,0]
 
-class NetCDF_Copy_Struct(object):
+class NetCDF_Copy_Struct(NetCDF_Create):
     """ Class instance to generate a NetCDF file.  
     Takes variable information from preexisting netcdf file via nchandle pass in variable_init.
 
@@ -607,20 +939,10 @@ class NetCDF_Copy_Struct(object):
         ncinstance.add_data()
         ncinstance.close()
     """ 
-    
-    
-    nc_format = 'NETCDF3_CLASSIC'
-    nc_read   = 'w'
-    def __init__(self, savefile='ncfiles/test.nc'):
-        """data is a numpy array of temperature values"""
-        
-        self.savefile = savefile
-    
-    def file_create(self):
-            rootgrpID = Dataset(self.savefile, NetCDF_Copy_Struct.nc_read, format=NetCDF_Copy_Struct.nc_format)
-            self.rootgrpID = rootgrpID
-            return ( rootgrpID )
-        
+
+    savefile = 'ncfiles/test.nc'
+    history_fmt = '{history} {date} {new_history}\n'
+
     def sbeglobal_atts(self, raw_data_file='', Water_Mass='', Water_Depth=9999, 
                        Prog_Cmnt='', Experiment='', Edit_Cmnt='', Station_Name='', 
                        SerialNumber='',Inst_Type='', History='', Project=''):
@@ -634,19 +956,19 @@ class NetCDF_Copy_Struct(object):
         
         """
         
-        self.rootgrpID.CREATION_DATE = datetime.datetime.utcnow().strftime("%B %d, %Y %H:%M UTC")
-        self.rootgrpID.COMPOSITE = 1
-        self.rootgrpID.INST_TYPE = Inst_Type
-        self.rootgrpID.DATA_CMNT = raw_data_file
-        self.rootgrpID.EPIC_FILE_GENERATOR = 'trim_netcdf.py V' + __version__ 
-        self.rootgrpID.PROG_CMNT01 = Prog_Cmnt
-        self.rootgrpID.EDIT_CMNT01 = Edit_Cmnt
-        self.rootgrpID.WATER_DEPTH = Water_Depth
-        self.rootgrpID.MOORING = Station_Name
-        self.rootgrpID.WATER_MASS = Water_Mass
-        self.rootgrpID.EXPERIMENT = Experiment
-        self.rootgrpID.PROJECT = Experiment
-        self.rootgrpID.History = History
+        self.writer.global_atts['CREATION_DATE'] = datetime.datetime.utcnow().strftime("%B %d, %Y %H:%M UTC")
+        self.writer.global_atts['COMPOSITE'] = 1
+        self.writer.global_atts['INST_TYPE'] = Inst_Type
+        self.writer.global_atts['DATA_CMNT'] = raw_data_file
+        self.writer.global_atts['EPIC_FILE_GENERATOR'] = 'trim_netcdf.py V' + __version__ 
+        self.writer.global_atts['PROG_CMNT01'] = Prog_Cmnt
+        self.writer.global_atts['EDIT_CMNT01'] = Edit_Cmnt
+        self.writer.global_atts['WATER_DEPTH'] = Water_Depth
+        self.writer.global_atts['MOORING'] = Station_Name
+        self.writer.global_atts['WATER_MASS'] = Water_Mass
+        self.writer.global_atts['EXPERIMENT'] = Experiment
+        self.writer.global_atts['PROJECT'] = Experiment
+        self.writer.global_atts['History'] = History
      
     def dimension_init(self, time_len=1, depth_len=1):
         """
@@ -661,10 +983,10 @@ class NetCDF_Copy_Struct(object):
 
         self.dim_vars = ['time', 'depth', 'lat', 'lon']
         
-        self.rootgrpID.createDimension( self.dim_vars[0], time_len ) #time
-        self.rootgrpID.createDimension( self.dim_vars[1], depth_len ) #depth
-        self.rootgrpID.createDimension( self.dim_vars[2], 1 ) #lat
-        self.rootgrpID.createDimension( self.dim_vars[3], 1 ) #lon
+        self.writer.add_dimension( self.dim_vars[0], time_len ) #time
+        self.writer.add_dimension( self.dim_vars[1], depth_len ) #depth
+        self.writer.add_dimension( self.dim_vars[2], 1 ) #lat
+        self.writer.add_dimension( self.dim_vars[3], 1 ) #lon
         
         
     def variable_init(self, variable_dic=None):
@@ -672,57 +994,16 @@ class NetCDF_Copy_Struct(object):
         built from knowledge about previous file
         """
         
-        #build record variable attributes
-        rec_vars, rec_var_name, rec_var_longname = [], [], []
-        rec_var_generic_name, rec_var_FORTRAN, rec_var_units, rec_var_epic = [], [], [], []
-        
+        #coordinate variables, then one variable over all dimensions per key
+        for coord in epic_coord_table(self.dim_vars):
+            self.writer.add_variable(*coord)
         for v_name in variable_dic.keys():
-            print v_name
+            print(v_name)
             if not v_name in ['time','time2','depth','lat','lon','latitude','longitude']:
-                print "Copying attributes for {0}".format(v_name)
-                rec_vars.append( v_name )
-                rec_var_name.append( variable_dic[v_name].name )
-                rec_var_longname.append( variable_dic[v_name].long_name )
-                rec_var_generic_name.append( variable_dic[v_name].generic_name )
-                rec_var_units.append( variable_dic[v_name].units )
-                rec_var_FORTRAN.append( variable_dic[v_name].FORTRAN_format )
-                rec_var_epic.append( variable_dic[v_name].epic_code )
-
-        
-        rec_vars = ['time','time2','depth','lat','lon'] + rec_vars
-
-        rec_var_name = ['', '', '', '', ''] + rec_var_name
-        rec_var_longname = ['', '', '', '', ''] + rec_var_longname
-        rec_var_generic_name = ['', '', '', '', ''] + rec_var_generic_name
-        rec_var_FORTRAN = ['', '', '', '', ''] + rec_var_FORTRAN
-        rec_var_units = ['True Julian Day', 'msec since 0:00 GMT','dbar','degree_north','degree_west'] + rec_var_units
-        rec_var_type= ['i4', 'i4'] + ['f4' for spot in rec_vars[2:]]
-        rec_var_strtype= ['EVEN', 'EVEN', 'EVEN', 'EVEN', 'EVEN'] + ['' for spot in rec_vars[5:]]
-        rec_epic_code = [624, 624,1,500,501] + rec_var_epic
-        
-        var_class = []
-        var_class.append(self.rootgrpID.createVariable(rec_vars[0], rec_var_type[0], self.dim_vars[0]))#time1
-        var_class.append(self.rootgrpID.createVariable(rec_vars[1], rec_var_type[1], self.dim_vars[0]))#time2
-        var_class.append(self.rootgrpID.createVariable(rec_vars[2], rec_var_type[2], self.dim_vars[1]))#depth
-        var_class.append(self.rootgrpID.createVariable(rec_vars[3], rec_var_type[3], self.dim_vars[2]))#lat
-        var_class.append(self.rootgrpID.createVariable(rec_vars[4], rec_var_type[4], self.dim_vars[3]))#lon
-        
-        for i, v in enumerate(rec_vars[5:]):  #1D coordinate variables
-            var_class.append(self.rootgrpID.createVariable(rec_vars[i+5], rec_var_type[i+5], self.dim_vars))
-            
-        ### add variable attributes
-        for i, v in enumerate(var_class): #4dimensional for all vars
-            print ("Adding Variable {0}").format(v)#
-            v.setncattr('name',rec_var_name[i])
-            v.long_name = rec_var_longname[i]
-            v.generic_name = rec_var_generic_name[i]
-            v.FORTRAN_format = rec_var_FORTRAN[i]
-            v.units = rec_var_units[i]
-            v.type = rec_var_strtype[i]
-            v.epic_code = rec_epic_code[i]
-            
-        self.var_class = var_class
-        self.rec_vars = rec_vars
+                print("Copying attributes for {0}".format(v_name))
+                self.writer.add_variable(v_name, 'f4', self.dim_vars, ncvar_attributes(variable_dic[v_name]))
+
+        self.define()
 
         
     def add_coord_data(self, depth=None, latitude=None, longitude=None, time1=None, time2=None, CastLog=False):
@@ -738,23 +1019,13 @@ class NetCDF_Copy_Struct(object):
         
         for ind, varname in enumerate(data.keys()):
             if not varname in ['time','time2','lat','lon','depth','latitude','longitude']:
-                di = self.rec_vars.index(varname)
+                ncvar = self.writer.variables[varname]
                 if is2D:
-                    self.var_class[di][:] = data[varname][:,:,0,0]
+                    ncvar[:] = data[varname][:,:,0,0]
                 else:
-                    self.var_class[di][:] = data[varname][:,0,0,0]
-        
+                    ncvar[:] = data[varname][:,0,0,0]
 
-        
-    def add_history(self, new_history):
-        """Adds timestamp (UTC time) and history to existing information"""
-        self.rootgrpID.History = self.rootgrpID.History + ' ' + datetime.datetime.utcnow().strftime("%B %d, %Y %H:%M UTC")\
-                    + ' ' + new_history + '\n'
-                    
-    def close(self):
-        self.rootgrpID.close()
-
-class CF_NC(object):
+class CF_NC(NetCDF_Create):
 
 
     """ Class instance to generate a NetCDF file.  
@@ -781,20 +1052,10 @@ class CF_NC(object):
         ncinstance.add_data()
         ncinstance.close()
     """ 
-    
-    
-    nc_format = 'NETCDF3_CLASSIC'
-    nc_read   = 'w'
-    def __init__(self, savefile='ncfiles/test.nc'):
-        """data is a numpy array of temperature values"""
-        
-        self.savefile = savefile
-    
-    def file_create(self):
-            rootgrpID = Dataset(self.savefile, CF_NC.nc_read, format=CF_NC.nc_format)
-            self.rootgrpID = rootgrpID
-            return ( rootgrpID )
-        
+
+    savefile = 'ncfiles/test.nc'
+    history_fmt = '{history} {date} {new_history}\n'
+
     def sbeglobal_atts(self, raw_data_file='', Water_Mass='B', Water_Depth=9999, Prog_Cmnt='',\
                         Experiment='', Edit_Cmnt='', Station_Name='', Inst_Type='', Project='', History=''):
         """
@@ -807,19 +1068,19 @@ class CF_NC(object):
         
         """
         
-        self.rootgrpID.CREATION_DATE = datetime.datetime.utcnow().strftime("%B %d, %Y %H:%M UTC")
-        self.rootgrpID.COMPOSITE = 1
-        self.rootgrpID.INST_TYPE = Inst_Type
-        self.rootgrpID.DATA_CMNT = raw_data_file
-        self.rootgrpID.EPIC_FILE_GENERATOR = 'nc_epic2udunits_time.py V' + __version__ 
-        self.rootgrpID.PROG_CMNT01 = Prog_Cmnt
-        self.rootgrpID.EDIT_CMNT01 = Edit_Cmnt
-        self.rootgrpID.WATER_DEPTH = Water_Depth
-        self.rootgrpID.MOORING = Station_Name
-        self.rootgrpID.WATER_MASS = Water_Mass
-        self.rootgrpID.EXPERIMENT = Experiment
-        self.rootgrpID.PROJECT = Experiment
-        self.rootgrpID.History = History
+        self.writer.global_atts['CREATION_DATE'] = datetime.datetime.utcnow().strftime("%B %d, %Y %H:%M UTC")
+        self.writer.global_atts['COMPOSITE'] = 1
+        self.writer.global_atts['INST_TYPE'] = Inst_Type
+        self.writer.global_atts['DATA_CMNT'] = raw_data_file
+        self.writer.global_atts['EPIC_FILE_GENERATOR'] = 'nc_epic2udunits_time.py V' + __version__ 
+        self.writer.global_atts['PROG_CMNT01'] = Prog_Cmnt
+        self.writer.global_atts['EDIT_CMNT01'] = Edit_Cmnt
+        self.writer.global_atts['WATER_DEPTH'] = Water_Depth
+        self.writer.global_atts['MOORING'] = Station_Name
+        self.writer.global_atts['WATER_MASS'] = Water_Mass
+        self.writer.global_atts['EXPERIMENT'] = Experiment
+        self.writer.global_atts['PROJECT'] = Experiment
+        self.writer.global_atts['History'] = History
                         
         
     def dimension_init(self, time_len=1):
@@ -835,10 +1096,10 @@ class CF_NC(object):
 
         self.dim_vars = ['time', 'depth', 'lat', 'lon']
         
-        self.rootgrpID.createDimension( self.dim_vars[0], time_len ) #time
-        self.rootgrpID.createDimension( self.dim_vars[1], 1 ) #depth
-        self.rootgrpID.createDimension( self.dim_vars[2], 1 ) #lat
-        self.rootgrpID.createDimension( self.dim_vars[3], 1 ) #lon
+        self.writer.add_dimension( self.dim_vars[0], time_len ) #time
+        self.writer.add_dimension( self.dim_vars[1], 1 ) #depth
+        self.writer.add_dimension( self.dim_vars[2], 1 ) #lat
+        self.writer.add_dimension( self.dim_vars[3], 1 ) #lon
         
         
     def variable_init(self, nchandle, udunits_time_str='days since 1900-1-1' ):
@@ -846,57 +1107,16 @@ class CF_NC(object):
         built from knowledge about previous file
         """
         
-        #build record variable attributes
-        rec_vars, rec_var_name, rec_var_longname = [], [], []
-        rec_var_generic_name, rec_var_FORTRAN, rec_var_units, rec_var_epic = [], [], [], []
-        
+        #coordinate variables, then one variable over all dimensions per key
+        for coord in cf_coord_table(self.dim_vars, udunits_time_str):
+            self.writer.add_variable(*coord)
         for v_name in nchandle.variables.keys():
-            print v_name
+            print(v_name)
             if not v_name in ['time','time2','depth','lat','lon','latitude','longitude']:
-                print "Copying attributes for {0}".format(v_name)
-                rec_vars.append( v_name )
-                rec_var_name.append( nchandle.variables[v_name].name )
-                rec_var_longname.append( nchandle.variables[v_name].long_name )
-                rec_var_generic_name.append( nchandle.variables[v_name].generic_name )
-                rec_var_units.append( nchandle.variables[v_name].units )
-                rec_var_FORTRAN.append( nchandle.variables[v_name].FORTRAN_format )
-                rec_var_epic.append( nchandle.variables[v_name].epic_code )
-
-        
-        rec_vars = ['time','depth','lat','lon'] + rec_vars
-
-        rec_var_name = ['', '', '', ''] + rec_var_name
-        rec_var_longname = ['', '', '', ''] + rec_var_longname
-        rec_var_generic_name = ['', '', '', ''] + rec_var_generic_name
-        rec_var_FORTRAN = ['', '', '', ''] + rec_var_FORTRAN
-        rec_var_units = [udunits_time_str,'dbar','degree_north','degree_west'] + rec_var_units
-        rec_var_type= ['f8'] + ['f4' for spot in rec_vars[1:]]
-        rec_var_strtype= ['EVEN', 'EVEN', 'EVEN', 'EVEN'] + ['' for spot in rec_vars[4:]]
-        rec_epic_code = [624,1,500,501] + rec_var_epic
-        
-        var_class = []
-        var_class.append(self.rootgrpID.createVariable(rec_vars[0], rec_var_type[0], self.dim_vars[0]))#time1
-        var_class.append(self.rootgrpID.createVariable(rec_vars[1], rec_var_type[1], self.dim_vars[1]))#depth
-        var_class.append(self.rootgrpID.createVariable(rec_vars[2], rec_var_type[2], self.dim_vars[2]))#lat
-        var_class.append(self.rootgrpID.createVariable(rec_vars[3], rec_var_type[3], self.dim_vars[3]))#lon
-        
-        for i, v in enumerate(rec_vars[4:]):  #1D coordinate variables
-            var_class.append(self.rootgrpID.createVariable(rec_vars[i+4], rec_var_type[i+4], self.dim_vars))
-            
-        ### add variable attributes
-        for i, v in enumerate(var_class): #4dimensional for all vars
-            print ("Adding Variable {0}").format(v)#
-            v.setncattr('name',rec_var_name[i])
-            v.long_name = rec_var_longname[i]
-            v.generic_name = rec_var_generic_name[i]
-            v.FORTRAN_format = rec_var_FORTRAN[i]
-            v.units = rec_var_units[i]
-            v.type = rec_var_strtype[i]
-            v.epic_code = rec_epic_code[i]
-            
-            
-        self.var_class = var_class
-        self.rec_vars = rec_vars
+                print("Copying attributes for {0}".format(v_name))
+                self.writer.add_variable(v_name, 'f4', self.dim_vars, ncvar_attributes(nchandle.variables[v_name]))
+
+        self.define()
 
         
     def add_coord_data(self, depth=None, latitude=None, longitude=None, time=None, CastLog=False):
@@ -911,20 +1131,10 @@ class CF_NC(object):
         
         for ind, varname in enumerate(data.keys()):
             if not varname in ['time','time2','lat','lon','depth','latitude','longitude']:
-                di = self.rec_vars.index(varname)
-                self.var_class[di][:] = data[varname][:]
-        
+                ncvar = self.writer.variables[varname]
+                ncvar[:] = data[varname][:]
 
-        
-    def add_history(self, new_history):
-        """Adds timestamp (UTC time) and history to existing information"""
-        self.rootgrpID.History = self.rootgrpID.History + ' ' + datetime.datetime.utcnow().strftime("%B %d, %Y %H:%M UTC")\
-                    + ' ' + new_history + '\n'
-                    
-    def close(self):
-        self.rootgrpID.close()
-
-class CF_NC_2D(object):
+class CF_NC_2D(NetCDF_Create):
 
     """ Class instance to generate a NetCDF file.  
     Assumes data format and information ingested is a dataframe object from ctd.py 
@@ -950,20 +1160,10 @@ class CF_NC_2D(object):
         ncinstance.add_data()
         ncinstance.close()
     """ 
-    
-    
-    nc_format = 'NETCDF3_CLASSIC'
-    nc_read   = 'w'
-    def __init__(self, savefile='ncfiles/test.nc'):
-        """data is a numpy array of temperature values"""
-        
-        self.savefile = savefile
-    
-    def file_create(self):
-            rootgrpID = Dataset(self.savefile, CF_NC.nc_read, format=CF_NC.nc_format)
-            self.rootgrpID = rootgrpID
-            return ( rootgrpID )
-        
+
+    savefile = 'ncfiles/test.nc'
+    history_fmt = '{history} {date} {new_history}\n'
+
     def sbeglobal_atts(self, raw_data_file='', Water_Mass='B', Water_Depth=9999, Prog_Cmnt='',\
                         Experiment='', Edit_Cmnt='', Station_Name='', Inst_Type='', Project='', History=''):
         """
@@ -976,19 +1176,19 @@ class CF_NC_2D(object):
         
         """
         
-        self.rootgrpID.CREATION_DATE = datetime.datetime.utcnow().strftime("%B %d, %Y %H:%M UTC")
-        self.rootgrpID.COMPOSITE = 1
-        self.rootgrpID.INST_TYPE = Inst_Type
-        self.rootgrpID.DATA_CMNT = raw_data_file
-        self.rootgrpID.EPIC_FILE_GENERATOR = 'nc_epic2udunits_time.py V' + __version__ 
-        self.rootgrpID.PROG_CMNT01 = Prog_Cmnt
-        self.rootgrpID.EDIT_CMNT01 = Edit_Cmnt
-        self.rootgrpID.WATER_DEPTH = Water_Depth
-        self.rootgrpID.MOORING = Station_Name
-        self.rootgrpID.WATER_MASS = Water_Mass
-        self.rootgrpID.EXPERIMENT = Experiment
-        self.rootgrpID.PROJECT = Experiment
-        self.rootgrpID.History = History
+        self.writer.global_atts['CREATION_DATE'] = datetime.datetime.utcnow().strftime("%B %d, %Y %H:%M UTC")
+        self.writer.global_atts['COMPOSITE'] = 1
+        self.writer.global_atts['INST_TYPE'] = Inst_Type
+        self.writer.global_atts['DATA_CMNT'] = raw_data_file
+        self.writer.global_atts['EPIC_FILE_GENERATOR'] = 'nc_epic2udunits_time.py V' + __version__ 
+        self.writer.global_atts['PROG_CMNT01'] = Prog_Cmnt
+        self.writer.global_atts['EDIT_CMNT01'] = Edit_Cmnt
+        self.writer.global_atts['WATER_DEPTH'] = Water_Depth
+        self.writer.global_atts['MOORING'] = Station_Name
+        self.writer.global_atts['WATER_MASS'] = Water_Mass
+        self.writer.global_atts['EXPERIMENT'] = Experiment
+        self.writer.global_atts['PROJECT'] = Experiment
+        self.writer.global_atts['History'] = History
                         
         
     def dimension_init(self, time_len=1, depth_len=1):
@@ -1004,10 +1204,10 @@ class CF_NC_2D(object):
 
         self.dim_vars = ['time', 'depth', 'lat', 'lon']
         
-        self.rootgrpID.createDimension( self.dim_vars[0], time_len ) #time
-        self.rootgrpID.createDimension( self.dim_vars[1], depth_len ) #depth
-        self.rootgrpID.createDimension( self.dim_vars[2], 1 ) #lat
-        self.rootgrpID.createDimension( self.dim_vars[3], 1 ) #lon
+        self.writer.add_dimension( self.dim_vars[0], time_len ) #time
+        self.writer.add_dimension( self.dim_vars[1], depth_len ) #depth
+        self.writer.add_dimension( self.dim_vars[2], 1 ) #lat
+        self.writer.add_dimension( self.dim_vars[3], 1 ) #lon
         
         
     def variable_init(self, EPIC_VARS_dict, udunits_time_str='days since 1900-1-1' ):
@@ -1020,55 +1220,14 @@ class CF_NC_2D(object):
         if not bool(EPIC_VARS_dict):
             raise RuntimeError('Empty EPIC Dictionary is passed to variable_init.')
 
-        #build record variable attributes
-        rec_vars, rec_var_name, rec_var_longname = [], [], []
-        rec_var_generic_name, rec_var_FORTRAN, rec_var_units, rec_var_epic = [], [], [], []
-
-        #cycle through epic dictionary and create nc parameters
+        #coordinate variables, then one variable over all dimensions per key
+        for coord in cf_coord_table(self.dim_vars, udunits_time_str, depth_type='UNEVEN'):
+            self.writer.add_variable(*coord)
         for evar in EPIC_VARS_dict.keys():
-            rec_vars.append(evar)
-            rec_var_name.append( EPIC_VARS_dict[evar]['name'] )
-            rec_var_longname.append( EPIC_VARS_dict[evar]['longname'] )
-            rec_var_generic_name.append( EPIC_VARS_dict[evar]['generic_name'] )
-            rec_var_units.append( EPIC_VARS_dict[evar]['units'] )
-            rec_var_FORTRAN.append( EPIC_VARS_dict[evar]['fortran'] )
-            rec_var_epic.append( EPIC_VARS_dict[evar]['EPIC_KEY'] )
-
-        
-        rec_vars = ['time','depth','lat','lon'] + rec_vars
-
-        rec_var_name = ['', '', '', ''] + rec_var_name
-        rec_var_longname = ['', '', '', ''] + rec_var_longname
-        rec_var_generic_name = ['', '', '', ''] + rec_var_generic_name
-        rec_var_FORTRAN = ['', '', '', ''] + rec_var_FORTRAN
-        rec_var_units = [udunits_time_str,'dbar','degree_north','degree_west'] + rec_var_units
-        rec_var_type= ['f8'] + ['f4' for spot in rec_vars[1:]]
-        rec_var_strtype= ['EVEN', 'UNEVEN', 'EVEN', 'EVEN'] + ['' for spot in rec_vars[4:]]
-        rec_epic_code = [624,1,500,501] + rec_var_epic
-        
-        var_class = []
-        var_class.append(self.rootgrpID.createVariable(rec_vars[0], rec_var_type[0], self.dim_vars[0]))#time1
-        var_class.append(self.rootgrpID.createVariable(rec_vars[1], rec_var_type[1], self.dim_vars[1]))#depth
-        var_class.append(self.rootgrpID.createVariable(rec_vars[2], rec_var_type[2], self.dim_vars[2]))#lat
-        var_class.append(self.rootgrpID.createVariable(rec_vars[3], rec_var_type[3], self.dim_vars[3]))#lon
-        
-        for i, v in enumerate(rec_vars[4:]):  #1D coordinate variables
-            var_class.append(self.rootgrpID.createVariable(rec_vars[i+4], rec_var_type[i+4], self.dim_vars))
-            
-        ### add variable attributes
-        for i, v in enumerate(var_class): #4dimensional for all vars
-            print ("Adding Variable {0}").format(v)#
-            v.setncattr('name',rec_var_name[i])
-            v.long_name = rec_var_longname[i]
-            v.generic_name = rec_var_generic_name[i]
-            v.FORTRAN_format = rec_var_FORTRAN[i]
-            v.units = rec_var_units[i]
-            v.type = rec_var_strtype[i]
-            v.epic_code = rec_epic_code[i]
-            
-            
-        self.var_class = var_class
-        self.rec_vars = rec_vars
+            attributes = epic_var_attributes(EPIC_VARS_dict[evar])
+            self.writer.add_variable(evar, epic_pack(EPIC_VARS_dict[evar], attributes), self.dim_vars, attributes)
+
+        self.define()
 
         
     def add_coord_data(self, depth=None, latitude=None, longitude=None, time=None, CastLog=False):
@@ -1078,38 +1237,7 @@ class CF_NC_2D(object):
         self.var_class[2][:] = latitude
         self.var_class[3][:] = longitude #PMEL standard direction
 
-    def add_data(self, EPIC_VARS_dict, data_dic=None, missing_values=1e35):
-        """
-            using the same dictionary to define the variables, and a new dictionary
-                that associates each data array with an epic key, cycle through and populate
-                the desired variables.  If a variable is defined in the epic keys but not passed
-                to the add_data routine, it should be populated with missing data
-        """
-        #exit if the variable dictionary is not passed
-        if not bool(EPIC_VARS_dict):
-            raise RuntimeError('Empty EPIC Dictionary is passed to add_data.')
-        
-        #cycle through EPIC_Vars and populate with data - this is a comprehensive list of 
-        # all variables expected
-        # if no data is passed but an epic dictionary is, complete routine leaving variables
-        #  with missing data if not found
-
-        for EPICdic_key in EPIC_VARS_dict.keys():
-            di = self.rec_vars.index(EPICdic_key)
-            try:
-                self.var_class[di][:] = data_dic[EPICdic_key]
-            except KeyError:
-                self.var_class[di][:] = missing_values
-        
-    def add_history(self, new_history):
-        """Adds timestamp (UTC time) and history to existing information"""
-        self.rootgrpID.History = self.rootgrpID.History + ' ' + datetime.datetime.utcnow().strftime("%B %d, %Y %H:%M UTC")\
-                    + ' ' + new_history + '\n'
-                    
-    def close(self):
-        self.rootgrpID.close()
-
-class NetCDF_Create_Profile_Ragged1D(object):
+class NetCDF_Create_Profile_Ragged1D(NetCDF_Create):
     """ Class instance to generate a NetCDF file.  
 
     Standards
@@ -1133,22 +1261,9 @@ class NetCDF_Create_Profile_Ragged1D(object):
         ncinstance.add_data()
         ncinstance.close()
     """ 
-    
-    
-    nc_format = 'NETCDF3_CLASSIC'
-    nc_read   = 'w'
 
-    def __init__(self, savefile='data/test.nc'):
-        """initialize output file path"""
-        
-        self.savefile = savefile
-    
-    def file_create(self):
-            rootgrpID = Dataset(self.savefile, NetCDF_Create_Profile_Ragged1D.nc_read, 
-                                format=NetCDF_Create_Profile_Ragged1D.nc_format)
-            self.rootgrpID = rootgrpID
-            return ( rootgrpID )
-        
+    missing_values = 99999
+
     def sbeglobal_atts(self, raw_data_file='', Water_Mass='', Water_Depth=9999, 
                        Experiment='', Station_Name='', SerialNumber='', 
                        Instrument_Type='', History='', Project=''):
@@ -1162,17 +1277,17 @@ class NetCDF_Create_Profile_Ragged1D(object):
         
         """
         
-        self.rootgrpID.CREATION_DATE = datetime.datetime.utcnow().strftime("%B %d, %Y %H:%M UTC")
-        self.rootgrpID.INST_TYPE = Instrument_Type
-        self.rootgrpID.DATA_CMNT = raw_data_file
-        self.rootgrpID.NC_FILE_GENERATOR = __file__.split('/')[-1] + ' ' + __version__ 
-        self.rootgrpID.WATER_DEPTH = Water_Depth
-        self.rootgrpID.MOORING = Station_Name
-        self.rootgrpID.WATER_MASS = Water_Mass
-        self.rootgrpID.EXPERIMENT = Experiment
-        self.rootgrpID.PROJECT = Project
-        self.rootgrpID.SERIAL_NUMBER = SerialNumber
-        self.rootgrpID.History = History
+        self.writer.global_atts['CREATION_DATE'] = datetime.datetime.utcnow().strftime("%B %d, %Y %H:%M UTC")
+        self.writer.global_atts['INST_TYPE'] = Instrument_Type
+        self.writer.global_atts['DATA_CMNT'] = raw_data_file
+        self.writer.global_atts['NC_FILE_GENERATOR'] = __file__.split('/')[-1] + ' ' + __version__ 
+        self.writer.global_atts['WATER_DEPTH'] = Water_Depth
+        self.writer.global_atts['MOORING'] = Station_Name
+        self.writer.global_atts['WATER_MASS'] = Water_Mass
+        self.writer.global_atts['EXPERIMENT'] = Experiment
+        self.writer.global_atts['PROJECT'] = Project
+        self.writer.global_atts['SERIAL_NUMBER'] = SerialNumber
+        self.writer.global_atts['History'] = History
 
     def dimension_init(self, recnum_len=1):
         """
@@ -1187,7 +1302,7 @@ class NetCDF_Create_Profile_Ragged1D(object):
 
         self.dim_vars = ['record_number']
         
-        self.rootgrpID.createDimension( self.dim_vars[0], recnum_len ) #recnumber
+        self.writer.add_dimension( self.dim_vars[0], recnum_len ) #recnumber
         
         
     def variable_init(self, EPIC_VARS_dict):
@@ -1200,81 +1315,22 @@ class NetCDF_Create_Profile_Ragged1D(object):
         if not bool(EPIC_VARS_dict):
             raise RuntimeError('Empty EPIC Dictionary is passed to variable_init.')
 
-        #build record variable attributes
-        rec_vars, rec_var_name, rec_var_longname = [], [], []
-        rec_var_generic_name, rec_var_FORTRAN, rec_var_units, rec_var_epic = [], [], [], []
-
-        #cycle through epic dictionary and create nc parameters
+        #coordinate variable, then one variable per key
+        self.writer.add_variable('record_number', 'f4', self.dim_vars[0],
+                                 var_attributes(units='sequential measurement id'))
         for evar in EPIC_VARS_dict.keys():
-            rec_vars.append(evar)
-            rec_var_name.append( EPIC_VARS_dict[evar]['name'] )
-            rec_var_longname.append( EPIC_VARS_dict[evar]['longname'] )
-            rec_var_generic_name.append( EPIC_VARS_dict[evar]['generic_name'] )
-            rec_var_units.append( EPIC_VARS_dict[evar]['units'] )
-        
-        rec_vars = ['record_number'] + rec_vars
-
-        rec_var_name = [''] + rec_var_name
-        rec_var_longname = [''] + rec_var_longname
-        rec_var_generic_name = [''] + rec_var_generic_name
-        rec_var_units = ['sequential measurement id'] + rec_var_units
-        rec_var_type= ['f4'] + ['f4' for spot in rec_vars[1:]]
-        
-        var_class = []
-        var_class.append(self.rootgrpID.createVariable(rec_vars[0], rec_var_type[0], self.dim_vars[0]))#time1
-
-        for i, v in enumerate(rec_vars[1:]):  #1D coordinate variables
-            var_class.append(self.rootgrpID.createVariable(rec_vars[i+1], rec_var_type[i+1], self.dim_vars))
-            
-        ### add variable attributes
-        for i, v in enumerate(var_class): #4dimensional for all vars
-            print ("Adding Variable {0}").format(v)#
-            v.setncattr('name',rec_var_name[i])
-            v.long_name = rec_var_longname[i]
-            v.generic_name = rec_var_generic_name[i]
-            v.units = rec_var_units[i]
-            
-        self.var_class = var_class
-        self.rec_vars = rec_vars
+            attributes = var_attributes(EPIC_VARS_dict[evar]['name'], EPIC_VARS_dict[evar]['longname'],
+                                        EPIC_VARS_dict[evar]['generic_name'], EPIC_VARS_dict[evar]['units'])
+            self.writer.add_variable(evar, epic_pack(EPIC_VARS_dict[evar], attributes), self.dim_vars, attributes)
+
+        self.define()
 
         
     def add_coord_data(self, recnum=None):
         """ """
         self.var_class[0][:] = recnum
 
-    def add_data(self, EPIC_VARS_dict, data_dic=None, missing_values=99999):
-        """
-            using the same dictionary to define the variables, and a new dictionary
-                that associates each data array with an epic key, cycle through and populate
-                the desired variables.  If a variable is defined in the epic keys but not passed
-                to the add_data routine, it should be populated with missing data
-        """
-        #exit if the variable dictionary is not passed
-        if not bool(EPIC_VARS_dict):
-            raise RuntimeError('Empty EPIC Dictionary is passed to add_data.')
-        
-        #cycle through EPIC_Vars and populate with data - this is a comprehensive list of 
-        # all variables expected
-        # if no data is passed but an epic dictionary is, complete routine leaving variables
-        #  with missing data if not found
-
-        for EPICdic_key in EPIC_VARS_dict.keys():
-            di = self.rec_vars.index(EPICdic_key)
-            try:
-                self.var_class[di][:] = data_dic[EPICdic_key]
-            except KeyError:
-                self.var_class[di][:] = missing_values
-        
-        
-    def add_history(self, new_history):
-        """Adds timestamp (UTC time) and history to existing information"""
-        self.rootgrpID.History = self.rootgrpID.History + '\n' + datetime.datetime.utcnow().strftime("%B %d, %Y %H:%M UTC")\
-                    + ' ' + new_history
-                    
-    def close(self):
-        self.rootgrpID.close()  
-
-class NetCDF_Create_Profile_Ragged2D(object):
+class NetCDF_Create_Profile_Ragged2D(NetCDF_Create):
     """ Class instance to generate a NetCDF file.  
 
     Standards
@@ -1298,22 +1354,9 @@ class NetCDF_Create_Profile_Ragged2D(object):
         ncinstance.add_data()
         ncinstance.close()
     """ 
-    
-    
-    nc_format = 'NETCDF3_CLASSIC'
-    nc_read   = 'w'
 
-    def __init__(self, savefile='data/test.nc'):
-        """initialize output file path"""
-        
-        self.savefile = savefile
-    
-    def file_create(self):
-            rootgrpID = Dataset(self.savefile, NetCDF_Create_Profile_Ragged2D.nc_read, 
-                                format=NetCDF_Create_Profile_Ragged2D.nc_format)
-            self.rootgrpID = rootgrpID
-            return ( rootgrpID )
-        
+    missing_values = 99999
+
     def sbeglobal_atts(self, raw_data_file='', Water_Mass='', Water_Depth=9999, 
                        Experiment='', Station_Name='', SerialNumber='', 
                        Instrument_Type='', History='', Project=''):
@@ -1327,17 +1370,17 @@ class NetCDF_Create_Profile_Ragged2D(object):
         
         """
         
-        self.rootgrpID.CREATION_DATE = datetime.datetime.utcnow().strftime("%B %d, %Y %H:%M UTC")
-        self.rootgrpID.INST_TYPE = Instrument_Type
-        self.rootgrpID.DATA_CMNT = raw_data_file
-        self.rootgrpID.NC_FILE_GENERATOR = __file__.split('/')[-1] + ' ' + __version__ 
-        self.rootgrpID.WATER_DEPTH = Water_Depth
-        self.rootgrpID.MOORING = Station_Name
-        self.rootgrpID.WATER_MASS = Water_Mass
-        self.rootgrpID.EXPERIMENT = Experiment
-        self.rootgrpID.PROJECT = Project
-        self.rootgrpID.SERIAL_NUMBER = SerialNumber
-        self.rootgrpID.History = History
+        self.writer.global_atts['CREATION_DATE'] = datetime.datetime.utcnow().strftime("%B %d, %Y %H:%M UTC")
+        self.writer.global_atts['INST_TYPE'] = Instrument_Type
+        self.writer.global_atts['DATA_CMNT'] = raw_data_file
+        self.writer.global_atts['NC_FILE_GENERATOR'] = __file__.split('/')[-1] + ' ' + __version__ 
+        self.writer.global_atts['WATER_DEPTH'] = Water_Depth
+        self.writer.global_atts['MOORING'] = Station_Name
+        self.writer.global_atts['WATER_MASS'] = Water_Mass
+        self.writer.global_atts['EXPERIMENT'] = Experiment
+        self.writer.global_atts['PROJECT'] = Project
+        self.writer.global_atts['SERIAL_NUMBER'] = SerialNumber
+        self.writer.global_atts['History'] = History
         
     def dimension_init(self, profilenum_len=1, obsnum_len=1):
         """
@@ -1352,8 +1395,8 @@ class NetCDF_Create_Profile_Ragged2D(object):
 
         self.dim_vars = ['profile_number', 'obs_num']
         
-        self.rootgrpID.createDimension( self.dim_vars[0], profilenum_len ) #recnumber
-        self.rootgrpID.createDimension( self.dim_vars[1], obsnum_len ) #obs per profile
+        self.writer.add_dimension( self.dim_vars[0], profilenum_len ) #recnumber
+        self.writer.add_dimension( self.dim_vars[1], obsnum_len ) #obs per profile
         
         
     def variable_init(self, EPIC_VARS_dict):
@@ -1366,43 +1409,17 @@ class NetCDF_Create_Profile_Ragged2D(object):
         if not bool(EPIC_VARS_dict):
             raise RuntimeError('Empty EPIC Dictionary is passed to variable_init.')
 
-        #build record variable attributes
-        rec_vars, rec_var_name, rec_var_longname = [], [], []
-        rec_var_generic_name, rec_var_FORTRAN, rec_var_units, rec_var_epic = [], [], [], []
-
-        #cycle through epic dictionary and create nc parameters
+        #coordinate variables, then one variable per key
+        self.writer.add_variable('profile_number', 'f4', self.dim_vars[0],
+                                 var_attributes(units='sequential profile id'))
+        self.writer.add_variable('observation_number', 'f4', self.dim_vars[1],
+                                 var_attributes(units='sequential observation id'))
         for evar in EPIC_VARS_dict.keys():
-            rec_vars.append(evar)
-            rec_var_name.append( EPIC_VARS_dict[evar]['name'] )
-            rec_var_longname.append( EPIC_VARS_dict[evar]['longname'] )
-            rec_var_generic_name.append( EPIC_VARS_dict[evar]['generic_name'] )
-            rec_var_units.append( EPIC_VARS_dict[evar]['units'] )
-        
-        rec_vars = ['profile_number','observation_number'] + rec_vars
-
-        rec_var_name = ['',''] + rec_var_name
-        rec_var_longname = ['',''] + rec_var_longname
-        rec_var_generic_name = ['',''] + rec_var_generic_name
-        rec_var_units = ['sequential profile id', 'sequential observation id'] + rec_var_units
-        rec_var_type= ['f4', 'f4'] + ['f4' for spot in rec_vars[2:]]
-        
-        var_class = []
-        var_class.append(self.rootgrpID.createVariable(rec_vars[0], rec_var_type[0], self.dim_vars[0]))
-        var_class.append(self.rootgrpID.createVariable(rec_vars[1], rec_var_type[1], self.dim_vars[1]))
-
-        for i, v in enumerate(rec_vars[2:]):  #1D coordinate variables
-            var_class.append(self.rootgrpID.createVariable(rec_vars[i+2], rec_var_type[i+2], self.dim_vars))
-            
-        ### add variable attributes
-        for i, v in enumerate(var_class): #4dimensional for all vars
-            print ("Adding Variable {0}").format(v)#
-            v.setncattr('name',rec_var_name[i])
-            v.long_name = rec_var_longname[i]
-            v.generic_name = rec_var_generic_name[i]
-            v.units = rec_var_units[i]
-            
-        self.var_class = var_class
-        self.rec_vars = rec_vars
+            attributes = var_attributes(EPIC_VARS_dict[evar]['name'], EPIC_VARS_dict[evar]['longname'],
+                                        EPIC_VARS_dict[evar]['generic_name'], EPIC_VARS_dict[evar]['units'])
+            self.writer.add_variable(evar, epic_pack(EPIC_VARS_dict[evar], attributes), self.dim_vars, attributes)
+
+        self.define()
 
         
     def add_coord_data(self, profile_num=None, obs_num=None):
@@ -1427,21 +1444,404 @@ class NetCDF_Create_Profile_Ragged2D(object):
         #  with missing data if not found
 
         for EPICdic_key in EPIC_VARS_dict.keys():
-            di = self.rec_vars.index(EPICdic_key)
-            print "adding data for {EPICdic_key}".format(EPICdic_key=EPICdic_key)
+            ncvar = self.writer.variables[EPICdic_key]
+            print("adding data for {EPICdic_key}".format(EPICdic_key=EPICdic_key))
             ragged_ind = np.where(~np.isnan(data_dic[EPICdic_key]))[0]
             try:
-                self.var_class[di][profile_num,ragged_ind] = np.array(data_dic[EPICdic_key])[ragged_ind]
+                put_data(ncvar, (profile_num,ragged_ind), np.array(data_dic[EPICdic_key])[ragged_ind],
+                         missing_values)
             except KeyError:
                 pass
             except IndexError:
                 pass
-            print "done"
+            print("done")
+
+class NetCDF_Create_Profile_RaggedContiguous(NetCDF_Create):
+    """ Class instance to generate a NetCDF file.  
+
+    Standards
+    ---------
+    CF contiguous ragged array (discrete sampling geometry, featureType profile)
+    with EPIC variable attributes.  The observations of all profiles are stored
+    back to back along 'obs', row_size holds the number of observations of each
+    profile - no padding to the longest profile.
+
+
+    Usage
+    -----
+    
+    Order of routines matters and no error checking currently exists
+    ToDo: Error Checking
+    
+    data_dic holds the concatenated observations of all profiles for each epic key
+        ncinstance = NetCDF_Create_Profile_RaggedContiguous()
+        ncinstance.file_create()
+        ncinstance.sbeglobal_atts()
+        ncinstance.dimension_init(profilenum_len=len(row_size), obs_len=sum(row_size))
+        ncinstance.variable_init(EPIC_VARS_dict)
+        ncinstance.add_coord_data(profile_num, row_size)
+        ncinstance.add_data(EPIC_VARS_dict, data_dic)
+        ncinstance.close()
+    """ 
+
+    missing_values = 99999
+
+    def sbeglobal_atts(self, raw_data_file='', Water_Mass='', Water_Depth=9999, 
+                       Experiment='', Station_Name='', SerialNumber='', 
+                       Instrument_Type='', History='', Project=''):
+        """
+        Assumptions
+        -----------
         
-    def add_history(self, new_history):
-        """Adds timestamp (UTC time) and history to existing information"""
-        self.rootgrpID.History = self.rootgrpID.History + '\n' + datetime.datetime.utcnow().strftime("%B %d, %Y %H:%M UTC")\
-                    + ' ' + new_history
-                    
-    def close(self):
-        self.rootgrpID.close()  
\ No newline at end of file
+        Format of DataFrame.name = 'dy1309l1_ctd001'
+        
+        seabird related global attributes found in DataFrame.header list
+        
+        """
+        
+        self.writer.global_atts['CREATION_DATE'] = datetime.datetime.utcnow().strftime("%B %d, %Y %H:%M UTC")
+        self.writer.global_atts['INST_TYPE'] = Instrument_Type
+        self.writer.global_atts['DATA_CMNT'] = raw_data_file
+        self.writer.global_atts['NC_FILE_GENERATOR'] = __file__.split('/')[-1] + ' ' + __version__ 
+        self.writer.global_atts['WATER_DEPTH'] = Water_Depth
+        self.writer.global_atts['MOORING'] = Station_Name
+        self.writer.global_atts['WATER_MASS'] = Water_Mass
+        self.writer.global_atts['EXPERIMENT'] = Experiment
+        self.writer.global_atts['PROJECT'] = Project
+        self.writer.global_atts['SERIAL_NUMBER'] = SerialNumber
+        self.writer.global_atts['featureType'] = 'profile'
+        self.writer.global_atts['History'] = History
+        
+    def dimension_init(self, profilenum_len=1, obs_len=1):
+        """
+        Assumes
+        -------
+        Dimensions will be 'profile_number', 'obs'
+        obs_len is the total number of observations (sum of row_size)
+        """
+
+        self.dim_vars = ['profile_number', 'obs']
+        
+        self.writer.add_dimension( self.dim_vars[0], profilenum_len ) #profiles
+        self.writer.add_dimension( self.dim_vars[1], obs_len ) #all observations
+        
+        
+    def variable_init(self, EPIC_VARS_dict):
+        """
+        EPIC keys:
+            passed in as a dictionary (similar syntax as json data file)
+            The dictionary keys are what defines the variable names.
+        """
+        #exit if the variable dictionary is not passed
+        if not bool(EPIC_VARS_dict):
+            raise RuntimeError('Empty EPIC Dictionary is passed to variable_init.')
+
+        #profile variables, then one variable along the observations per key
+        row_size_atts = var_attributes(long_name='number of observations for this profile')
+        row_size_atts['sample_dimension'] = self.dim_vars[1]
+        self.writer.add_variable('profile_number', 'f4', self.dim_vars[0],
+                                 var_attributes(units='sequential profile id'))
+        self.writer.add_variable('row_size', 'i4', self.dim_vars[0], row_size_atts)
+        for evar in EPIC_VARS_dict.keys():
+            attributes = var_attributes(EPIC_VARS_dict[evar]['name'], EPIC_VARS_dict[evar]['longname'],
+                                        EPIC_VARS_dict[evar]['generic_name'], EPIC_VARS_dict[evar]['units'])
+            self.writer.add_variable(evar, epic_pack(EPIC_VARS_dict[evar], attributes), self.dim_vars[1], attributes)
+
+        self.define()
+
+        
+    def add_coord_data(self, profile_num=None, row_size=None):
+        """ row_size: number of observations in each profile (in file order) """
+        if np.sum(row_size) != len(self.rootgrpID.dimensions[self.dim_vars[1]]):
+            raise RuntimeError('row_size adds up to {0} observations, the file has {1}.'.format(
+                np.sum(row_size), len(self.rootgrpID.dimensions[self.dim_vars[1]])))
+        self.var_class[0][:] = profile_num
+        self.var_class[1][:] = row_size
+
+
+"""-------------------------------Tests-------------------------------------------------"""
+
+class pack_dataTest(unittest.TestCase):
+
+    EPIC_VARS_dict = {'T_20': {'name': 'T', 'longname': 'TEMPERATURE (C)', 'generic_name': 'temp',
+                               'units': 'C', 'pack': {'dtype': 'i2', 'scale_factor': 0.01}},
+                      'P_1': {'name': 'P', 'longname': 'PRESSURE (DBAR)', 'generic_name': 'pres',
+                              'units': 'dbar', 'pack': {'dtype': 'i4', 'scale_factor': 0.1,
+                                                        'add_offset': 10.0}}}
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_pack_data(self):
+        packed = pack_data([12000.], 'i4', 0.1, missing_values=99999)
+        self.assertEqual(packed[0], 120000)
+        packed = pack_data([12000., 99999., np.nan, 1e35], 'i4', 0.1, fill_value=-1, missing_values=99999)
+        np.testing.assert_array_equal(packed, [120000, -1, -1, -1])
+        packed = pack_data(np.ma.array([1.5, 1e35, np.float32(1e35), 2.], mask=[0, 0, 0, 1]),
+                           'i2', 0.5, fill_value=-32767)
+        np.testing.assert_array_equal(packed, [3, -32767, -32767, -32767])
+
+    def roundtrip(self, ncclass, missing_values):
+        savefile = os.path.join(self.tmpdir, ncclass.__name__ + '.nc')
+        T = np.array([1.23, missing_values, np.nan, 400., -5.])
+        P = np.array([12000., missing_values, 10., -1e9, 3.])
+
+        ncinstance = ncclass(savefile)
+        ncinstance.file_create()
+        ncinstance.sbeglobal_atts()
+        ncinstance.dimension_init(len(T))
+        ncinstance.variable_init(self.EPIC_VARS_dict)
+        ncinstance.add_coord_data(np.arange(len(T)))
+        ncinstance.add_data(self.EPIC_VARS_dict, {'T_20': T, 'P_1': P}, missing_values)
+        ncinstance.close()
+
+        with Dataset(savefile) as rootgrp:
+            self.assertEqual(rootgrp.variables['T_20'].dtype, np.int16)
+            self.assertEqual(rootgrp.variables['P_1'].dtype, np.int32)
+            t = rootgrp.variables['T_20'][:]
+            p = rootgrp.variables['P_1'][:]
+        # missing, nan and out of range (400 C does not fit 0.01 C in i2) are masked
+        np.testing.assert_array_equal(np.ma.getmaskarray(t), [False, True, True, True, False])
+        np.testing.assert_array_equal(np.ma.getmaskarray(p), [False, True, False, True, False])
+        np.testing.assert_allclose(t.compressed(), [1.23, -5.], atol=0.005)
+        np.testing.assert_allclose(p.compressed(), [12000., 10., 3.], atol=0.05)
+
+    def test_epic_missing(self):
+        self.roundtrip(NetCDF_Create_Profile_Ragged1D, 1e35)
+
+    def test_99999_missing(self):
+        # 99999 fits the packed P_1, 12000 must not be taken for missing
+        self.roundtrip(NetCDF_Create_Profile_Ragged1D, 99999)
+
+
+class NetCDF_CreateTest(unittest.TestCase):
+
+    EPIC_VARS_dict = OrderedDict([('V{0}'.format(i), {'name': 'V{0}'.format(i), 'longname': 'VAR {0}'.format(i),
+                                                      'generic_name': 'v', 'units': 'u', 'fortran': 'f10.2',
+                                                      'EPIC_KEY': i}) for i in range(3)])
+    epic_coords = [('time', ('time',)), ('time2', ('time',)), ('depth', ('depth',)), ('lat', ('lat',)),
+                   ('lon', ('lon',))]
+    cf_coords = [('time', ('time',)), ('depth', ('depth',)), ('lat', ('lat',)), ('lon', ('lon',))]
+    epic_dims = ('time', 'depth', 'lat', 'lon')
+    # variables (name, dimensions) of each class, for the EPIC_VARS_dict or the source file
+    expected = {
+        'NetCDF_Create_Timeseries': epic_coords + list(zip(EPIC_VARS_dict, [epic_dims] * 3)),
+        'NetCDF_Create_Profile': epic_coords + list(zip(EPIC_VARS_dict, [epic_dims] * 3)),
+        'NetCDF_Trimmed': epic_coords + [('V1', epic_dims)],
+        'NetCDF_Copy_Struct': epic_coords + [('V1', epic_dims)],
+        'CF_NC': cf_coords + [('V1', epic_dims)],
+        'CF_NC_2D': cf_coords + list(zip(EPIC_VARS_dict, [epic_dims] * 3)),
+        'NetCDF_Create_Profile_Ragged1D': [(v, ('record_number',)) for v in ['record_number'] + list(EPIC_VARS_dict)],
+        'NetCDF_Create_Profile_Ragged2D': [('profile_number', ('profile_number',)),
+                                           ('observation_number', ('obs_num',))]
+                                          + [(v, ('profile_number', 'obs_num')) for v in EPIC_VARS_dict],
+        'NetCDF_Create_Profile_RaggedContiguous': [('profile_number', ('profile_number',)),
+                                                   ('row_size', ('profile_number',))]
+                                                  + [(v, ('obs',)) for v in EPIC_VARS_dict],
+    }
+    n = 6
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.source = os.path.join(self.tmpdir, 'source.nc')
+        with Dataset(self.source, 'w', format='NETCDF3_CLASSIC') as rootgrp:
+            for dim in self.epic_dims:
+                rootgrp.createDimension(dim, 1)
+            for v_name in ['time', 'time2', 'depth', 'lat', 'lon', 'V1']:
+                ncvar = rootgrp.createVariable(v_name, 'f4', self.epic_dims)
+                ncvar.setncatts(var_attributes('V', 'VAR 1', 'v', 'u', 'f10.2', '', 1))
+
+    def tearDown(self):
+        clear_templates()
+        shutil.rmtree(self.tmpdir)
+
+    def build(self, ncclass, savefile, late_globals=False, file_opts=None, **global_atts):
+        """write a file with ncclass, sbeglobal_atts after variable_init if late_globals
+
+        file_opts are passed to file_create, global_atts to sbeglobal_atts
+        """
+        n = self.n
+        data = dict([(v, np.arange(n, dtype='f4') + i) for (i, v) in enumerate(self.EPIC_VARS_dict)])
+        ncinstance = ncclass(savefile)
+        ncinstance.file_create(**(file_opts or {}))
+        if not late_globals:
+            ncinstance.sbeglobal_atts(History='created', **global_atts)
+        if ncclass in (NetCDF_Create_Timeseries, NetCDF_Trimmed, NetCDF_Copy_Struct, CF_NC):
+            ncinstance.dimension_init(time_len=n)
+        elif ncclass is NetCDF_Create_Profile:
+            ncinstance.dimension_init(depth_len=n)
+        elif ncclass is CF_NC_2D:
+            ncinstance.dimension_init(time_len=n, depth_len=2)
+        elif ncclass is NetCDF_Create_Profile_Ragged1D:
+            ncinstance.dimension_init(recnum_len=n)
+        elif ncclass is NetCDF_Create_Profile_Ragged2D:
+            ncinstance.dimension_init(profilenum_len=2, obsnum_len=n)
+        else:
+            ncinstance.dimension_init(profilenum_len=2, obs_len=n)
+
+        with Dataset(self.source) as source:
+            if ncclass is NetCDF_Copy_Struct:
+                ncinstance.variable_init(source.variables)
+            elif ncclass in (NetCDF_Trimmed, CF_NC):
+                ncinstance.variable_init(source)
+            else:
+                ncinstance.variable_init(self.EPIC_VARS_dict)
+        if late_globals:
+            ncinstance.sbeglobal_atts(History='created', **global_atts)
+
+        if ncclass in (NetCDF_Create_Timeseries, NetCDF_Create_Profile):
+            ncinstance.add_coord_data(depth=np.arange(ncinstance.rootgrpID.dimensions['depth'].size),
+                                      latitude=57., longitude=164.,
+                                      time1=np.arange(ncinstance.rootgrpID.dimensions['time'].size), time2=0)
+            ncinstance.add_data(self.EPIC_VARS_dict, {'V0': data['V0'].reshape(-1, 1, 1, 1)
+                                                      if ncclass is NetCDF_Create_Timeseries
+                                                      else data['V0'].reshape(1, -1, 1, 1)})
+        elif ncclass in (NetCDF_Trimmed, NetCDF_Copy_Struct):
+            ncinstance.add_coord_data(depth=10., latitude=57., longitude=164., time1=np.arange(n), time2=0)
+            if ncclass is NetCDF_Trimmed:
+                ncinstance.add_data({'V1': data['V1'].reshape(-1, 1, 1, 1)}, trim_index=slice(None))
+            else:
+                ncinstance.add_data({'V1': data['V1'].reshape(-1, 1, 1, 1)})
+        elif ncclass is CF_NC:
+            ncinstance.add_coord_data(depth=10., latitude=57., longitude=164., time=np.arange(n))
+            ncinstance.add_data({'V1': data['V1'].reshape(-1, 1, 1, 1)})
+        elif ncclass is CF_NC_2D:
+            ncinstance.add_coord_data(depth=[10., 20.], latitude=57., longitude=164., time=np.arange(n))
+            ncinstance.add_data(self.EPIC_VARS_dict, {'V0': np.repeat(data['V0'], 2).reshape(-1, 2, 1, 1)})
+        elif ncclass is NetCDF_Create_Profile_Ragged1D:
+            ncinstance.add_coord_data(recnum=np.arange(n))
+            ncinstance.add_data(self.EPIC_VARS_dict, data)
+        elif ncclass is NetCDF_Create_Profile_Ragged2D:
+            ncinstance.add_coord_data(profile_num=[0, 1], obs_num=np.arange(n))
+            for profile in [0, 1]:
+                ncinstance.add_data(self.EPIC_VARS_dict, profile_num=profile, data_dic=data)
+        else:
+            ncinstance.add_coord_data(profile_num=[0, 1], row_size=[2, n - 2])
+            ncinstance.add_data(self.EPIC_VARS_dict, data)
+        ncinstance.add_history('checked')
+        ncinstance.close()
+        return data
+
+    def contents(self, file_name):
+        """globals (without CREATION_DATE), variables with their attributes and the data"""
+        with Dataset(file_name) as rootgrp:
+            rootgrp.set_auto_mask(False)
+            global_atts = dict([(att, rootgrp.getncattr(att)) for att in rootgrp.ncattrs()
+                                if att != 'CREATION_DATE'])
+            variables = [(name, ncvar.dimensions, ncvar.dtype.str,
+                          [(att, repr(ncvar.getncattr(att))) for att in ncvar.ncattrs()], ncvar[:])
+                         for (name, ncvar) in rootgrp.variables.items()]
+        return (global_atts, variables)
+
+    def test_classes(self):
+        import contextlib, io
+        for ncclass in [NetCDF_Create_Timeseries, NetCDF_Create_Profile, NetCDF_Trimmed, NetCDF_Copy_Struct,
+                        CF_NC, CF_NC_2D, NetCDF_Create_Profile_Ragged1D, NetCDF_Create_Profile_Ragged2D,
+                        NetCDF_Create_Profile_RaggedContiguous]:
+            with self.subTest(ncclass=ncclass.__name__):
+                savefile = os.path.join(self.tmpdir, ncclass.__name__ + '.nc')
+                late_file = os.path.join(self.tmpdir, ncclass.__name__ + '_late.nc')
+                with contextlib.redirect_stdout(io.StringIO()):
+                    data = self.build(ncclass, savefile)
+                    self.build(ncclass, late_file, late_globals=True)
+
+                (global_atts, variables) = self.contents(savefile)
+                self.assertEqual([(name, dims) for (name, dims, _, _, _) in variables],
+                                 self.expected[ncclass.__name__])
+                self.assertTrue(global_atts['History'].startswith('created'))
+                self.assertTrue(global_atts['History'].rstrip('\n').endswith('checked'))
+                for (name, dims, dtype, atts, values) in variables:
+                    if name in self.EPIC_VARS_dict:
+                        self.assertIn(('long_name', repr(self.EPIC_VARS_dict[name]['longname'])), atts)
+                    if name == 'V0':
+                        # first depth of CF_NC_2D, first profile of the 2D ragged file
+                        values = values[:, 0] if ncclass is CF_NC_2D else values
+                        np.testing.assert_array_equal(np.ravel(values)[:self.n], data['V0'])
+
+                # globals set after variable_init go to the file as well
+                (late_atts, late_variables) = self.contents(late_file)
+                self.assertEqual(sorted(late_atts.keys()), sorted(global_atts.keys()))
+                self.assertEqual(late_atts['History'].split(' ')[0].split('\n')[0], 'created')
+                for (a, b) in zip(variables, late_variables):
+                    self.assertEqual(a[:4], b[:4])
+                    np.testing.assert_array_equal(a[4], b[4])
+
+    def assertSameContents(self, file_name, other):
+        (global_atts, variables) = self.contents(file_name)
+        (other_atts, other_variables) = self.contents(other)
+        # History holds the add_history time stamp
+        global_atts.pop('History')
+        other_atts.pop('History')
+        self.assertEqual(global_atts, other_atts)
+        self.assertEqual(len(variables), len(other_variables))
+        for (a, b) in zip(variables, other_variables):
+            self.assertEqual(a[:4], b[:4])
+            np.testing.assert_array_equal(a[4], b[4])
+
+    def test_template(self):
+        import contextlib, io
+        for ncclass in [NetCDF_Create_Timeseries, NetCDF_Create_Profile_Ragged1D]:
+            with self.subTest(ncclass=ncclass.__name__):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    for (n, station) in enumerate(['A', 'B' * 300]):
+                        plain_file = os.path.join(self.tmpdir, 'plain{0}.nc'.format(n))
+                        self.build(ncclass, plain_file, Station_Name=station)
+                        # the first file makes the template, the second (longer globals) is cloned
+                        template_file = os.path.join(self.tmpdir, 'template{0}.nc'.format(n))
+                        self.build(ncclass, template_file, file_opts={'template': True}, Station_Name=station)
+                        self.assertSameContents(template_file, plain_file)
+                self.assertEqual(len(_templates), 1)
+                clear_templates()
+
+    def test_diskless(self):
+        import contextlib, io
+        for (nc_format, template) in [('NETCDF3_CLASSIC', False), ('NETCDF3_CLASSIC', True),
+                                      ('NETCDF4', False)]:
+            with self.subTest(nc_format=nc_format, template=template):
+                plain_file = os.path.join(self.tmpdir, 'plain.nc')
+                diskless_file = os.path.join(self.tmpdir, 'diskless.nc')
+                file_opts = {'nc_format': nc_format, 'template': template}
+                with contextlib.redirect_stdout(io.StringIO()):
+                    self.build(NetCDF_Create_Timeseries, plain_file, file_opts=file_opts)
+                    file_opts['diskless'] = True
+                    self.build(NetCDF_Create_Timeseries, diskless_file, file_opts=file_opts)
+                self.assertSameContents(diskless_file, plain_file)
+                # the hidden file was renamed onto diskless.nc
+                self.assertEqual(sorted(os.listdir(self.tmpdir)), ['diskless.nc', 'plain.nc', 'source.nc'])
+                os.remove(plain_file)
+                os.remove(diskless_file)
+
+        # nothing shows up under savefile until close
+        ncinstance = NetCDF_Create_Profile_Ragged1D(os.path.join(self.tmpdir, 'partial.nc'))
+        ncinstance.file_create(diskless=True)
+        ncinstance.sbeglobal_atts()
+        ncinstance.dimension_init(recnum_len=2)
+        with contextlib.redirect_stdout(io.StringIO()):
+            ncinstance.variable_init(self.EPIC_VARS_dict)
+        ncinstance.add_coord_data(recnum=[0, 1])
+        self.assertFalse(os.path.exists(ncinstance.savefile))
+        ncinstance.close()
+        self.assertEqual(sorted(os.listdir(self.tmpdir)), ['partial.nc', 'source.nc'])
+
+    def test_define_order(self):
+        import contextlib, io
+        ncinstance = NetCDF_Create_Profile_Ragged1D(os.path.join(self.tmpdir, 'order.nc'))
+        ncinstance.file_create()
+        ncinstance.dimension_init(recnum_len=2)
+        with contextlib.redirect_stdout(io.StringIO()):
+            ncinstance.variable_init(self.EPIC_VARS_dict)
+        with self.assertRaises(RuntimeError):
+            ncinstance.dimension_init(recnum_len=3)
+        ncinstance.writer.global_atts['PROJECT'] = 'EcoFOCI'
+        del ncinstance.writer.global_atts['PROJECT']
+        ncinstance.writer.global_atts['MOORING'] = '13BSM-2A'
+        ncinstance.close()
+        with Dataset(ncinstance.savefile) as rootgrp:
+            self.assertEqual(rootgrp.ncattrs(), ['MOORING'])
+
+
+if __name__ == '__main__':
+    unittest.main()
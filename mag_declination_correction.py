@@ -11,6 +11,9 @@ Background
  Calculate the magnetic declination correction for either a known EcoFOCI mooring in the 
  existing database, or for a defined latitude/longitude pair
 
+ Apply the declination correction directly to the velocity variables of EPIC/CF netcdf
+ files (rotating from magnetic to true north) using the files position and time span
+
 
  Compatibility:
  ==============
@@ -24,6 +27,8 @@ Background
 
  History:
  --------
+ 2026-10-19: Add batch mode for all (or a subset of) moorings in the database
+ 2026-10-19: Add netcdf mode to rotate velocity records by the time varying declination
  2020-10-27: Migrate to python3 syntax, update mysql connector, move to akutan 
  2016-10-21: Move routine to EcoFOCI_utilities to unify program calls
 
@@ -35,11 +40,20 @@ import datetime
 
 # System Stack
 import argparse
+import os
+import shutil
 import sys
 
+# Science Stack
+import numpy as np
+import pandas as pd
+from netCDF4 import num2date
+
 # User Stack
 import calc.geomag.geomag.geomag as geomag
 from io_utils.EcoFOCI_db_io import EcoFOCI_db_Moorings
+from io_utils.EcoFOCI_netCDF_read import EcoFOCI_netCDF
+from io_utils.EcoFOCI_netCDF_write import pack_data
 import io_utils.ConfigParserLocal as ConfigParserLocal
 
 __author__ = "Shaun Bell"
@@ -67,6 +81,201 @@ def latlon_convert(Mooring_Lat, Mooring_Lon):
     return (lat, lon)
 
 
+def latlon_convert_array(Mooring_Lat, Mooring_Lon):
+    """latlon_convert for sequences of "deg min dir" strings
+
+    unparsable entries are returned as nan
+    """
+    tlat = pd.Series(Mooring_Lat, dtype=str).str.strip().str.split(expand=True).reindex(columns=range(3))
+    lat = pd.to_numeric(tlat[0], errors="coerce") + pd.to_numeric(tlat[1], errors="coerce") / 60.0
+    lat = np.where(tlat[2] == "S", -1 * lat, lat)
+
+    tlon = pd.Series(Mooring_Lon, dtype=str).str.strip().str.split(expand=True).reindex(columns=range(3))
+    lon = pd.to_numeric(tlon[0], errors="coerce") + pd.to_numeric(tlon[1], errors="coerce") / 60.0
+    lon = np.where(tlon[2] == "E", -1 * lon, lon)
+
+    return (lat, lon)
+
+
+def batch_declination(Mooring_Meta):
+    """declination at deployment for every mooring in Mooring_Meta
+
+    Returns a DataFrame indexed by MooringID, lon is positive west as in latlon_convert
+    """
+    Mooring_IDs = list(Mooring_Meta.keys())
+    (lat, lon) = latlon_convert_array(
+        [Mooring_Meta[mid]["Latitude"] for mid in Mooring_IDs],
+        [Mooring_Meta[mid]["Longitude"] for mid in Mooring_IDs],
+    )
+    dep_date = pd.to_datetime(
+        [Mooring_Meta[mid]["DeploymentDateTimeGMT"] for mid in Mooring_IDs],
+        errors="coerce",
+    ).values.astype("datetime64[D]")
+
+    dec = np.full(len(Mooring_IDs), np.nan)
+    valid = ~(np.isnan(lat) | np.isnan(lon) | np.isnat(dep_date))
+    if valid.any():
+        t = geomag.GeoMag()
+        dec[valid] = t.GeoMagArray(lat[valid], -1 * lon[valid], time=dep_date[valid])
+
+    return pd.DataFrame(
+        {"lat": lat, "lon": lon, "DeploymentDate": dep_date, "declination": dec},
+        index=pd.Index(Mooring_IDs, name="MooringID"),
+    )
+
+
+"""--------------------------------netcdf----------------------------------------"""
+
+
+def nc_position(nchandle):
+    """lat/lon of the file in decimal degrees north/east
+
+    EPIC files store longitude as degree_west so it is flipped to match geomag
+    """
+    lat, lon = None, None
+    for lat_name in ["lat", "latitude"]:
+        if lat_name in nchandle.variables.keys():
+            lat = float(np.ravel(nchandle.variables[lat_name][:])[0])
+    for lon_name in ["lon", "longitude"]:
+        if lon_name in nchandle.variables.keys():
+            lon = float(np.ravel(nchandle.variables[lon_name][:])[0])
+            if "west" in getattr(nchandle.variables[lon_name], "units", "degree_west"):
+                lon = -1 * lon
+
+    if lat is None or lon is None:
+        raise RuntimeError(
+            "no lat/latitude and lon/longitude variables in {0}".format(nchandle.filepath())
+        )
+
+    return (lat, lon)
+
+
+def nc_days(nchandle, start, stop):
+    """record days (datetime64[D]) for the records start:stop
+
+    EPIC time is true julian day (time2 only holds msec since 0:00 GMT)
+    """
+    nctime = nchandle.variables["time"]
+    if "time2" in nchandle.variables.keys():
+        jday = np.asarray(nctime[start:stop], dtype="int64")
+        return np.datetime64("1968-05-23") + (jday - 2440000).astype("timedelta64[D]")
+    else:
+        dt = num2date(
+            nctime[start:stop],
+            nctime.units,
+            getattr(nctime, "calendar", "standard"),
+            only_use_cftime_datetimes=False,
+            only_use_python_datetimes=True,
+        )
+        return np.asarray(dt, dtype="datetime64[D]")
+
+
+def rotate_velocity(u, v, dec, missing_values=1e35):
+    """rotate magnetic u/v components to true by the declination (degrees, east positive)
+
+    dec must broadcast against u and v.  Records where either component is masked
+    (or equal to missing_values) are not rotated, the inputs are returned there
+    unchanged and keep their mask.
+    """
+    u = np.ma.masked_values(u, missing_values, shrink=False)
+    v = np.ma.masked_values(v, missing_values, shrink=False)
+    missing = np.ma.getmaskarray(u) | np.ma.getmaskarray(v)
+
+    rdec = np.radians(dec)
+    cdec, sdec = np.cos(rdec), np.sin(rdec)
+    ud, vd = np.ma.getdata(u), np.ma.getdata(v)
+    with np.errstate(invalid="ignore", over="ignore"):
+        u_true = np.where(missing, ud, ud * cdec + vd * sdec)
+        v_true = np.where(missing, vd, vd * cdec - ud * sdec)
+
+    return (
+        np.ma.array(u_true, mask=np.ma.getmaskarray(u)),
+        np.ma.array(v_true, mask=np.ma.getmaskarray(v)),
+    )
+
+
+def nc_unpack(ncvar, raw):
+    """raw (auto mask/scale off) records of ncvar as a masked float array
+
+    _FillValue and missing_value records are masked, scale_factor/add_offset applied
+    """
+    missing = np.zeros(raw.shape, dtype=bool)
+    for att in ["_FillValue", "missing_value"]:
+        if att in ncvar.ncattrs():
+            missing |= np.isin(raw, np.ravel(ncvar.getncattr(att)))
+    if raw.dtype.kind == "f":
+        missing |= np.isnan(raw)
+
+    data = raw.astype(np.float64) * getattr(ncvar, "scale_factor", 1.0) + getattr(
+        ncvar, "add_offset", 0.0
+    )
+    return np.ma.array(data, mask=missing)
+
+
+def nc_pack(ncvar, raw, data):
+    """data in the raw (packed) type of ncvar, masked records keep their raw value"""
+    if "scale_factor" in ncvar.ncattrs() or "add_offset" in ncvar.ncattrs():
+        packed = pack_data(
+            data,
+            ncvar.dtype,
+            getattr(ncvar, "scale_factor", 1.0),
+            getattr(ncvar, "add_offset", 0.0),
+            getattr(ncvar, "_FillValue", None),
+        )
+    else:
+        packed = np.ma.getdata(data).astype(ncvar.dtype)
+    return np.where(np.ma.getmaskarray(data), raw, packed)
+
+
+def correct_ncfile(infile, outfile, rotate_vars, chunk_len=100000):
+    """rotate the velocity pair rotate_vars of infile and save to outfile
+
+    Records are processed chunk_len at a time so multi-bin ADCP files are never
+    fully in memory.  If outfile is infile the file is corrected in place.
+    """
+    if outfile != infile:
+        shutil.copyfile(infile, outfile)
+
+    df = EcoFOCI_netCDF(outfile)
+    nchandle = df._getnchandle_()
+    global_atts = df.get_global_atts()
+
+    (lat, lon) = nc_position(nchandle)
+    # read raw so fill values are never rotated and missing records are written
+    # back unchanged, packing is undone and redone by nc_unpack/nc_pack
+    uvar = nchandle.variables[rotate_vars[0]]
+    vvar = nchandle.variables[rotate_vars[1]]
+    uvar.set_auto_maskandscale(False)
+    vvar.set_auto_maskandscale(False)
+
+    t = geomag.GeoMag()
+    dec_min, dec_max = np.inf, -np.inf
+    reclen = len(nchandle.variables["time"])
+    for start in range(0, reclen, chunk_len):
+        stop = min(start + chunk_len, reclen)
+        dec = t.GeoMagArray(lat, lon, time=nc_days(nchandle, start, stop))
+        dec_min, dec_max = min(dec_min, dec.min()), max(dec_max, dec.max())
+
+        # time is the leading dimension, broadcast the declination over the rest
+        dec = dec.reshape((-1,) + (1,) * (uvar.ndim - 1))
+        (u_raw, v_raw) = (uvar[start:stop], vvar[start:stop])
+        (u_true, v_true) = rotate_velocity(
+            nc_unpack(uvar, u_raw), nc_unpack(vvar, v_raw), dec
+        )
+        uvar[start:stop] = nc_pack(uvar, u_raw, u_true)
+        vvar[start:stop] = nc_pack(vvar, v_raw, v_true)
+
+    df.add_history(
+        global_atts.get("History", ""),
+        "{0}, {1} rotated by magnetic declination ({2:.2f} to {3:.2f} deg)".format(
+            rotate_vars[0], rotate_vars[1], dec_min, dec_max
+        ),
+    )
+    df.close()
+
+    return (lat, lon, dec_min, dec_max)
+
+
 """------------------------------- MAIN ----------------------------------------"""
 
 parser = argparse.ArgumentParser(description="Magnetic Declination Correction")
@@ -86,6 +295,52 @@ parser.add_argument(
     help="use this flag to add a user specified date of form \
                yyyy-mm-dd",
 )
+parser.add_argument(
+    "-batch",
+    "--batch",
+    action="store_true",
+    help="declination for every mooring in the database (see --year, --prefix)",
+)
+parser.add_argument(
+    "-yr", "--year", type=int, help="batch: only moorings deployed in this year"
+)
+parser.add_argument(
+    "-pre", "--prefix", type=str, help="batch: only MooringIDs starting with eg 13BS"
+)
+parser.add_argument(
+    "-out",
+    "--outfile",
+    type=str,
+    help="batch: save table to .csv or .json file (default: csv to screen)",
+)
+parser.add_argument(
+    "-nc",
+    "--ncfiles",
+    type=str,
+    nargs="+",
+    help="EPIC/CF netcdf file(s) whose velocity records are rotated to true north",
+)
+parser.add_argument(
+    "-rv",
+    "--rotate_vars",
+    type=str,
+    nargs=2,
+    default=["U_320", "V_321"],
+    help="eastward and northward velocity variables to rotate eg U_320 V_321",
+)
+parser.add_argument(
+    "-o", "--outdir", type=str, help="directory for corrected files (default: same as input)"
+)
+parser.add_argument(
+    "-ip", "--in_place", action="store_true", help="correct the netcdf files in place"
+)
+parser.add_argument(
+    "-cl",
+    "--chunk_len",
+    type=int,
+    default=100000,
+    help="number of records rotated at a time",
+)
 
 args = parser.parse_args()
 
@@ -116,6 +371,25 @@ if args.MooringID:
     except:
         print("At Mooring {0}, with lat: {1} (N) , lon: {2} (W) the declination correction is {3}").format(args.MooringID, lat, lon, dec)
 
+if args.batch:
+    EcoFOCI_db = EcoFOCI_db_Moorings()
+    config_file = "../EcoFOCI_Config/AtSeaPrograms/db_config_mooring.yaml"
+    (db, cursor) = EcoFOCI_db.connect_to_DB(db_config_file=config_file)
+
+    Mooring_Meta = EcoFOCI_db.read_mooring_summaries(
+        table="mooringdeploymentlogs", year=args.year, prefix=args.prefix
+    )
+    EcoFOCI_db.close()
+
+    dec_table = batch_declination(Mooring_Meta)
+
+    if not args.outfile:
+        print(dec_table.to_csv())
+    elif args.outfile.endswith(".json"):
+        dec_table.to_json(args.outfile, orient="index", date_format="iso")
+    else:
+        dec_table.to_csv(args.outfile)
+
 if args.latlon:
 
     lat = args.latlon[0]
@@ -132,3 +406,22 @@ if args.latlon:
         print("At Mooring {0}, with lat: {1} (N) , lon: {2} (W) the declination correction is {3}".format(args.MooringID, lat, lon, dec))
     except:
         print("At Mooring {0}, with lat: {1} (N) , lon: {2} (W) the declination correction is {3}").format(args.MooringID, lat, lon, dec)
+
+if args.ncfiles:
+
+    for infile in args.ncfiles:
+        if args.in_place:
+            outfile = infile
+        else:
+            outdir = args.outdir if args.outdir else os.path.dirname(infile)
+            (root, ext) = os.path.splitext(os.path.basename(infile))
+            outfile = os.path.join(outdir, root + "_magcorr" + ext)
+
+        (lat, lon, dec_min, dec_max) = correct_ncfile(
+            infile, outfile, args.rotate_vars, chunk_len=args.chunk_len
+        )
+        print(
+            "{0}: lat: {1} (N), lon: {2} (E) rotated by {3:.3f} to {4:.3f} -> {5}".format(
+                infile, lat, lon, dec_min, dec_max, outfile
+            )
+        )
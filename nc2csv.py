@@ -17,6 +17,9 @@
 
  History:
  ========
+ 2026-10-19: header_meta only output no longer reads the data variables
+ 2026-10-19: open files read-only
+ 2026-10-19: pointer file mode only reads time and the requested EPIC_Key
  2020-12-21: IPHC specific ctd output
  2020-03-26: EPIC time conversion modified to support python3
  2018-07-24: replace print statements with functions and import future for py3 compatability
@@ -156,10 +159,10 @@ if args.timeseries and args.PointerFile:
         for ind, ncfile in enumerate(files_path):
 
             ###nc readin/out
-            df = EcoFOCI_netCDF(ncfile)
+            df = EcoFOCI_netCDF(ncfile, mode="r")
             global_atts = df.get_global_atts()
             vars_dic = df.get_vars()
-            data = df.ncreadfile_dic()
+            data = dict(df.ncreadfile_lazy(variables=["time", "time2"] + data_var))
             df.close()
 
             nctime = EPIC2Datetime(data["time"], data["time2"])
@@ -177,10 +180,10 @@ if args.timeseries and args.PointerFile:
         for ind, ncfile in enumerate(files_path):
 
             ###nc readin/out
-            df = EcoFOCI_netCDF(ncfile)
+            df = EcoFOCI_netCDF(ncfile, mode="r")
             global_atts = df.get_global_atts()
             vars_dic = df.get_vars()
-            data = df.ncreadfile_dic()
+            data = dict(df.ncreadfile_lazy(variables=["time", "time2"] + data_var))
             df.close()
 
             nctime = EPIC2Datetime(data["time"], data["time2"])
@@ -204,10 +207,10 @@ if args.timeseries and args.PointerFile:
         for ind, ncfile in enumerate(files_path):
 
             ###nc readin/out
-            df = EcoFOCI_netCDF(ncfile)
+            df = EcoFOCI_netCDF(ncfile, mode="r")
             global_atts = df.get_global_atts()
             vars_dic = df.get_vars()
-            data = df.ncreadfile_dic()
+            data = df.ncreadfile_lazy(variables=["time", "time2"] + data_var)
             ### get and print epic timeseries data
             # header
             header = "time, "
@@ -276,10 +279,11 @@ elif not args.timeseries and args.PointerFile:
 else:
     ###nc readin/out
     ncfile = args.infile
-    df = EcoFOCI_netCDF(ncfile)
+    df = EcoFOCI_netCDF(ncfile, mode="r")
     global_atts = df.get_global_atts()
     vars_dic = df.get_vars()
-    data = df.ncreadfile_dic()
+    # variables are only read when an output below needs them
+    data = df.ncreadfile_lazy()
 
     if args.header_meta:
         ### get and print epic header information
@@ -605,6 +609,9 @@ else:
 
             print(global_atts["CAST"] + ", " + timestr + line)
 
+    if args.non_epic:
+        # non_epic output reads the data after the file is closed
+        data = dict(data)
     df.close()
 
 if args.non_epic:
@@ -636,7 +643,7 @@ if args.non_epic:
 if args.IPHC:
     ###nc readin/out
     ncfile = args.infile
-    df = EcoFOCI_netCDF(ncfile)
+    df = EcoFOCI_netCDF(ncfile, mode="r")
     global_atts = df.get_global_atts()
     vars_dic = df.get_vars()
     data = df.ncreadfile_dic()
@@ -15,6 +15,8 @@ pyncdump.py
  
  History:
  ========
+ 2026-10-19: add header only (no data read) output
+ 2026-10-19: open files read-only
  2020-03-26: EPIC time conversion modified to support python3, format statements modified for python3
  2016-11-11: SBELL - move routine from general_utilities and unify class/subroutines with
  other EcoFOCI utilities
@@ -29,6 +31,7 @@ pyncdump.py
 # System Stack
 import datetime
 import os
+import sys
 import argparse
 
 # Science Stack
@@ -60,6 +63,12 @@ except:
 
 parser = argparse.ArgumentParser(description="Summary of input .nc file.")
 parser.add_argument("infile", metavar="infile", type=str, help="input file path")
+parser.add_argument(
+    "-header",
+    "--header_only",
+    action="store_true",
+    help="dimensions, variables and attributes only (no data is read)",
+)
 
 
 args = parser.parse_args()
@@ -69,7 +78,39 @@ os.system("clear")
 inputpath = args.infile
 
 ###nc readin/out
-df = EcoFOCI_netCDF(args.infile)
+df = EcoFOCI_netCDF(args.infile, mode="r")
+
+if args.header_only:
+    header = df.get_header()
+    df.close()
+
+    print("Filename - {0} \n".format(inputpath))
+    print("Dimensions:\n")
+    for dim, dim_info in header["dimensions"].items():
+        print(
+            "\t {0}: {1}{2}".format(
+                dim, dim_info["size"], " (unlimited)" if dim_info["unlimited"] else ""
+            )
+        )
+    print("\nVariables:\n")
+    for var, var_info in header["variables"].items():
+        print(
+            "\t{0:_<10} {1} {2} {3}".format(
+                var,
+                var_info["dtype"],
+                var_info["dimensions"],
+                var_info["attributes"].get("long_name", ""),
+            )
+        )
+    print("\nGlobal Attributes:\n")
+    for var in header["global_attributes"].keys():
+        try:
+            print("\t {0}: {1}".format(var, header["global_attributes"][var]))
+        except UnicodeEncodeError:
+            print("\t {0}: {1}".format(var, "***Unrecognized ASCII characters***"))
+    print("\n")
+    sys.exit()
+
 global_atts = df.get_global_atts()
 vars_dic = df.get_vars()
 ncdata = df.ncreadfile_dic()